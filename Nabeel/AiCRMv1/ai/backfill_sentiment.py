@@ -0,0 +1,147 @@
+# ai/backfill_sentiment.py
+"""
+Re-score historical interaction sentiment with batched classification.
+
+Interactions are read in id order and sent to OpenAIClient.classify_sentiments
+batch_size texts per request, with at most concurrency requests in flight.
+Each scored row is stamped with SENTIMENT_SOURCE in interactions.sentiment_source
+(migrations/005_interaction_sentiment_source.sql), so an interrupted or
+failed run resumes where it stopped and re-running a finished one is a no-op.
+Every completed run then refreshes the customer sentiment aggregates and the
+dirty analytics days, so a resumed run also covers what an interrupted one wrote.
+
+Usage (from the AiCRMv1 directory):
+    python -m ai.backfill_sentiment [--batch-size 25] [--concurrency 4] [--limit 1000]
+"""
+
+import argparse
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Set
+
+from analytics import snapshots
+from database import backfill_sentiment_stats
+from database.supabase_client import SupabaseClient
+
+from .openai_client import SENTIMENT_SOURCE, OpenAIClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_CONCURRENCY = 4
+
+# Interactions read per page while looking for unscored ones
+PAGE_SIZE = 500
+
+
+def iter_unscored(db: SupabaseClient, source: str, limit: Optional[int] = None) -> Iterator[Dict]:
+    """Stream interactions not yet scored by source, in id order, at most limit of them."""
+    after_id, seen = 0, 0
+    while limit is None or seen < limit:
+        page = db.get_interactions_to_score(source, after_id, PAGE_SIZE)
+        for interaction in page[:None if limit is None else limit - seen]:
+            seen += 1
+            yield interaction
+        if len(page) < PAGE_SIZE:
+            return
+        after_id = page[-1]['id']
+
+
+def score_batch(db: SupabaseClient, ai: OpenAIClient, batch: List[Dict], source: str) -> Dict[str, int]:
+    """
+    Classify one batch and write the results. Texts the model skipped are
+    retried once on their own; any still missing stay unscored for the next run.
+    Returns counts like {'scored': 24, 'changed': 5, 'skipped': 1}.
+    """
+    texts = [interaction.get('content') or '' for interaction in batch]
+    results = ai.classify_sentiments(texts)
+
+    missing = [index for index, sentiment in enumerate(results) if sentiment is None]
+    if missing:
+        for index, sentiment in zip(missing, ai.classify_sentiments([texts[index] for index in missing])):
+            results[index] = sentiment
+
+    sentiments = {
+        interaction['id']: sentiment for interaction, sentiment in zip(batch, results) if sentiment is not None
+    }
+    if sentiments:
+        db.set_interaction_sentiments(sentiments, source)
+    return {
+        'scored': len(sentiments),
+        'changed': sum(interaction.get('sentiment') != results[index] for index, interaction in enumerate(batch)
+                       if results[index] is not None),
+        'skipped': len(batch) - len(sentiments),
+    }
+
+
+def backfill(db: SupabaseClient, ai: OpenAIClient, batch_size: int = DEFAULT_BATCH_SIZE,
+             concurrency: int = DEFAULT_CONCURRENCY, limit: Optional[int] = None,
+             source: str = SENTIMENT_SOURCE) -> Dict[str, int]:
+    """
+    Score every interaction not yet scored by source, then refresh the
+    aggregates, including for rows an interrupted earlier run wrote.
+    A failed batch is logged and left for the next run. Returns counts like
+    {'scored': 980, 'changed': 120, 'skipped': 2, 'failed': 25, 'customers': 300}.
+    """
+    totals = {'scored': 0, 'changed': 0, 'skipped': 0, 'failed': 0}
+
+    def collect(done: Set[Future]) -> None:
+        for future in done:
+            batch = batches[future]
+            try:
+                for name, count in future.result().items():
+                    totals[name] += count
+            except Exception as e:
+                totals['failed'] += len(batch)
+                logger.error(f"Batch of interactions {batch[0]['id']}-{batch[-1]['id']} failed: {e}")
+        logger.info(f"Scored {totals['scored']} interactions ({totals['changed']} changed, {totals['failed']} failed)")
+
+    batches: Dict[Future, List[Dict]] = {}
+    pending: Set[Future] = set()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        batch: List[Dict] = []
+        for interaction in iter_unscored(db, source, limit):
+            batch.append(interaction)
+            if len(batch) < batch_size:
+                continue
+            # Keep reading ahead of the workers bounded
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = pool.submit(score_batch, db, ai, batch, source)
+            batches[future] = batch
+            pending.add(future)
+            batch = []
+        if batch:
+            future = pool.submit(score_batch, db, ai, batch, source)
+            batches[future] = batch
+            pending.add(future)
+        collect(wait(pending).done)
+
+    # Refresh even when this run changed nothing: a resumed run skips the rows
+    # an interrupted one already wrote, and those still need their aggregates.
+    # Both steps are cheap when nothing is stale (snapshots only redo dirty days).
+    totals['customers'] = backfill_sentiment_stats.backfill(db)
+    snapshots.refresh_snapshots(db)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score interaction sentiment with batched classification.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Texts per classification request")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight at once")
+    parser.add_argument("--limit", type=int, help="Stop after this many interactions")
+    parser.add_argument("--source", default=SENTIMENT_SOURCE,
+                        help=f"sentiment_source label; rows already carrying it are skipped (default {SENTIMENT_SOURCE})")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    totals = backfill(SupabaseClient(), OpenAIClient(), args.batch_size, args.concurrency, args.limit, args.source)
+    print(
+        f"Done: {totals['scored']} scored, {totals['changed']} changed, {totals['skipped']} skipped, "
+        f"{totals['failed']} failed; refreshed sentiment stats for {totals['customers']} customers"
+    )
+
+
+if __name__ == "__main__":
+    main()
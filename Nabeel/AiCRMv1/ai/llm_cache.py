@@ -0,0 +1,145 @@
+# ai/llm_cache.py
+"""
+Disk-backed cache of LLM completions, shared by every session and process
+using the same file.
+
+Entries are keyed by a hash of the model, the sampling parameters and the
+fully rendered messages, so any change in the customer data behind a
+prompt is a different key. Entries expire after ttl_seconds, and the
+least recently used are evicted beyond max_entries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Cache file, or "off" to disable caching
+LLM_CACHE_PATH = os.environ.get("AICRM_LLM_CACHE", ".aicrm_llm_cache.db")
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("AICRM_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("AICRM_LLM_CACHE_SIZE", "5000"))
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], **params: Any) -> str:
+    """Hash of everything that determines a completion."""
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite store of completion text by cache_key. Safe to share between
+    threads; several processes may share the file.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=10)
+
+        with self._lock:
+            if path != ':memory:':
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS completions_used_at_idx ON completions (used_at)")
+            self._connection.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        The cached completion for key, or None if absent or expired.
+        The cache is best effort: database errors are logged and read as a miss.
+        """
+        try:
+            return self._get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response FROM completions WHERE key = ? AND created_at > ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE completions SET used_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, model: str, response: str) -> None:
+        """
+        Store a completion, then drop expired entries and the least recently
+        used beyond max_entries. Database errors are logged and ignored.
+        """
+        try:
+            self._set(key, model, response)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache write failed: {e}")
+            with self._lock:
+                self._connection.rollback()
+
+    def _set(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions (key, model, response, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self._connection.execute("DELETE FROM completions WHERE created_at <= ?", (now - self.ttl_seconds,))
+            self._connection.execute("""
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM completions ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (max(self.max_entries, 0),))
+            self._connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM completions")
+            self._connection.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for this process plus the stored entry count."""
+        with self._lock:
+            size = self._connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': size,
+        }
+
+
+def open_default_cache() -> Optional[LLMCache]:
+    """LLMCache at LLM_CACHE_PATH, or None when caching is off or the file can't be opened."""
+    if LLM_CACHE_PATH.lower() in ('', 'off', '0', 'false', 'no'):
+        return None
+    try:
+        return LLMCache(LLM_CACHE_PATH)
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache disabled, can't open {LLM_CACHE_PATH}: {e}")
+        return None
@@ -1,20 +1,44 @@
+import json
 import os
 import openai
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 import streamlit as st
-from .prompts import CUSTOMER_SUMMARY_PROMPT, EMAIL_DRAFT_PROMPT, SENTIMENT_ANALYSIS_PROMPT, SALES_ADVICE_PROMPT
+from .llm_cache import LLMCache, cache_key, open_default_cache
+from .prompts import (
+    BATCH_SENTIMENT_PROMPT, CUSTOMER_SUMMARY_PROMPT, EMAIL_DRAFT_PROMPT, SENTIMENT_ANALYSIS_PROMPT, SALES_ADVICE_PROMPT
+)
 
 # Load environment variables
 load_dotenv()
 
+# Chat model for every completion
+MODEL = "gpt-3.5-turbo"
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+
+# Recorded in interactions.sentiment_source by classify_sentiments callers;
+# bump the version when the batch prompt changes so backfills rescore
+SENTIMENT_SOURCE = f"{MODEL}:batch-v1"
+
+# Interaction text sent per item in a batch; sentiment rarely needs more
+MAX_SENTIMENT_TEXT_CHARS = 1500
+
 class OpenAIClient:
     """
     Handles all OpenAI API operations for the AiCRM application.
+    Completions are cached on disk by model, parameters and prompt; pass
+    use_cache=False to any generate method to get a fresh one. The stream_*
+    variants yield text as it arrives, for st.write_stream; they raise on
+    failure instead of returning a placeholder, even partway through, so a
+    broken reply is never mistaken for a complete one and stored.
     """
     
-    def __init__(self):
-        """Initialize the OpenAI client with API key from environment."""
+    def __init__(self, cache: Optional[LLMCache] = None):
+        """
+        Initialize the OpenAI client with API key from environment.
+        cache stores completions; defaults to the AICRM_LLM_CACHE file.
+        """
         self.api_key = os.environ.get("OPENAI_API_KEY")
         
         if not self.api_key:
@@ -23,148 +47,217 @@ class OpenAIClient:
         # Set the API key
         openai.api_key = self.api_key
         self.client = openai.OpenAI(api_key=self.api_key)
+        self.cache = cache if cache is not None else open_default_cache()
+    
+    def _complete(self, prompt: str, max_tokens: int, temperature: float, use_cache: bool = True, **options) -> str:
+        """
+        Get the completion for a single-message prompt, from the cache when possible.
+        use_cache=False skips the lookup but still stores the fresh completion.
+        options are passed to chat.completions.create and are part of the cache key.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        key = cache_key(MODEL, messages, max_tokens=max_tokens, temperature=temperature, **options)
+        if self.cache is not None and use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        response = self.client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **options
+        )
+        content = response.choices[0].message.content
+        
+        if self.cache is not None and content:
+            self.cache.set(key, MODEL, content)
+        return content
+    
+    def _complete_stream(self, prompt: str, max_tokens: int, temperature: float, use_cache: bool = True) -> Iterator[str]:
+        """
+        Yield the completion for a single-message prompt as it arrives.
+        A cached completion is yielded whole. A fresh one is cached once the
+        stream finishes, so a stream abandoned halfway is not.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        key = cache_key(MODEL, messages, max_tokens=max_tokens, temperature=temperature)
+        if self.cache is not None and use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        stream = self.client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        parts = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        
+        content = "".join(parts)
+        if self.cache is not None and content:
+            self.cache.set(key, MODEL, content)
     
-    def generate_customer_summary(self, customer_data: Dict, interactions: List[Dict], product_interests: List[Dict] = None, available_products: List[Dict] = None, transactions: List[Dict] = None) -> str:
+    def _customer_summary_prompt(self, customer_data: Dict, interactions: List[Dict], product_interests: List[Dict] = None, available_products: List[Dict] = None, transactions: List[Dict] = None) -> str:
+        """Render the customer summary prompt."""
+        # Format interactions
+        interactions_text = ""
+        for interaction in interactions[:5]:  # Last 5 interactions
+            interactions_text += f"""
+            - {interaction.get('type', 'Unknown')} on {interaction.get('date', 'Unknown date')}
+              Subject: {interaction.get('subject', 'No subject')}
+              Content: {interaction.get('content', 'No content')}
+              Sentiment: {interaction.get('sentiment', 'Unknown')}
+            """
+        
+        # Format product interests
+        product_interests_text = "No specific product interests identified yet."
+        if product_interests:
+            product_interests_text = ""
+            for interest in product_interests:
+                product = interest.get('product', {})
+                product_interests_text += f"""
+            - {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')})
+              Price: ${product.get('price', 0):,.2f}
+              Context: {interest.get('context', 'No context')}
+              Sentiment: {interest.get('sentiment', 'Unknown')}
+            """
+        
+        # Format transaction history
+        transaction_history_text = "No purchase history available."
+        if transactions:
+            total_spent = sum(t.get('total_amount', 0) for t in transactions)
+            transaction_history_text = f"""
+            Purchase Summary:
+            - Total Transactions: {len(transactions)}
+            - Total Spent: ${total_spent:,.2f}
+            - Average Transaction: ${total_spent / len(transactions):,.2f}
+            
+            Recent Purchases:
+            """
+            for transaction in transactions[:5]:  # Last 5 transactions
+                product = transaction.get('products', {})
+                transaction_history_text += f"""
+            - {product.get('name', 'Unknown Product')} (${transaction.get('total_amount', 0):,.2f}) - {transaction.get('transaction_date', 'Unknown date')}
+            """
+        
+        # Format available products
+        available_products_text = "No product information available."
+        if available_products:
+            available_products_text = ""
+            for product in available_products[:10]:  # Top 10 products
+                available_products_text += f"""
+            - {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')})
+              Price: ${product.get('price', 0):,.2f}
+              Description: {product.get('description', 'No description')[:100]}...
+            """
+        
+        # Use the enhanced prompt template
+        prompt = CUSTOMER_SUMMARY_PROMPT.format(
+            first_name=customer_data.get('first_name', ''),
+            last_name=customer_data.get('last_name', ''),
+            company=customer_data.get('company', 'N/A'),
+            email=customer_data.get('email', 'N/A'),
+            phone=customer_data.get('phone', 'N/A'),
+            stage=customer_data.get('stage', 'lead'),
+            notes=customer_data.get('notes', 'None'),
+            interaction_count=len(interactions),
+            interactions=interactions_text,
+            product_interests=product_interests_text,
+            transaction_history=transaction_history_text,
+            available_products=available_products_text
+        )
+        
+        return prompt
+    
+    def summarize_customer(self, customer_data: Dict, interactions: List[Dict], product_interests: List[Dict] = None, available_products: List[Dict] = None, transactions: List[Dict] = None, use_cache: bool = True) -> str:
+        """
+        Like generate_customer_summary, but errors propagate instead of
+        turning into a placeholder text, for background jobs.
+        """
+        prompt = self._customer_summary_prompt(customer_data, interactions, product_interests, available_products, transactions)
+        return self._complete(prompt, max_tokens=600, temperature=0.7, use_cache=use_cache)
+    
+    def generate_customer_summary(self, customer_data: Dict, interactions: List[Dict], product_interests: List[Dict] = None, available_products: List[Dict] = None, transactions: List[Dict] = None, use_cache: bool = True) -> str:
         """
         Generate AI-powered customer summary based on customer data, interactions, and product interests.
         """
         try:
-            # Format interactions
-            interactions_text = ""
-            for interaction in interactions[:5]:  # Last 5 interactions
-                interactions_text += f"""
-                - {interaction.get('type', 'Unknown')} on {interaction.get('date', 'Unknown date')}
-                  Subject: {interaction.get('subject', 'No subject')}
-                  Content: {interaction.get('content', 'No content')}
-                  Sentiment: {interaction.get('sentiment', 'Unknown')}
-                """
-            
-            # Format product interests
-            product_interests_text = "No specific product interests identified yet."
-            if product_interests:
-                product_interests_text = ""
-                for interest in product_interests:
-                    product = interest.get('product', {})
-                    product_interests_text += f"""
-                - {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')})
-                  Price: ${product.get('price', 0):,.2f}
-                  Context: {interest.get('context', 'No context')}
-                  Sentiment: {interest.get('sentiment', 'Unknown')}
-                """
-            
-            # Format transaction history
-            transaction_history_text = "No purchase history available."
-            if transactions:
-                total_spent = sum(t.get('total_amount', 0) for t in transactions)
-                transaction_history_text = f"""
-                Purchase Summary:
-                - Total Transactions: {len(transactions)}
-                - Total Spent: ${total_spent:,.2f}
-                - Average Transaction: ${total_spent / len(transactions):,.2f}
-                
-                Recent Purchases:
-                """
-                for transaction in transactions[:5]:  # Last 5 transactions
-                    product = transaction.get('products', {})
-                    transaction_history_text += f"""
-                - {product.get('name', 'Unknown Product')} (${transaction.get('total_amount', 0):,.2f}) - {transaction.get('transaction_date', 'Unknown date')}
-                """
-            
-            # Format available products
-            available_products_text = "No product information available."
-            if available_products:
-                available_products_text = ""
-                for product in available_products[:10]:  # Top 10 products
-                    available_products_text += f"""
-                - {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')})
-                  Price: ${product.get('price', 0):,.2f}
-                  Description: {product.get('description', 'No description')[:100]}...
-                """
-            
-            # Use the enhanced prompt template
-            prompt = CUSTOMER_SUMMARY_PROMPT.format(
-                first_name=customer_data.get('first_name', ''),
-                last_name=customer_data.get('last_name', ''),
-                company=customer_data.get('company', 'N/A'),
-                email=customer_data.get('email', 'N/A'),
-                phone=customer_data.get('phone', 'N/A'),
-                stage=customer_data.get('stage', 'lead'),
-                notes=customer_data.get('notes', 'None'),
-                interaction_count=len(interactions),
-                interactions=interactions_text,
-                product_interests=product_interests_text,
-                transaction_history=transaction_history_text,
-                available_products=available_products_text
-            )
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=600,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
+            return self.summarize_customer(customer_data, interactions, product_interests, available_products, transactions, use_cache)
             
         except Exception as e:
             st.error(f"Error generating customer summary: {e}")
             return "Unable to generate AI summary at this time."
     
-    def generate_email_draft(self, customer_data: Dict, context: str, email_type: str = "follow_up", product_interests: List[Dict] = None) -> str:
+    def stream_customer_summary(self, customer_data: Dict, interactions: List[Dict], product_interests: List[Dict] = None, available_products: List[Dict] = None, transactions: List[Dict] = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Like generate_customer_summary, but yields the text as it arrives and errors propagate.
+        """
+        prompt = self._customer_summary_prompt(customer_data, interactions, product_interests, available_products, transactions)
+        yield from self._complete_stream(prompt, max_tokens=600, temperature=0.7, use_cache=use_cache)
+    
+    def _email_draft_prompt(self, customer_data: Dict, context: str, email_type: str = "follow_up", product_interests: List[Dict] = None) -> str:
+        """Render the email draft prompt."""
+        # Format product interests
+        product_interests_text = "No specific product interests identified yet."
+        if product_interests:
+            product_interests_text = ""
+            for interest in product_interests:
+                product = interest.get('product', {})
+                product_interests_text += f"- {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')})\n"
+        
+        # Use the enhanced prompt template
+        prompt = EMAIL_DRAFT_PROMPT.format(
+            first_name=customer_data.get('first_name', ''),
+            last_name=customer_data.get('last_name', ''),
+            company=customer_data.get('company', 'N/A'),
+            stage=customer_data.get('stage', 'lead'),
+            context=context,
+            email_type=email_type,
+            product_interests=product_interests_text
+        )
+        
+        return prompt
+    
+    def generate_email_draft(self, customer_data: Dict, context: str, email_type: str = "follow_up", product_interests: List[Dict] = None, use_cache: bool = True) -> str:
         """
         Generate AI-powered email draft based on customer context and product interests.
         """
         try:
-            # Format product interests
-            product_interests_text = "No specific product interests identified yet."
-            if product_interests:
-                product_interests_text = ""
-                for interest in product_interests:
-                    product = interest.get('product', {})
-                    product_interests_text += f"- {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')})\n"
-            
-            # Use the enhanced prompt template
-            prompt = EMAIL_DRAFT_PROMPT.format(
-                first_name=customer_data.get('first_name', ''),
-                last_name=customer_data.get('last_name', ''),
-                company=customer_data.get('company', 'N/A'),
-                stage=customer_data.get('stage', 'lead'),
-                context=context,
-                email_type=email_type,
-                product_interests=product_interests_text
-            )
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
+            prompt = self._email_draft_prompt(customer_data, context, email_type, product_interests)
+            return self._complete(prompt, max_tokens=500, temperature=0.7, use_cache=use_cache)
             
         except Exception as e:
             st.error(f"Error generating email draft: {e}")
             return "Unable to generate email draft at this time."
     
-    def analyze_sentiment(self, text: str) -> str:
+    def stream_email_draft(self, customer_data: Dict, context: str, email_type: str = "follow_up", product_interests: List[Dict] = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Like generate_email_draft, but yields the text as it arrives and errors propagate.
+        """
+        prompt = self._email_draft_prompt(customer_data, context, email_type, product_interests)
+        yield from self._complete_stream(prompt, max_tokens=500, temperature=0.7, use_cache=use_cache)
+    
+    def analyze_sentiment(self, text: str, use_cache: bool = True) -> str:
         """
         Analyze sentiment of interaction text.
         """
         try:
             prompt = SENTIMENT_ANALYSIS_PROMPT.format(text=text)
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=10,
-                temperature=0.3
-            )
-            
-            sentiment = response.choices[0].message.content.strip().lower()
+            sentiment = self._complete(prompt, max_tokens=10, temperature=0.3, use_cache=use_cache).strip().lower()
             
             # Validate sentiment
-            if sentiment in ['positive', 'neutral', 'negative']:
+            if sentiment in SENTIMENTS:
                 return sentiment
             else:
                 return 'neutral'  # Default fallback
@@ -173,198 +266,247 @@ class OpenAIClient:
             st.error(f"Error analyzing sentiment: {e}")
             return 'neutral'
     
-    def generate_sales_advice(self, customer_data: Dict, interactions: List[Dict], question: str, product_interests: List[Dict] = None, available_products: List[Dict] = None) -> str:
+    def classify_sentiments(self, texts: List[str], use_cache: bool = True) -> List[Optional[str]]:
         """
-        Generate AI-powered sales advice based on customer context, interactions, and product interests.
+        Classify the sentiment of many interaction texts in one request with JSON output.
+        Returns 'positive', 'neutral' or 'negative' per text, in order, or None
+        for a text the model left out of its answer; empty texts are 'neutral'.
+        Errors propagate, unlike analyze_sentiment; this is meant for batch jobs.
         """
+        results: List[Optional[str]] = ['neutral' if not (text or '').strip() else None for text in texts]
+        pending = [index for index, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        
+        items = "\n".join(
+            json.dumps({'id': index, 'text': texts[index][:MAX_SENTIMENT_TEXT_CHARS]}, ensure_ascii=False)
+            for index in pending
+        )
+        prompt = BATCH_SENTIMENT_PROMPT.format(count=len(pending), items=items)
+        # About a dozen tokens per result entry, plus the wrapper
+        options = dict(max_tokens=30 + 15 * len(pending), temperature=0, response_format={"type": "json_object"})
         try:
-            # Format interactions
-            interactions_text = ""
-            for interaction in interactions[:3]:  # Last 3 interactions
-                interactions_text += f"- {interaction.get('type', 'Unknown')}: {interaction.get('content', 'No content')[:100]}...\n"
-            
-            # Format product interests
-            product_interests_text = "No specific product interests identified yet."
-            if product_interests:
-                product_interests_text = ""
-                for interest in product_interests:
-                    product = interest.get('product', {})
-                    product_interests_text += f"- {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')}) - {interest.get('sentiment', 'Unknown sentiment')}\n"
-            
-            # Format available products with more detail
-            available_products_text = "No product information available."
-            if available_products:
-                available_products_text = "Our Luxe Couture Collection:\n"
-                for product in available_products[:8]:  # Top 8 products with more detail
-                    available_products_text += f"""
+            answer = json.loads(self._complete(prompt, use_cache=use_cache, **options))
+        except json.JSONDecodeError:
+            if not use_cache:
+                raise
+            # A truncated answer may have been cached; ask again and overwrite it
+            answer = json.loads(self._complete(prompt, use_cache=False, **options))
+        
+        for entry in answer.get('results', []) if isinstance(answer, dict) else []:
+            index = entry.get('id') if isinstance(entry, dict) else None
+            sentiment = str(entry.get('sentiment', '')).strip().lower() if isinstance(entry, dict) else ''
+            if index in pending and sentiment in SENTIMENTS:
+                results[index] = sentiment
+        return results
+    
+    def _sales_advice_prompt(self, customer_data: Dict, interactions: List[Dict], question: str, product_interests: List[Dict] = None, available_products: List[Dict] = None) -> str:
+        """Render the sales advice prompt."""
+        # Format interactions
+        interactions_text = ""
+        for interaction in interactions[:3]:  # Last 3 interactions
+            interactions_text += f"- {interaction.get('type', 'Unknown')}: {interaction.get('content', 'No content')[:100]}...\n"
+        
+        # Format product interests
+        product_interests_text = "No specific product interests identified yet."
+        if product_interests:
+            product_interests_text = ""
+            for interest in product_interests:
+                product = interest.get('product', {})
+                product_interests_text += f"- {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')}) - {interest.get('sentiment', 'Unknown sentiment')}\n"
+        
+        # Format available products with more detail
+        available_products_text = "No product information available."
+        if available_products:
+            available_products_text = "Our Luxe Couture Collection:\n"
+            for product in available_products[:8]:  # Top 8 products with more detail
+                available_products_text += f"""
 - {product.get('name', 'Unknown Product')} ({product.get('category', 'Unknown Category')})
   Price: ${product.get('price', 0):,.2f}
   Description: {product.get('description', 'No description')[:150]}...
   Brand: {product.get('brand', 'Luxe Couture')}
 """
-            
-            # Use the enhanced prompt template
-            prompt = SALES_ADVICE_PROMPT.format(
-                first_name=customer_data.get('first_name', ''),
-                last_name=customer_data.get('last_name', ''),
-                company=customer_data.get('company', 'N/A'),
-                stage=customer_data.get('stage', 'lead'),
-                interactions=interactions_text,
-                product_interests=product_interests_text,
-                available_products=available_products_text,
-                question=question
-            )
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=400,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
+        
+        # Use the enhanced prompt template
+        prompt = SALES_ADVICE_PROMPT.format(
+            first_name=customer_data.get('first_name', ''),
+            last_name=customer_data.get('last_name', ''),
+            company=customer_data.get('company', 'N/A'),
+            stage=customer_data.get('stage', 'lead'),
+            interactions=interactions_text,
+            product_interests=product_interests_text,
+            available_products=available_products_text,
+            question=question
+        )
+        
+        return prompt
+    
+    def generate_sales_advice(self, customer_data: Dict, interactions: List[Dict], question: str, product_interests: List[Dict] = None, available_products: List[Dict] = None, use_cache: bool = True) -> str:
+        """
+        Generate AI-powered sales advice based on customer context, interactions, and product interests.
+        """
+        try:
+            prompt = self._sales_advice_prompt(customer_data, interactions, question, product_interests, available_products)
+            return self._complete(prompt, max_tokens=400, temperature=0.7, use_cache=use_cache)
             
         except Exception as e:
             st.error(f"Error generating sales advice: {e}")
             return "Unable to generate advice at this time."
     
-    def generate_web_social_intelligence(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None) -> str:
+    def stream_sales_advice(self, customer_data: Dict, interactions: List[Dict], question: str, product_interests: List[Dict] = None, available_products: List[Dict] = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Like generate_sales_advice, but yields the text as it arrives and errors propagate.
+        """
+        prompt = self._sales_advice_prompt(customer_data, interactions, question, product_interests, available_products)
+        yield from self._complete_stream(prompt, max_tokens=400, temperature=0.7, use_cache=use_cache)
+    
+    def _web_social_intelligence_prompt(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None) -> str:
+        """Render the web & social intelligence prompt."""
+        # Format customer data
+        customer_name = f"{customer_data.get('first_name', '')} {customer_data.get('last_name', '')}"
+        company = customer_data.get('company', 'N/A')
+        
+        # Format recent interactions
+        interactions_text = ""
+        for interaction in interactions[:3]:
+            interactions_text += f"- {interaction.get('type', 'Unknown')}: {interaction.get('content', 'No content')[:100]}...\n"
+        
+        # Format transaction data
+        transactions_text = "No purchase history available."
+        if transactions:
+            transactions_text = ""
+            for transaction in transactions[:5]:
+                product = transaction.get('products', {})
+                transactions_text += f"- {product.get('name', 'Unknown Product')} (${transaction.get('total_amount', 0):,.2f}) - {transaction.get('transaction_date', 'Unknown date')}\n"
+        
+        prompt = f"""
+        Analyze this customer for Web & Social Intelligence insights:
+        
+        Customer: {customer_name}
+        Company: {company}
+        Industry: Luxury Fashion/Entertainment
+        
+        Recent Interactions:
+        {interactions_text}
+        
+        Purchase History:
+        {transactions_text}
+        
+        Provide comprehensive Web & Social Intelligence analysis including:
+        1. **Company Intelligence**: Industry analysis, company size, recent news/events
+        2. **Social Media Presence**: Public profile analysis, engagement patterns, influence level
+        3. **Professional Network**: LinkedIn connections, industry relationships, endorsements
+        4. **Recent Mentions**: News coverage, media appearances, public statements
+        5. **Market Intelligence**: Industry trends affecting their business, competitive landscape
+        6. **Influence Assessment**: Their impact on fashion/entertainment industry
+        7. **Opportunity Identification**: Potential collaboration or business opportunities
+        
+        Focus on actionable insights for luxury fashion sales and relationship building.
+        Be specific and reference their industry context.
+        """
+        
+        return prompt
+    
+    def generate_web_social_intelligence(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None, use_cache: bool = True) -> str:
         """
         Generate AI-powered Web & Social Intelligence analysis.
         """
         try:
-            # Format customer data
-            customer_name = f"{customer_data.get('first_name', '')} {customer_data.get('last_name', '')}"
-            company = customer_data.get('company', 'N/A')
-            
-            # Format recent interactions
-            interactions_text = ""
-            for interaction in interactions[:3]:
-                interactions_text += f"- {interaction.get('type', 'Unknown')}: {interaction.get('content', 'No content')[:100]}...\n"
-            
-            # Format transaction data
-            transactions_text = "No purchase history available."
-            if transactions:
-                transactions_text = ""
-                for transaction in transactions[:5]:
-                    product = transaction.get('products', {})
-                    transactions_text += f"- {product.get('name', 'Unknown Product')} (${transaction.get('total_amount', 0):,.2f}) - {transaction.get('transaction_date', 'Unknown date')}\n"
-            
-            prompt = f"""
-            Analyze this customer for Web & Social Intelligence insights:
-            
-            Customer: {customer_name}
-            Company: {company}
-            Industry: Luxury Fashion/Entertainment
-            
-            Recent Interactions:
-            {interactions_text}
-            
-            Purchase History:
-            {transactions_text}
-            
-            Provide comprehensive Web & Social Intelligence analysis including:
-            1. **Company Intelligence**: Industry analysis, company size, recent news/events
-            2. **Social Media Presence**: Public profile analysis, engagement patterns, influence level
-            3. **Professional Network**: LinkedIn connections, industry relationships, endorsements
-            4. **Recent Mentions**: News coverage, media appearances, public statements
-            5. **Market Intelligence**: Industry trends affecting their business, competitive landscape
-            6. **Influence Assessment**: Their impact on fashion/entertainment industry
-            7. **Opportunity Identification**: Potential collaboration or business opportunities
-            
-            Focus on actionable insights for luxury fashion sales and relationship building.
-            Be specific and reference their industry context.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=600,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
+            prompt = self._web_social_intelligence_prompt(customer_data, interactions, transactions)
+            return self._complete(prompt, max_tokens=600, temperature=0.7, use_cache=use_cache)
             
         except Exception as e:
             st.error(f"Error generating web & social intelligence: {e}")
             return "Unable to generate web & social intelligence analysis at this time."
     
-    def generate_behavioral_analysis(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None) -> str:
+    def stream_web_social_intelligence(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Like generate_web_social_intelligence, but yields the text as it arrives and errors propagate.
+        """
+        prompt = self._web_social_intelligence_prompt(customer_data, interactions, transactions)
+        yield from self._complete_stream(prompt, max_tokens=600, temperature=0.7, use_cache=use_cache)
+    
+    def _behavioral_analysis_prompt(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None) -> str:
+        """Render the behavioral analysis prompt."""
+        # Format customer data
+        customer_name = f"{customer_data.get('first_name', '')} {customer_data.get('last_name', '')}"
+        stage = customer_data.get('stage', 'lead')
+        
+        # Format interactions with sentiment analysis
+        interactions_text = ""
+        sentiment_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
+        
+        for interaction in interactions:
+            sentiment = interaction.get('sentiment', 'neutral')
+            sentiment_counts[sentiment] += 1
+            interactions_text += f"- {interaction.get('type', 'Unknown')} ({sentiment}): {interaction.get('content', 'No content')[:100]}...\n"
+        
+        # Format transaction behavior
+        transactions_text = "No purchase history available."
+        if transactions:
+            total_spent = sum(t.get('total_amount', 0) for t in transactions)
+            avg_transaction = total_spent / len(transactions) if transactions else 0
+            categories = [t.get('products', {}).get('category', 'Unknown') for t in transactions]
+            
+            transactions_text = f"""
+            Purchase Behavior:
+            - Total Transactions: {len(transactions)}
+            - Total Spent: ${total_spent:,.2f}
+            - Average Transaction: ${avg_transaction:,.2f}
+            - Preferred Categories: {', '.join(set(categories))}
+            """
+        
+        prompt = f"""
+        Analyze this customer's behavioral patterns:
+        
+        Customer: {customer_name}
+        Current Stage: {stage}
+        
+        Interaction History:
+        {interactions_text}
+        
+        Sentiment Analysis:
+        - Positive: {sentiment_counts['positive']}
+        - Neutral: {sentiment_counts['neutral']}
+        - Negative: {sentiment_counts['negative']}
+        
+        {transactions_text}
+        
+        Provide comprehensive Behavioral Analysis including:
+        1. **Communication Patterns**: Preferred communication methods, response times, engagement style
+        2. **Decision-Making Behavior**: How they make purchasing decisions, factors that influence them
+        3. **Buying Behavior**: Purchase patterns, price sensitivity, brand loyalty, frequency
+        4. **Relationship Dynamics**: How they interact with sales team, trust-building patterns
+        5. **Risk Tolerance**: Conservative vs. adventurous purchasing behavior
+        6. **Influence Factors**: What motivates their decisions, key stakeholders
+        7. **Timing Patterns**: Best times to contact, seasonal preferences, urgency indicators
+        8. **Personal Preferences**: Style preferences, quality expectations, service requirements
+        9. **Engagement Level**: Active vs. passive customer, responsiveness patterns
+        10. **Recommendations**: How to best approach and serve this customer
+        
+        Focus on actionable insights for sales strategy and customer relationship management.
+        """
+        
+        return prompt
+    
+    def generate_behavioral_analysis(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None, use_cache: bool = True) -> str:
         """
         Generate AI-powered Behavioral Analysis.
         """
         try:
-            # Format customer data
-            customer_name = f"{customer_data.get('first_name', '')} {customer_data.get('last_name', '')}"
-            stage = customer_data.get('stage', 'lead')
-            
-            # Format interactions with sentiment analysis
-            interactions_text = ""
-            sentiment_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
-            
-            for interaction in interactions:
-                sentiment = interaction.get('sentiment', 'neutral')
-                sentiment_counts[sentiment] += 1
-                interactions_text += f"- {interaction.get('type', 'Unknown')} ({sentiment}): {interaction.get('content', 'No content')[:100]}...\n"
-            
-            # Format transaction behavior
-            transactions_text = "No purchase history available."
-            if transactions:
-                total_spent = sum(t.get('total_amount', 0) for t in transactions)
-                avg_transaction = total_spent / len(transactions) if transactions else 0
-                categories = [t.get('products', {}).get('category', 'Unknown') for t in transactions]
-                
-                transactions_text = f"""
-                Purchase Behavior:
-                - Total Transactions: {len(transactions)}
-                - Total Spent: ${total_spent:,.2f}
-                - Average Transaction: ${avg_transaction:,.2f}
-                - Preferred Categories: {', '.join(set(categories))}
-                """
-            
-            prompt = f"""
-            Analyze this customer's behavioral patterns:
-            
-            Customer: {customer_name}
-            Current Stage: {stage}
-            
-            Interaction History:
-            {interactions_text}
-            
-            Sentiment Analysis:
-            - Positive: {sentiment_counts['positive']}
-            - Neutral: {sentiment_counts['neutral']}
-            - Negative: {sentiment_counts['negative']}
-            
-            {transactions_text}
-            
-            Provide comprehensive Behavioral Analysis including:
-            1. **Communication Patterns**: Preferred communication methods, response times, engagement style
-            2. **Decision-Making Behavior**: How they make purchasing decisions, factors that influence them
-            3. **Buying Behavior**: Purchase patterns, price sensitivity, brand loyalty, frequency
-            4. **Relationship Dynamics**: How they interact with sales team, trust-building patterns
-            5. **Risk Tolerance**: Conservative vs. adventurous purchasing behavior
-            6. **Influence Factors**: What motivates their decisions, key stakeholders
-            7. **Timing Patterns**: Best times to contact, seasonal preferences, urgency indicators
-            8. **Personal Preferences**: Style preferences, quality expectations, service requirements
-            9. **Engagement Level**: Active vs. passive customer, responsiveness patterns
-            10. **Recommendations**: How to best approach and serve this customer
-            
-            Focus on actionable insights for sales strategy and customer relationship management.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=700,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
+            prompt = self._behavioral_analysis_prompt(customer_data, interactions, transactions)
+            return self._complete(prompt, max_tokens=700, temperature=0.7, use_cache=use_cache)
             
         except Exception as e:
             st.error(f"Error generating behavioral analysis: {e}")
             return "Unable to generate behavioral analysis at this time."
+    
+    def stream_behavioral_analysis(self, customer_data: Dict, interactions: List[Dict], transactions: List[Dict] = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Like generate_behavioral_analysis, but yields the text as it arrives and errors propagate.
+        """
+        prompt = self._behavioral_analysis_prompt(customer_data, interactions, transactions)
+        yield from self._complete_stream(prompt, max_tokens=700, temperature=0.7, use_cache=use_cache)
 
 # Singleton instance
 _ai_client = None
@@ -74,6 +74,15 @@ Text: {text}
 Consider the overall tone, language, and context.
 """
 
+BATCH_SENTIMENT_PROMPT = """
+Analyze the sentiment of each of these {count} customer interaction texts. Each line is a JSON object with an id and a text.
+
+{items}
+
+Consider the overall tone, language, and context of each text on its own.
+Respond with a JSON object of the form {{"results": [{{"id": 0, "sentiment": "positive"}}, ...]}} with exactly one entry per id, where sentiment is one of: positive, neutral, negative.
+"""
+
 SALES_ADVICE_PROMPT = """
 You are an AI sales assistant helping a sales representative at Luxe Couture, a luxury fashion brand. You provide strategic advice to help the sales rep better serve their customer.
 
@@ -0,0 +1,371 @@
+# ai/sentiment_model.py
+"""
+Local first tier for interaction sentiment, with the LLM as fallback.
+
+SentimentModel is a multinomial naive Bayes classifier over word unigrams
+and bigrams, trained on interactions the LLM has labelled (see
+ai.backfill_sentiment). Until a trained model file exists it falls back
+to a small lexicon. Either way it runs in well under a millisecond on CPU.
+
+TieredSentimentClassifier answers from the local model when its confidence
+reaches the threshold and asks the LLM otherwise. It tracks how often the
+two agree, per confidence band, to guide tuning the threshold; a small
+share of confident answers is also checked against the LLM in the
+background for that purpose.
+
+Train and see the offline agreement report (from the AiCRMv1 directory):
+    python -m ai.sentiment_model [--output sentiment_model.json] [--any-source]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from database.supabase_client import SupabaseClient
+
+from .openai_client import SENTIMENTS, SENTIMENT_SOURCE, get_ai_client
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_MODEL_PATH = os.environ.get("AICRM_SENTIMENT_MODEL", "sentiment_model.json")
+
+# Local answers at or above this confidence skip the LLM
+SENTIMENT_CONFIDENCE_THRESHOLD = float(os.environ.get("AICRM_SENTIMENT_THRESHOLD", "0.8"))
+
+# Share of confident local answers re-checked by the LLM in the background
+SENTIMENT_AUDIT_RATE = float(os.environ.get("AICRM_SENTIMENT_AUDIT_RATE", "0.05"))
+
+# Recorded in interactions.sentiment_source for local answers, by the
+# trained model and by the lexicon it falls back to before training
+LOCAL_SOURCE = "local:nb-v1"
+LEXICON_SOURCE = "local:lexicon-v1"
+
+# Confidence bands for agreement tracking, by lower bound
+CONFIDENCE_BANDS = (0.0, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+# Labelled examples needed before the trained model replaces the lexicon
+MIN_TRAINING_EXAMPLES = 50
+
+POSITIVE_WORDS = frozenset("""
+    love loved loves lovely great excellent happy pleased delighted perfect beautiful gorgeous stunning elegant
+    excited thrilled impressed wonderful fantastic amazing satisfied thanks thank grateful appreciate appreciated
+    recommend recommended enjoy enjoyed interested keen eager ready purchase purchased bought ordered confirmed
+    booked referral returning loyal favorite favourite best
+""".split())
+
+NEGATIVE_WORDS = frozenset("""
+    disappointed disappointing unhappy upset annoyed angry frustrated complaint complained complain cancel
+    cancelled canceled refund return returned late delay delayed damaged defect defective wrong
+    poor bad terrible awful horrible rude broken worse worst expensive overpriced issue issues problem problems
+    unresolved slow never lost missing dissatisfied hesitant concerned concern
+""".split())
+
+_NEGATORS = frozenset("not no never dont don't didn't doesn't isn't wasn't won't can't cannot nothing".split())
+
+# Words after a negator that it applies to, so in "not happy with the delay"
+# only "happy with the" are negated
+NEGATION_SCOPE = 3
+
+_TOKEN = re.compile(r"[a-z']+|[.!?,;]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased words, with the NEGATION_SCOPE words following a negator
+    (fewer at punctuation) prefixed 'not_' so "not happy" is not read as happy.
+    """
+    tokens, negated = [], 0
+    for token in _TOKEN.findall((text or '').lower()):
+        if token in '.!?,;':
+            negated = 0
+        elif token in _NEGATORS:
+            negated = NEGATION_SCOPE
+            tokens.append(token)
+        elif negated:
+            negated -= 1
+            tokens.append(f"not_{token}")
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def features(text: str) -> List[str]:
+    """Unigrams and bigrams of the tokenized text."""
+    tokens = tokenize(text)
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def lexicon_sentiment(text: str) -> Tuple[str, float]:
+    """
+    (label, confidence) from counting lexicon words; negated words count
+    for the other side. Texts with no lexicon words are neutral at low confidence.
+    """
+    score = 0
+    for token in tokenize(text):
+        negated = token.startswith('not_')
+        word = token[4:] if negated else token
+        polarity = (word in POSITIVE_WORDS) - (word in NEGATIVE_WORDS)
+        score += -polarity if negated else polarity
+    if score == 0:
+        return 'neutral', 0.4
+    # One net word is a hint, three or more is fairly sure
+    return ('positive' if score > 0 else 'negative'), min(0.95, 0.55 + 0.15 * abs(score))
+
+
+class SentimentModel:
+    """
+    Multinomial naive Bayes over features(), with add-one smoothing.
+    Untrained models answer with lexicon_sentiment.
+    """
+
+    def __init__(self, class_counts: Optional[Dict[str, int]] = None,
+                 feature_counts: Optional[Dict[str, Dict[str, int]]] = None):
+        self.class_counts = class_counts or {}
+        self.feature_counts = feature_counts or {}
+        self._prepare()
+
+    def _prepare(self) -> None:
+        """Precompute the log probabilities predict() needs."""
+        vocabulary = set()
+        for counts in self.feature_counts.values():
+            vocabulary.update(counts)
+        total = sum(self.class_counts.values())
+        self._log_priors = {
+            label: math.log(count / total) for label, count in self.class_counts.items() if count
+        }
+        self._totals = {
+            label: sum(self.feature_counts.get(label, {}).values()) + len(vocabulary) for label in self._log_priors
+        }
+        self._vocabulary = vocabulary
+
+    @property
+    def trained(self) -> bool:
+        return sum(self.class_counts.values()) >= MIN_TRAINING_EXAMPLES and len(self._log_priors) > 1
+
+    @property
+    def source(self) -> str:
+        """sentiment_source for this model's answers: LOCAL_SOURCE, or LEXICON_SOURCE untrained."""
+        return LOCAL_SOURCE if self.trained else LEXICON_SOURCE
+
+    @classmethod
+    def train(cls, examples: Iterable[Tuple[str, str]]) -> "SentimentModel":
+        """Fit on (text, label) pairs; labels outside SENTIMENTS are ignored."""
+        class_counts: Dict[str, int] = {}
+        feature_counts: Dict[str, Dict[str, int]] = {}
+        for text, label in examples:
+            if label not in SENTIMENTS:
+                continue
+            class_counts[label] = class_counts.get(label, 0) + 1
+            counts = feature_counts.setdefault(label, {})
+            for feature in features(text):
+                counts[feature] = counts.get(feature, 0) + 1
+        return cls(class_counts, feature_counts)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """(label, confidence), where confidence is the label's posterior probability."""
+        if not self.trained:
+            return lexicon_sentiment(text)
+
+        known = [feature for feature in features(text) if feature in self._vocabulary]
+        scores = {}
+        for label, log_prior in self._log_priors.items():
+            counts = self.feature_counts.get(label, {})
+            total = self._totals[label]
+            scores[label] = log_prior + sum(math.log((counts.get(feature, 0) + 1) / total) for feature in known)
+
+        best = max(scores, key=scores.get)
+        # Softmax of the log scores, shifted for stability
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / normalizer
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'class_counts': self.class_counts, 'feature_counts': self.feature_counts}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "SentimentModel":
+        """The model saved at path, or an untrained (lexicon) model if there is none."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('class_counts'), data.get('feature_counts'))
+
+
+@dataclass(frozen=True)
+class SentimentResult:
+    label: str
+    confidence: float
+    source: str
+
+
+def _band(confidence: float) -> str:
+    lower = max(bound for bound in CONFIDENCE_BANDS if confidence >= bound)
+    return f"{lower:.1f}+"
+
+
+class TieredSentimentClassifier:
+    """
+    Local model first, llm_classify below threshold. llm_classify returns a
+    label, or None when it has no answer; its errors fall back to the local
+    label. Thread-safe.
+    """
+
+    def __init__(self, model: SentimentModel, llm_classify: Callable[[str], Optional[str]],
+                 threshold: float = SENTIMENT_CONFIDENCE_THRESHOLD, audit_rate: float = SENTIMENT_AUDIT_RATE,
+                 llm_source: str = SENTIMENT_SOURCE):
+        self.model = model
+        self.llm_classify = llm_classify
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.llm_source = llm_source
+        self._lock = threading.Lock()
+        self._answered = {'local': 0, 'llm': 0}
+        # local source -> confidence band -> [agreed, compared]
+        self._agreement: Dict[str, Dict[str, List[int]]] = {}
+        self._audits = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sentiment-audit")
+        self._random = random.Random()
+
+    def classify(self, text: str) -> SentimentResult:
+        local_label, confidence = self.model.predict(text)
+        if confidence >= self.threshold:
+            self._count('local')
+            if self.audit_rate and self._random.random() < self.audit_rate:
+                self._audits.submit(self._audit, text, local_label, confidence, self.model.source)
+            return SentimentResult(local_label, confidence, self.model.source)
+
+        try:
+            llm_label = self.llm_classify(text)
+        except Exception as e:
+            logger.warning(f"LLM sentiment fallback failed, using the local label: {e}")
+            llm_label = None
+        if llm_label is None:
+            self._count('local')
+            return SentimentResult(local_label, confidence, self.model.source)
+
+        self._count('llm')
+        self._record_agreement(self.model.source, confidence, local_label == llm_label)
+        return SentimentResult(llm_label, confidence, self.llm_source)
+
+    def _audit(self, text: str, local_label: str, confidence: float, local_source: str) -> None:
+        """Check a confident local answer against the LLM, for the agreement stats only."""
+        try:
+            llm_label = self.llm_classify(text)
+        except Exception as e:
+            logger.warning(f"Sentiment audit failed: {e}")
+            return
+        if llm_label is not None:
+            self._record_agreement(local_source, confidence, local_label == llm_label)
+
+    def _count(self, tier: str) -> None:
+        with self._lock:
+            self._answered[tier] += 1
+
+    def _record_agreement(self, local_source: str, confidence: float, agreed: bool) -> None:
+        with self._lock:
+            band = self._agreement.setdefault(local_source, {}).setdefault(_band(confidence), [0, 0])
+            band[0] += agreed
+            band[1] += 1
+
+    def stats(self) -> Dict:
+        """
+        Answers per tier and local/LLM agreement per local source and
+        confidence band, e.g.
+        {'local': 90, 'llm': 10, 'local_share': 0.9, 'threshold': 0.8,
+         'agreement': {'local:nb-v1': {'0.6+': {'compared': 8, 'rate': 0.75}, ...}}}.
+        """
+        with self._lock:
+            answered = dict(self._answered)
+            agreement = {
+                source: {
+                    band: {'compared': total, 'rate': agreed / total}
+                    for band, (agreed, total) in sorted(bands.items())
+                }
+                for source, bands in sorted(self._agreement.items())
+            }
+        total = answered['local'] + answered['llm']
+        return {
+            **answered,
+            'local_share': answered['local'] / total if total else 0.0,
+            'threshold': self.threshold,
+            'agreement': agreement,
+        }
+
+
+def _llm_classify(text: str) -> Optional[str]:
+    """Single-text LLM tier through the batch prompt, so labels match the backfill's."""
+    return get_ai_client().classify_sentiments([text])[0]
+
+
+# Singleton instance
+_sentiment_classifier = None
+
+
+def get_sentiment_classifier() -> TieredSentimentClassifier:
+    """Get the singleton classifier with the model at SENTIMENT_MODEL_PATH."""
+    global _sentiment_classifier
+    if _sentiment_classifier is None:
+        _sentiment_classifier = TieredSentimentClassifier(SentimentModel.load(SENTIMENT_MODEL_PATH), _llm_classify)
+    return _sentiment_classifier
+
+
+def threshold_report(model: SentimentModel, examples: List[Tuple[str, str]],
+                     thresholds: Iterable[float] = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)) -> List[Dict]:
+    """
+    For each threshold: the share of examples the local tier would answer
+    and how often it agrees with the reference labels on those; the rest go
+    to the LLM.
+    """
+    predictions = [(model.predict(text), label) for text, label in examples]
+    report = []
+    for threshold in thresholds:
+        covered = [(predicted, label) for (predicted, confidence), label in predictions if confidence >= threshold]
+        report.append({
+            'threshold': threshold,
+            'local_share': len(covered) / len(predictions) if predictions else 0.0,
+            'agreement': sum(predicted == label for predicted, label in covered) / len(covered) if covered else None,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local sentiment model on labelled interactions.")
+    parser.add_argument("--output", default=SENTIMENT_MODEL_PATH, help="Where to save the model")
+    parser.add_argument("--source", default=SENTIMENT_SOURCE,
+                        help="Train on interactions labelled by this sentiment_source (default: the LLM backfill)")
+    parser.add_argument("--any-source", action="store_true", help="Train on every interaction with a sentiment")
+    args = parser.parse_args()
+
+    examples = [
+        (row['content'], row['sentiment'])
+        for row in SupabaseClient().iter_table_rows('interactions', "id, content, sentiment, sentiment_source")
+        if row.get('content') and row.get('sentiment') in SENTIMENTS
+        and (args.any_source or row.get('sentiment_source') == args.source)
+    ]
+    if len(examples) < MIN_TRAINING_EXAMPLES:
+        print(f"Only {len(examples)} labelled interactions; need {MIN_TRAINING_EXAMPLES}. "
+              f"Run python -m ai.backfill_sentiment first, or pass --any-source.")
+        return
+
+    # Hold out every fifth example for the report, then train on everything
+    held_out = examples[::5]
+    report = threshold_report(SentimentModel.train(example for i, example in enumerate(examples) if i % 5), held_out)
+    print(f"Agreement with {'all' if args.any_source else args.source} labels on {len(held_out)} held-out interactions:")
+    for row in report:
+        agreement = f"{row['agreement']:.1%}" if row['agreement'] is not None else "n/a"
+        print(f"  threshold {row['threshold']:.2f}: {row['local_share']:.1%} answered locally, {agreement} agree")
+
+    SentimentModel.train(examples).save(args.output)
+    print(f"Saved model trained on {len(examples)} interactions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
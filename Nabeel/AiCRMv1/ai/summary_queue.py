@@ -0,0 +1,312 @@
+# ai/summary_queue.py
+"""
+Background regeneration of AI customer summaries.
+
+The triggers in database/migrations/006_ai_summary_queue.sql queue a customer
+in ai_summary_queue whenever their interactions, transactions or profile
+change. SummaryWorker claims queued customers with claim_summary_queue, so
+several workers (app processes, cron) never take the same one, and
+regenerates them on a pool of threads, paced by a shared RateLimiter so the
+LLM request rate stays under the account limit. A customer written again
+while their summary was being generated stays queued for the next run.
+Hand-written summaries (ai_summary_generated_at cleared by the migration 006
+trigger) are never replaced.
+
+Nothing runs by default. Run the worker from cron, or set
+AICRM_SUMMARY_QUEUE_SECONDS to have each app process drain the queue that
+often and move a customer to the front when someone opens them:
+
+Usage (from the AiCRMv1 directory):
+    python -m ai.summary_queue [--workers 4] [--rpm 60] [--limit 100] [--all] [--watch 300]
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+import openai
+
+from database.async_supabase_client import error_sink
+from database.customer_360 import CustomerBundle, aload_customer_360
+from database.supabase_client import SupabaseClient, get_supabase_client
+
+from .openai_client import OpenAIClient, get_ai_client
+
+logger = logging.getLogger(__name__)
+
+# Summaries generated at once
+SUMMARY_WORKERS = int(os.environ.get("AICRM_SUMMARY_WORKERS", "4"))
+
+# LLM requests per minute allowed to the summary workers together
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("AICRM_LLM_RPM", "60"))
+
+# How often the app's worker drains the queue, in seconds; 0 (the default) turns it off
+SUMMARY_QUEUE_INTERVAL_SECONDS = float(os.environ.get("AICRM_SUMMARY_QUEUE_SECONDS", "0"))
+
+# Retries of a rate-limited request, backing off from RATE_LIMIT_BACKOFF_SECONDS
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF_SECONDS = 5.0
+
+# Queue priorities; lower runs first
+_URGENT, _SCHEDULED = 0, 1
+
+
+class RateLimiter:
+    """
+    Spaces requests evenly at requests_per_minute across all threads
+    sharing it. pause() holds everyone back after a rate limit error.
+    """
+
+    def __init__(self, requests_per_minute: float = LLM_REQUESTS_PER_MINUTE):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def acquire(self) -> None:
+        """Block until this caller's request slot."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        """Grant no slot for the next seconds."""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+def load_summary_inputs(db: SupabaseClient, customer_id: int) -> CustomerBundle:
+    """
+    load_customer_360, but raising if any of its reads failed instead of
+    returning partial data, so a summary is never written from it.
+    """
+    async def load() -> CustomerBundle:
+        errors: List[str] = []
+        error_sink.set(errors)
+        bundle = await aload_customer_360(db.aio, customer_id)
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return bundle
+
+    return db.run(load())
+
+
+def regenerate_summary(db: SupabaseClient, ai: OpenAIClient, entry: Dict, limiter: RateLimiter) -> str:
+    """
+    Regenerate one claimed customer's summary and store it.
+    Returns 'updated', 'missing' if the customer no longer exists, or
+    'manual' if their summary was written by hand and is left alone.
+    Errors propagate and leave the customer queued.
+    """
+    bundle = load_summary_inputs(db, entry['customer_id'])
+    if bundle.customer is None:
+        db.clear_summary_queue([entry])
+        return 'missing'
+    if bundle.customer.get('ai_summary') and not bundle.customer.get('ai_summary_generated_at'):
+        db.clear_summary_queue([entry])
+        return 'manual'
+
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire()
+        try:
+            summary = ai.summarize_customer(
+                bundle.customer, list(bundle.interactions), list(bundle.product_interests),
+                list(bundle.products), list(bundle.transactions)
+            )
+            break
+        except openai.RateLimitError:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            limiter.pause(RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt)
+    if not summary:
+        raise ValueError("empty completion")
+
+    db.save_customer_summary(entry['customer_id'], summary, entry.get('marked_at'))
+    return 'updated'
+
+
+class SummaryWorker:
+    """
+    Pool of threads regenerating queued summaries. Each customer is worked
+    on by at most one thread at a time; urgent submissions jump the queue.
+    """
+
+    OUTCOMES = ('updated', 'missing', 'manual', 'failed')
+
+    def __init__(self, db: SupabaseClient, ai: OpenAIClient, workers: int = SUMMARY_WORKERS,
+                 limiter: Optional[RateLimiter] = None):
+        self.db = db
+        self.ai = ai
+        self.workers = workers
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        # customer_id -> (queue row, whether this worker holds its claim)
+        self._waiting: Dict[int, Tuple[Dict, bool]] = {}
+        self._running: Set[int] = set()
+        self._totals: Counter = Counter()
+        self._scheduler: Optional[threading.Thread] = None
+        for index in range(workers):
+            threading.Thread(target=self._work, name=f"ai-summary-{index}", daemon=True).start()
+
+    def submit(self, entry: Dict, urgent: bool = False, claimed: bool = False) -> bool:
+        """
+        Queue a summary queue row for regeneration. Unless claimed (it came
+        from claim_summary_queue), the row is claimed before generating and
+        skipped if another worker holds it. A customer already waiting is
+        only moved up when urgent; one being worked on is left alone.
+        Returns whether anything was queued.
+        """
+        customer_id = entry['customer_id']
+        with self._lock:
+            if customer_id in self._running:
+                return False
+            if customer_id in self._waiting:
+                if claimed:
+                    self._waiting[customer_id] = (entry, claimed)
+                if not urgent:
+                    return False
+            else:
+                self._waiting[customer_id] = (entry, claimed)
+        self._queue.put((_URGENT if urgent else _SCHEDULED, next(self._order), customer_id))
+        return True
+
+    def _work(self) -> None:
+        while True:
+            _, _, customer_id = self._queue.get()
+            try:
+                with self._lock:
+                    # An urgent resubmission already took this customer
+                    waiting = self._waiting.pop(customer_id, None)
+                    if waiting is None:
+                        continue
+                    self._running.add(customer_id)
+                entry, claimed = waiting
+                outcome = None
+                try:
+                    if not claimed:
+                        entry = next(iter(self.db.claim_summary_queue(1, customer_id)), None)
+                    if entry is not None:
+                        outcome = regenerate_summary(self.db, self.ai, entry, self.limiter)
+                except Exception as e:
+                    outcome = 'failed'
+                    logger.error(f"Failed to regenerate summary for customer {customer_id}: {e}")
+                with self._lock:
+                    self._running.discard(customer_id)
+                    if outcome is not None:
+                        self._totals[outcome] += 1
+            finally:
+                self._queue.task_done()
+
+    def run_once(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Claim and regenerate queued summaries, longest waiting first, a few
+        per worker thread at a time, until the queue has nothing claimable
+        or limit customers were claimed. Failed ones keep their claim until
+        it lapses, so they are retried by a later run, not this one.
+        Returns counts like {'updated': 40, 'missing': 1, 'manual': 3, 'failed': 2}.
+        """
+        before = self.stats()
+        claimed = 0
+        while limit is None or claimed < limit:
+            batch_size = max(self.workers, 1) * 2
+            entries = self.db.claim_summary_queue(batch_size if limit is None else min(batch_size, limit - claimed))
+            if not entries:
+                break
+            claimed += len(entries)
+            for entry in entries:
+                self.submit(entry, claimed=True)
+            self._queue.join()
+        after = self.stats()
+        return {outcome: after[outcome] - before[outcome] for outcome in self.OUTCOMES}
+
+    def start(self, interval_seconds: float = SUMMARY_QUEUE_INTERVAL_SECONDS) -> None:
+        """Run run_once every interval_seconds from a background thread; later calls do nothing."""
+        with self._lock:
+            if self._scheduler is not None:
+                return
+            self._scheduler = threading.Thread(
+                target=self._schedule, args=(interval_seconds,), name="ai-summary-scheduler", daemon=True
+            )
+        self._scheduler.start()
+
+    def _schedule(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                totals = self.run_once()
+                if any(totals.values()):
+                    logger.info(f"AI summaries: {totals['updated']} updated, {totals['failed']} failed")
+            except Exception as e:
+                logger.error(f"Failed to read the AI summary queue: {e}")
+            time.sleep(interval_seconds)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters since start, plus customers waiting and in progress."""
+        with self._lock:
+            return {
+                'waiting': len(self._waiting),
+                'running': len(self._running),
+                **{outcome: self._totals[outcome] for outcome in self.OUTCOMES},
+            }
+
+
+# Singleton instance for the app
+_summary_worker = None
+_summary_worker_lock = threading.Lock()
+
+def get_summary_worker() -> Optional[SummaryWorker]:
+    """
+    Get the app's scheduled summary worker, started on first use.
+    None when AICRM_SUMMARY_QUEUE_SECONDS is 0.
+    """
+    global _summary_worker
+    if SUMMARY_QUEUE_INTERVAL_SECONDS <= 0:
+        return None
+    with _summary_worker_lock:
+        if _summary_worker is None:
+            _summary_worker = SummaryWorker(get_supabase_client(), get_ai_client())
+            _summary_worker.start()
+    return _summary_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate out-of-date AI customer summaries.")
+    parser.add_argument("--workers", type=int, default=SUMMARY_WORKERS, help="Summaries generated at once")
+    parser.add_argument("--rpm", type=float, default=LLM_REQUESTS_PER_MINUTE, help="LLM requests per minute")
+    parser.add_argument("--limit", type=int, help="Stop after this many customers per run")
+    parser.add_argument("--all", action="store_true", help="Queue every customer first, e.g. after a prompt change")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="Keep running, re-reading the queue this often")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    db = SupabaseClient()
+    if args.all:
+        customer_ids = [row['id'] for row in db.iter_table_rows('customers', "id")]
+        if not db.enqueue_customer_summaries(customer_ids):
+            return
+        print(f"Queued {len(customer_ids)} customers")
+
+    worker = SummaryWorker(db, OpenAIClient(), args.workers, RateLimiter(args.rpm))
+    while True:
+        totals = worker.run_once(args.limit)
+        print(
+            f"Done: {totals['updated']} updated, {totals['missing']} missing, "
+            f"{totals['manual']} hand-written kept, {totals['failed']} failed"
+        )
+        if args.watch is None:
+            return
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
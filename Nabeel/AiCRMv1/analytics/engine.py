@@ -0,0 +1,166 @@
+# analytics/engine.py
+"""
+Vectorized analytics over the whole CRM.
+
+Customers, products, transactions and interactions are streamed into columnar
+pandas frames (only the columns analytics needs; analytics/snapshots.py loads
+them a span of days at a time), and every metric is computed with
+NumPy/pandas group-bys across all customers at once rather than with
+per-customer Python loops.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from database.async_supabase_client import PIPELINE_STAGES
+from database.sentiment_stats import SENTIMENTS, SENTIMENT_VALUES
+
+# Projected columns per table; everything else stays in the database
+CUSTOMER_COLUMNS = ('id', 'stage', 'created_at')
+PRODUCT_COLUMNS = ('id', 'name', 'category')
+TRANSACTION_COLUMNS = ('id', 'customer_id', 'product_id', 'total_amount', 'transaction_date')
+INTERACTION_COLUMNS = ('id', 'customer_id', 'type', 'date', 'sentiment')
+
+# Period options for the trend charts
+PERIODS = {'Daily': 'D', 'Weekly': 'W', 'Monthly': 'M', 'Quarterly': 'Q'}
+
+# pandas 2 parses mixed ISO-8601 precisions in one vectorized pass
+_ISO8601 = {'format': 'ISO8601'} if int(pd.__version__.split('.')[0]) >= 2 else {}
+
+
+@dataclass(frozen=True)
+class AnalyticsFrames:
+    """
+    Columnar snapshot of the CRM. Timestamps are naive UTC;
+    transactions carry their product category.
+    """
+    customers: pd.DataFrame
+    products: pd.DataFrame
+    transactions: pd.DataFrame
+    interactions: pd.DataFrame
+
+
+def _frame(rows: Iterable[Dict], columns: Sequence[str]) -> pd.DataFrame:
+    """Collect rows column by column, so no per-row dicts are kept around."""
+    data = {column: [] for column in columns}
+    appenders = [(column, data[column].append) for column in columns]
+    for row in rows:
+        for column, append in appenders:
+            append(row.get(column))
+    if not data[columns[0]]:
+        # Empty lists would become float columns and break the .str/.dt steps
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+    return pd.DataFrame(data, columns=list(columns))
+
+
+def _timestamps(values: pd.Series) -> pd.Series:
+    """Parse Supabase timestamps to naive UTC; unparseable values become NaT."""
+    return pd.to_datetime(values, utc=True, errors='coerce', **_ISO8601).dt.tz_localize(None)
+
+
+def build_frames(customers: Iterable[Dict], products: Iterable[Dict],
+                 transactions: Iterable[Dict], interactions: Iterable[Dict]) -> AnalyticsFrames:
+    """
+    Build analytics frames from row iterables (e.g. streamed from the database).
+    """
+    customer_frame = _frame(customers, CUSTOMER_COLUMNS)
+    customer_frame['stage'] = customer_frame['stage'].fillna('lead').str.lower().astype('category')
+    customer_frame['created_at'] = _timestamps(customer_frame['created_at'])
+
+    product_frame = _frame(products, PRODUCT_COLUMNS)
+
+    transaction_frame = _frame(transactions, TRANSACTION_COLUMNS)
+    transaction_frame['total_amount'] = pd.to_numeric(transaction_frame['total_amount'], errors='coerce').fillna(0.0)
+    transaction_frame['transaction_date'] = _timestamps(transaction_frame['transaction_date'])
+    categories = product_frame.set_index('id')['category']
+    transaction_frame['category'] = (
+        transaction_frame['product_id'].map(categories).fillna('Unknown').astype('category')
+    )
+
+    interaction_frame = _frame(interactions, INTERACTION_COLUMNS)
+    interaction_frame['type'] = interaction_frame['type'].fillna('note').astype('category')
+    interaction_frame['date'] = _timestamps(interaction_frame['date'])
+    interaction_frame['sentiment'] = pd.Categorical(
+        interaction_frame['sentiment'].fillna('neutral'), categories=SENTIMENTS
+    )
+
+    return AnalyticsFrames(customer_frame, product_frame, transaction_frame, interaction_frame)
+
+
+def revenue_by_period(transactions: pd.DataFrame, freq: str = 'M') -> pd.DataFrame:
+    """
+    Revenue, order count and average order value per period.
+    Indexed by period start timestamp.
+    """
+    dated = transactions[transactions['transaction_date'].notna()]
+    periods = dated['transaction_date'].dt.to_period(freq).dt.start_time.rename('period')
+
+    summary = dated.groupby(periods)['total_amount'].agg(revenue='sum', orders='count')
+    summary['average_order_value'] = summary['revenue'] / summary['orders']
+    return summary
+
+
+def category_mix(transactions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Revenue, order count and revenue share per product category, largest first.
+    """
+    mix = transactions.groupby('category', observed=True)['total_amount'].agg(revenue='sum', orders='count')
+    total = mix['revenue'].sum()
+    mix['share'] = mix['revenue'] / total if total else 0.0
+    return mix.sort_values('revenue', ascending=False)
+
+
+def average_order_value(transactions: pd.DataFrame) -> float:
+    """Mean transaction amount across all customers (0 with no transactions)."""
+    amounts = transactions['total_amount'].to_numpy()
+    return float(amounts.mean()) if len(amounts) else 0.0
+
+
+def stage_funnel(customers: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pipeline funnel: customers at each stage, customers who reached it
+    (that stage or any later one), and conversion from the previous stage.
+    """
+    return funnel_from_counts(customers['stage'].value_counts())
+
+
+def funnel_from_counts(stage_counts: pd.Series) -> pd.DataFrame:
+    """Build the stage_funnel table from customer counts indexed by stage."""
+    counts = stage_counts.reindex(list(PIPELINE_STAGES), fill_value=0)
+    reached = counts[::-1].cumsum()[::-1]
+    conversion = reached / reached.shift(1).replace(0, np.nan)
+    conversion.iloc[0] = 1.0
+
+    funnel = pd.DataFrame({'customers': counts, 'reached': reached, 'conversion': conversion.fillna(0.0)})
+    return funnel.rename_axis('stage')
+
+
+def sentiment_trend(interactions: pd.DataFrame, freq: str = 'W') -> pd.DataFrame:
+    """
+    Interaction counts by sentiment per period, plus the net score
+    (mean sentiment value, from -1 all negative to 1 all positive).
+    Indexed by period start timestamp.
+    """
+    dated = interactions[interactions['date'].notna()]
+    periods = dated['date'].dt.to_period(freq).dt.start_time.rename('period')
+
+    counts = dated.groupby([periods, dated['sentiment']], observed=False).size().unstack(fill_value=0)
+    return with_net_score(counts)
+
+
+def with_net_score(counts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Given per-period counts with one column per sentiment, add the net score
+    (mean sentiment value, from -1 all negative to 1 all positive).
+    """
+    counts = counts.reindex(columns=list(SENTIMENTS), fill_value=0)
+    values = np.array([SENTIMENT_VALUES[sentiment] for sentiment in SENTIMENTS])
+    totals = counts.to_numpy().sum(axis=1)
+    counts['net_score'] = np.divide(
+        counts.to_numpy() @ values, totals,
+        out=np.zeros(len(counts)), where=totals > 0
+    )
+    return counts
@@ -0,0 +1,200 @@
+# analytics/snapshots.py
+"""
+Precomputed daily analytics rollups.
+
+The job recomputes only the days the database triggers marked dirty since the
+last run (see database/migrations/003_daily_analytics_snapshots.sql) and
+replaces their rows in daily_analytics_snapshots. The Analytics page reads
+past days from there and computes only today live.
+
+Usage (from the AiCRMv1 directory, e.g. from cron every few minutes):
+    python -m analytics.snapshots [--max-span-days 31]
+"""
+
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from database.supabase_client import SupabaseClient
+
+from .engine import (
+    CUSTOMER_COLUMNS, INTERACTION_COLUMNS, PRODUCT_COLUMNS, TRANSACTION_COLUMNS,
+    AnalyticsFrames, build_frames, funnel_from_counts, with_net_score
+)
+
+SNAPSHOT_COLUMNS = ['day', 'metric', 'dimension', 'sentiment', 'count', 'amount']
+
+# Longest run of consecutive days loaded in one pass of the job
+DEFAULT_MAX_SPAN_DAYS = 31
+
+
+def daily_rollups(frames: AnalyticsFrames) -> pd.DataFrame:
+    """
+    Roll frames up into snapshot rows: revenue per category, new customers
+    per stage, and interactions per type and sentiment, for each day.
+    """
+    transactions = frames.transactions[frames.transactions['transaction_date'].notna()]
+    revenue = transactions.groupby(
+        [transactions['transaction_date'].dt.normalize().rename('day'), transactions['category'].rename('dimension')],
+        observed=True
+    )['total_amount'].agg(count='count', amount='sum').reset_index()
+    revenue['metric'] = 'revenue'
+    revenue['sentiment'] = ''
+
+    customers = frames.customers[frames.customers['created_at'].notna()]
+    new_customers = customers.groupby(
+        [customers['created_at'].dt.normalize().rename('day'), customers['stage'].rename('dimension')],
+        observed=True
+    ).size().reset_index(name='count')
+    new_customers['metric'] = 'new_customers'
+    new_customers['sentiment'] = ''
+    new_customers['amount'] = 0.0
+
+    interactions = frames.interactions[frames.interactions['date'].notna()]
+    interaction_counts = interactions.groupby(
+        [interactions['date'].dt.normalize().rename('day'), interactions['type'].rename('dimension'),
+         interactions['sentiment']],
+        observed=True
+    ).size().reset_index(name='count')
+    interaction_counts['metric'] = 'interactions'
+    interaction_counts['amount'] = 0.0
+
+    rollups = pd.concat([revenue, new_customers, interaction_counts], ignore_index=True)
+    for column in ('dimension', 'sentiment'):
+        rollups[column] = rollups[column].astype(str)
+    rollups['amount'] = rollups['amount'].round(2)
+    return rollups.reindex(columns=SNAPSHOT_COLUMNS)
+
+
+def load_day_frames(db: SupabaseClient, start: date, end: date,
+                    products: Optional[Iterable[Dict]] = None) -> AnalyticsFrames:
+    """
+    Load frames for rows dated start <= day < end.
+    products defaults to the whole catalog streamed from the database.
+    Errors propagate to the caller.
+    """
+    between = (start.isoformat(), end.isoformat())
+    if products is None:
+        products = db.iter_table_rows('products', ", ".join(PRODUCT_COLUMNS))
+    return build_frames(
+        db.iter_table_rows('customers', ", ".join(CUSTOMER_COLUMNS), between=('created_at', *between)),
+        products,
+        db.iter_table_rows('transactions', ", ".join(TRANSACTION_COLUMNS), between=('transaction_date', *between)),
+        db.iter_table_rows('interactions', ", ".join(INTERACTION_COLUMNS), between=('date', *between))
+    )
+
+
+def _day_ranges(days: List[date], max_span_days: int) -> List[Tuple[date, date]]:
+    """Group sorted days into [start, end) runs of consecutive days."""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day and (day - ranges[-1][0]).days < max_span_days:
+            ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+        else:
+            ranges.append((day, day + timedelta(days=1)))
+    return ranges
+
+
+def refresh_snapshots(db: SupabaseClient, max_span_days: int = DEFAULT_MAX_SPAN_DAYS) -> int:
+    """
+    Recompute snapshot rows for every dirty day and clear the marks.
+    Each run of consecutive days is committed on its own, so an interrupted
+    job resumes where it stopped. Returns the number of days refreshed.
+    """
+    dirty = db.get_analytics_dirty_days()
+    dirty_by_day = {date.fromisoformat(str(row['day'])[:10]): row for row in dirty}
+
+    products = list(db.iter_table_rows('products', ", ".join(PRODUCT_COLUMNS)))
+    for start, end in _day_ranges(sorted(dirty_by_day), max_span_days):
+        rollups = daily_rollups(load_day_frames(db, start, end, products))
+        rollups['day'] = rollups['day'].dt.strftime('%Y-%m-%d')
+
+        days = [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days)]
+        db.replace_daily_snapshots(days, rollups.to_dict('records'))
+        db.clear_analytics_dirty_days([dirty_by_day[date.fromisoformat(day)] for day in days])
+
+    return len(dirty_by_day)
+
+
+def load_daily_rollups(db: SupabaseClient, today: Optional[date] = None) -> pd.DataFrame:
+    """
+    Snapshot rows for every day before today plus today's rows computed live.
+    today defaults to the current UTC date. Errors loading today propagate.
+    """
+    today = today or datetime.utcnow().date()
+
+    history = pd.DataFrame(db.get_daily_snapshots(end_day=today.isoformat()), columns=SNAPSHOT_COLUMNS)
+    history['day'] = pd.to_datetime(history['day'])
+    live = daily_rollups(load_day_frames(db, today, today + timedelta(days=1), products=db.get_all_products()))
+
+    daily = pd.concat([history, live], ignore_index=True)
+    daily['count'] = daily['count'].astype('int64')
+    daily['amount'] = daily['amount'].astype(float)
+    return daily
+
+
+def _metric(daily: pd.DataFrame, metric: str) -> pd.DataFrame:
+    return daily[daily['metric'] == metric]
+
+
+def _periods(days: pd.Series, freq: str) -> pd.Series:
+    return days.dt.to_period(freq).dt.start_time.rename('period')
+
+
+def revenue_by_period(daily: pd.DataFrame, freq: str = 'M') -> pd.DataFrame:
+    """Same as engine.revenue_by_period, from daily rollups."""
+    revenue = _metric(daily, 'revenue')
+    summary = revenue.groupby(_periods(revenue['day'], freq)).agg(
+        revenue=('amount', 'sum'), orders=('count', 'sum')
+    )
+    summary['average_order_value'] = summary['revenue'] / summary['orders']
+    return summary
+
+
+def category_mix(daily: pd.DataFrame) -> pd.DataFrame:
+    """Same as engine.category_mix, from daily rollups."""
+    revenue = _metric(daily, 'revenue')
+    mix = revenue.groupby(revenue['dimension'].rename('category')).agg(
+        revenue=('amount', 'sum'), orders=('count', 'sum')
+    )
+    total = mix['revenue'].sum()
+    mix['share'] = mix['revenue'] / total if total else 0.0
+    return mix.sort_values('revenue', ascending=False)
+
+
+def stage_funnel(daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    Same as engine.stage_funnel, from daily rollups. Snapshots count new
+    customers by current stage, so summing every day gives today's pipeline.
+    """
+    new_customers = _metric(daily, 'new_customers')
+    return funnel_from_counts(new_customers.groupby('dimension')['count'].sum())
+
+
+def sentiment_trend(daily: pd.DataFrame, freq: str = 'W') -> pd.DataFrame:
+    """Same as engine.sentiment_trend, from daily rollups."""
+    interactions = _metric(daily, 'interactions')
+    counts = interactions.groupby([_periods(interactions['day'], freq), 'sentiment'])['count'].sum()
+    return with_net_score(counts.unstack(fill_value=0))
+
+
+def interactions_by_type(daily: pd.DataFrame) -> pd.Series:
+    """Interaction count per interaction type, most frequent first."""
+    interactions = _metric(daily, 'interactions')
+    return interactions.groupby('dimension')['count'].sum().rename_axis('type').sort_values(ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh daily analytics snapshots for days touched since the last run.")
+    parser.add_argument("--max-span-days", type=int, default=DEFAULT_MAX_SPAN_DAYS,
+                        help="Most consecutive days loaded and committed at once")
+    args = parser.parse_args()
+
+    refreshed = refresh_snapshots(SupabaseClient(), max_span_days=args.max_span_days)
+    print(f"Refreshed analytics snapshots for {refreshed} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,14 @@ from dotenv import load_dotenv
 
 # Import your database and utility functions
 from database.supabase_client import get_supabase_client
-from utils.helpers import format_customer_name, format_date, get_stage_color, safe_get, get_sentiment_icon, get_customer_overall_sentiment
+from database.customer_360 import load_customer_360
+from database.query_log import track_queries
+from analytics import snapshots
+from analytics.engine import PERIODS
+from utils.helpers import format_customer_name, format_date, get_stage_color, safe_get, get_sentiment_icon
 from ai.openai_client import get_ai_client
+from ai.sentiment_model import get_sentiment_classifier
+from ai.summary_queue import get_summary_worker
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +24,18 @@ db = get_supabase_client()
 # Get AI client
 ai_client = get_ai_client()
 
+# Local sentiment model, falling back to the LLM when unsure
+sentiment_classifier = get_sentiment_classifier()
+
+# Regenerates out-of-date AI summaries in the background (None when turned off)
+summary_worker = get_summary_worker()
+
+# Show the per-rerun database query panel in the sidebar
+QUERY_DEBUG = os.environ.get("AICRM_QUERY_DEBUG", "").lower() in ("1", "true", "yes")
+
+# How often the home page's activity feed refreshes itself, in seconds
+ACTIVITY_REFRESH_SECONDS = float(os.environ.get("AICRM_FEED_REFRESH", "10"))
+
 # Page configuration
 st.set_page_config(
     page_title="AiCRM - AI-Powered Customer Relationship Management",
@@ -39,26 +57,41 @@ def main():
         page = st.selectbox(
             "Navigate to:",
             ["🏠 Home", "👥 Customers", "📊 Analytics"],
-            index=0
+            index=0,
+            key="nav_page"
         )
         
         st.markdown("---")
         
-        # Quick stats (placeholder)
+        # Quick stats from the shared dashboard rollup
+        rollup = db.get_dashboard_rollup()
         st.subheader("📈 Quick Stats")
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total Customers", "42", "+3")
+            st.metric("Total Customers", rollup['total_customers'], f"+{rollup['new_this_week']}")
         with col2:
-            st.metric("This Week", "12", "+2")
+            st.metric("New This Week", rollup['new_this_week'])
             
         st.markdown("---")
         
         # AI Status
         st.subheader("🤖 AI Status")
         st.success("✅ OpenAI Connected")
-        st.success("✅ Database Connected")
+        transport = db.transport_status()
+        if transport['state'] == 'closed':
+            st.success("✅ Database Connected")
+        else:
+            st.warning(f"⚠️ Database degraded – showing cached data, retrying in {transport['retry_in']:.0f}s")
         st.info("💡 AI Insights Active")
+        sentiment_stats = sentiment_classifier.stats()
+        if sentiment_stats['local'] + sentiment_stats['llm']:
+            st.caption(f"Sentiment: {sentiment_stats['local_share']:.0%} answered by the local model")
+        
+        # Local mirror freshness, when reads are served from SQLite
+        mirror = db.mirror_status()
+        if mirror['enabled']:
+            st.markdown("---")
+            show_mirror_status(mirror)
     
     # Main content area
     if page == "🏠 Home":
@@ -70,7 +103,85 @@ def main():
         else:
             show_customer_list_placeholder()
     elif page == "📊 Analytics":
-        show_analytics_placeholder()
+        show_analytics_page()
+
+def show_query_panel(queries):
+    """Sidebar debug panel listing this rerun's database queries"""
+    summary = queries.summary()
+    
+    with st.sidebar:
+        st.markdown("---")
+        if summary['over_budget']:
+            st.warning(f"⚠️ {summary['queries']} database queries this rerun (budget {summary['budget']})")
+        
+        with st.expander(f"🔍 Queries: {summary['queries']} in {summary['db_ms']:.0f} ms"):
+            st.caption(
+                f"{summary['cache_hits']} cache hits · {summary['rows']} rows · "
+                f"{summary['bytes'] / 1024:.1f} KB · {summary['wall_ms']:.0f} ms rerun"
+            )
+            if queries.records:
+                st.dataframe(pd.DataFrame([
+                    {
+                        'method': record.method,
+                        'table': record.table,
+                        'op': record.operation,
+                        'source': record.source,
+                        'ms': round(record.seconds * 1000, 1),
+                        'rows': record.rows,
+                        'bytes': record.bytes,
+                        'error': record.error or ""
+                    }
+                    for record in queries.records
+                ]), hide_index=True, width="stretch")
+
+def show_mirror_status(mirror):
+    """Sidebar staleness indicator for the local SQLite mirror"""
+    st.subheader("🗄️ Local Mirror")
+    
+    age = mirror['age_seconds']
+    if age is None:
+        st.info("⏳ First sync in progress - reading from Supabase")
+    elif mirror['error'] or age > 2 * (mirror['sync_interval'] or 0):
+        st.warning(f"⚠️ Stale: last synced {format_age(age)} ago")
+    else:
+        st.success(f"✅ Synced {format_age(age)} ago")
+    
+    if mirror['error']:
+        st.caption(f"Last sync failed: {mirror['error']}")
+    
+    if st.button("🔄 Sync now", key="mirror_sync_now", width="stretch"):
+        try:
+            db.sync_mirror()
+        except Exception as e:
+            st.error(f"Mirror sync failed: {e}")
+        st.rerun()
+
+def format_age(seconds):
+    """Short human-readable duration like '45s', '3m' or '2h'"""
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}m"
+    return f"{int(seconds // 3600)}h"
+
+@st.fragment(run_every=ACTIVITY_REFRESH_SECONDS)
+def show_recent_activity():
+    """Last 5 interactions from the shared activity feed; reruns on its own to show new ones"""
+    since = st.session_state.get("activity_cursor")
+    feed = db.get_activity_feed(limit=5)
+    st.session_state.activity_cursor = feed['cursor']
+
+    if feed['items']:
+        for interaction in feed['items']:
+            customer_name = format_customer_name(interaction['customers'])
+            # Mark items that arrived since this session's last refresh
+            new = "🆕 " if since is not None and interaction['id'] > since else ""
+            st.write(f"{new}**{customer_name}** - {interaction['type'].title()}: {interaction.get('subject', 'No subject')}")
+            st.caption(f"{format_date(interaction['date'])}")
+            st.divider()
+    else:
+        st.info("📝 No recent activity. Start by adding some customers!")
+
 
 def show_home_page():
     """Home page with overview and quick access"""
@@ -84,9 +195,10 @@ def show_home_page():
     # Key metrics row
     col1, col2, col3, col4 = st.columns(4)
     
-    # Get real metrics from database
-    stage_counts = db.get_customer_counts_by_stage()
-    total_customers = sum(stage_counts.values())
+    # Get real metrics from the cached dashboard rollup
+    rollup = db.get_dashboard_rollup()
+    stage_counts = rollup['stages']
+    total_customers = rollup['total_customers']
 
     with col1:
         st.metric("Total Customers", total_customers)
@@ -104,18 +216,7 @@ def show_home_page():
     
     # Recent activity
     st.subheader("🔄 Recent Activity")
-    
-    # get recent interactions for last 5 interactions from database
-    recent_interactions = db.get_recent_interactions(limit=5)
-
-    if recent_interactions:
-        for interaction in recent_interactions:
-            customer_name = format_customer_name(interaction['customers'])
-            st.write(f"**{customer_name}** - {interaction['type'].title()}: {interaction.get('subject', 'No subject')}")
-            st.caption(f"{format_date(interaction['date'])}")
-            st.divider()
-    else:
-        st.info("📝 No recent activity. Start by adding some customers!")
+    show_recent_activity()
     
     # Quick actions section
     st.subheader("🚀 Quick Actions")
@@ -157,13 +258,24 @@ def show_customer_list_placeholder():
     with col3:
         sort_by = st.selectbox("Sort by", ["Name", "Company", "Last Contact", "Stage"])
     
-    # Fetch customers based on filters
+    # Restart from the first page whenever the search, filter or sort changes
+    list_query = (search, stage_filter, sort_by)
+    if st.session_state.get("customer_list_query") != list_query:
+        st.session_state.customer_list_query = list_query
+        st.session_state.customer_page_cursors = [None]
+    
+    page_cursors = st.session_state.customer_page_cursors
+    sort_column = sort_by.lower().replace(" ", "_")
+    
+    # Fetch one page of customers based on filters
     if search:
-        customers_data = db.search_customers(search)
+        customers_page = db.search_customers(search, sort_by=sort_column, cursor=page_cursors[-1])
     elif stage_filter != "All":
-        customers_data = db.filter_customers_by_stage(stage_filter)
+        customers_page = db.filter_customers_by_stage(stage_filter, sort_by=sort_column, cursor=page_cursors[-1])
     else:
-        customers_data = db.get_all_customers()
+        customers_page = db.get_all_customers(sort_by=sort_column, cursor=page_cursors[-1])
+    
+    customers_data = customers_page['customers']
     
     # Display customers in tabular format with inline buttons
     if not customers_data:
@@ -194,11 +306,12 @@ def show_customer_list_placeholder():
     
     st.divider()
     
+    # Get overall sentiment for every listed customer in a single query
+    sentiments = db.get_overall_sentiment_for_customers([customer['id'] for customer in customers_data])
+    
     # Display each customer as a table row
     for customer in customers_data:
-        # Get customer interactions to calculate sentiment
-        customer_interactions = db.get_customer_interactions(customer['id'])
-        overall_sentiment = get_customer_overall_sentiment(customer_interactions)
+        overall_sentiment = sentiments.get(customer['id'], 'neutral')
         sentiment_icon = get_sentiment_icon(overall_sentiment)
         
         # Create row columns
@@ -249,6 +362,22 @@ def show_customer_list_placeholder():
         
         # Add subtle separator between rows
         st.markdown("---")
+    
+    # Page controls
+    prev_col, page_col, next_col = st.columns([1, 4, 1])
+    
+    with prev_col:
+        if st.button("← Previous", key="customers_prev_page", disabled=len(page_cursors) == 1, width="stretch"):
+            page_cursors.pop()
+            st.rerun()
+    
+    with page_col:
+        st.caption(f"Page {len(page_cursors)}")
+    
+    with next_col:
+        if st.button("Next →", key="customers_next_page", disabled=customers_page['next_cursor'] is None, width="stretch"):
+            page_cursors.append(customers_page['next_cursor'])
+            st.rerun()
 
 def show_customer_detail_view():
     """Main customer detail view with AI insights and chat assistant"""
@@ -261,15 +390,15 @@ def show_customer_detail_view():
             st.rerun()
         return
     
-    # Get fresh customer data from database
-    customer = db.get_customer_by_id(selected_customer_data['id'])
+    # Get fresh customer data, interactions, transactions and products in one concurrent load
+    bundle = load_customer_360(db, selected_customer_data['id'])
+    customer = bundle.customer
     if not customer:
         st.error("Customer not found in database.")
         return
     
-    # Get customer interactions and transactions
-    interactions = db.get_customer_interactions(customer['id'])
-    transactions = db.get_customer_transactions(customer['id'])
+    interactions = bundle.interactions
+    transactions = bundle.transactions
     
     customer_name = format_customer_name(customer)
     company_name = safe_get(customer, 'company')
@@ -294,7 +423,7 @@ def show_customer_detail_view():
     
     with col_main:
         # Customer header info with sentiment
-        overall_sentiment = get_customer_overall_sentiment(interactions)
+        overall_sentiment = bundle.sentiment['overall_sentiment']
         sentiment_icon = get_sentiment_icon(overall_sentiment)
         
         st.subheader(f"👤 {customer_name} {sentiment_icon}")
@@ -330,14 +459,14 @@ def show_customer_detail_view():
         with st.expander("🌐 Web & Social Intelligence", expanded=False):
             # Generate AI Web & Social Intelligence
             if st.button("🔄 Generate Web Intelligence", key="generate_web_intel"):
-                with st.spinner("Analyzing web and social intelligence..."):
-                    try:
-                        web_intelligence = ai_client.generate_web_social_intelligence(customer, interactions, transactions)
-                        st.session_state.web_intelligence = web_intelligence
-                    except Exception as e:
-                        st.error(f"Error generating web intelligence: {e}")
-            
-            if st.session_state.get("web_intelligence"):
+                try:
+                    # Shown token by token as it arrives
+                    st.session_state.web_intelligence = st.write_stream(
+                        ai_client.stream_web_social_intelligence(customer, interactions, transactions)
+                    )
+                except Exception as e:
+                    st.error(f"Error generating web intelligence: {e}")
+            elif st.session_state.get("web_intelligence"):
                 st.write(st.session_state.web_intelligence)
             else:
                 st.write("*Click 'Generate Web Intelligence' to get AI-powered analysis*")
@@ -346,14 +475,14 @@ def show_customer_detail_view():
         with st.expander("📊 Behavioral Analysis", expanded=False):
             # Generate AI Behavioral Analysis
             if st.button("🔄 Generate Behavioral Analysis", key="generate_behavioral"):
-                with st.spinner("Analyzing behavioral patterns..."):
-                    try:
-                        behavioral_analysis = ai_client.generate_behavioral_analysis(customer, interactions, transactions)
-                        st.session_state.behavioral_analysis = behavioral_analysis
-                    except Exception as e:
-                        st.error(f"Error generating behavioral analysis: {e}")
-            
-            if st.session_state.get("behavioral_analysis"):
+                try:
+                    # Shown token by token as it arrives
+                    st.session_state.behavioral_analysis = st.write_stream(
+                        ai_client.stream_behavioral_analysis(customer, interactions, transactions)
+                    )
+                except Exception as e:
+                    st.error(f"Error generating behavioral analysis: {e}")
+            elif st.session_state.get("behavioral_analysis"):
                 st.write(st.session_state.behavioral_analysis)
             else:
                 st.write("*Click 'Generate Behavioral Analysis' to get AI-powered insights*")
@@ -453,38 +582,51 @@ def show_customer_detail_view():
         with tab4:
             ai_summary = safe_get(customer, 'ai_summary')
             
+            # Customer data changed since the summary was made; regenerate it ahead of the queue
+            summary_entry = db.get_summary_queue_entry(customer['id'])
+            if summary_entry is not None and summary_worker is not None:
+                summary_worker.submit(summary_entry, urgent=True)
+            
             st.markdown("### AI-Generated Customer Summary")
             st.markdown("*This summary combines CRM data with online sources to provide comprehensive insights about the customer.*")
             
             # AI Summary Section
             col1, col2 = st.columns([3, 1])
             with col1:
-                if ai_summary != "N/A" and ai_summary:
-                    st.markdown("**📋 Current AI Summary:**")
-                    st.info(ai_summary)
-                else:
-                    st.info("**AI Summary:** Not generated yet")
+                # Generated summaries stream into this slot in place of the current one
+                summary_slot = st.empty()
+                with summary_slot.container():
+                    if ai_summary != "N/A" and ai_summary:
+                        st.markdown("**📋 Current AI Summary:**")
+                        st.info(ai_summary)
+                        if customer.get('ai_summary_generated_at'):
+                            st.caption(f"Generated {format_date(customer.get('ai_summary_generated_at'))}")
+                            if summary_entry is not None:
+                                st.caption("🕒 Customer data changed since this summary was generated"
+                                           + ("; an update is on its way." if summary_worker is not None else "."))
+                        else:
+                            # The background job never replaces a hand-written summary
+                            st.caption("✍️ Written by hand; Regenerate replaces it with a generated one.")
+                    else:
+                        st.info("**AI Summary:** Not generated yet")
+                        if summary_entry is not None and summary_worker is not None:
+                            st.caption("🕒 A summary is being generated in the background.")
             with col2:
                 if st.button("🔄 Generate AI Summary", key="generate_summary"):
-                    with st.spinner("Generating comprehensive AI summary..."):
+                    with summary_slot.container():
                         try:
-                            # Get customer product interests and available products
-                            product_interests = db.get_customer_product_interests(customer['id'])
-                            available_products = db.get_all_products()
-                            
                             # Generate AI summary based on CRM data, interactions, product interests, and transactions
-                            new_summary = ai_client.generate_customer_summary(
+                            st.markdown("**📋 New AI Summary:**")
+                            new_summary = st.write_stream(ai_client.stream_customer_summary(
                                 customer, 
                                 interactions, 
-                                product_interests, 
-                                available_products,
+                                bundle.product_interests, 
+                                bundle.products,
                                 transactions
-                            )
+                            ))
                             
                             # Update customer record in database
-                            db.client.table('customers').update({
-                                'ai_summary': new_summary
-                            }).eq('id', customer['id']).execute()
+                            db.save_customer_summary(customer['id'], new_summary)
                             
                             st.success("✅ AI Summary generated!")
                             st.rerun()
@@ -516,25 +658,21 @@ def show_customer_detail_view():
             # Regenerate Button
             st.markdown("---")
             if st.button("🔄 Regenerate Summary", key="regenerate_summary", width="stretch"):
-                with st.spinner("Regenerating AI summary with latest data..."):
+                with summary_slot.container():
                     try:
-                        # Get customer product interests and available products
-                        product_interests = db.get_customer_product_interests(customer['id'])
-                        available_products = db.get_all_products()
-                        
                         # Generate fresh AI summary with product information and transactions
-                        new_summary = ai_client.generate_customer_summary(
+                        st.markdown("**📋 New AI Summary:**")
+                        new_summary = st.write_stream(ai_client.stream_customer_summary(
                             customer, 
                             interactions, 
-                            product_interests, 
-                            available_products,
-                            transactions
-                        )
+                            bundle.product_interests, 
+                            bundle.products,
+                            transactions,
+                            use_cache=False
+                        ))
                         
                         # Update customer record in database
-                        db.client.table('customers').update({
-                            'ai_summary': new_summary
-                        }).eq('id', customer['id']).execute()
+                        db.save_customer_summary(customer['id'], new_summary)
                         
                         st.success("✅ AI Summary regenerated successfully!")
                         st.rerun()
@@ -590,13 +728,16 @@ def show_customer_detail_view():
                     if not content.strip():
                         st.error("Please provide interaction details before submitting.")
                     else:
-                        # Analyze sentiment using AI
+                        # Analyze sentiment locally, asking the AI only when the local model is unsure
                         with st.spinner("Analyzing sentiment..."):
                             try:
-                                analyzed_sentiment = ai_client.analyze_sentiment(content)
+                                analysis = sentiment_classifier.classify(content)
+                                analyzed_sentiment = analysis.label
+                                sentiment_source = analysis.source
                             except Exception as e:
                                 st.warning(f"Could not analyze sentiment: {e}")
                                 analyzed_sentiment = sentiment  # Use user-selected sentiment
+                                sentiment_source = None
                         
                         # Prepare interaction data
                         interaction_data = {
@@ -605,7 +746,8 @@ def show_customer_detail_view():
                             "subject": subject if subject.strip() else f"{interaction_type.title()} with {customer_name}",
                             "content": content,
                             "date": f"{interaction_date} {datetime.now().time()}",
-                            "sentiment": analyzed_sentiment
+                            "sentiment": analyzed_sentiment,
+                            "sentiment_source": sentiment_source
                         }
                         
                         # Save to database
@@ -662,7 +804,7 @@ def show_customer_detail_view():
         # Initialize chat history
         if "chat_history" not in st.session_state:
             # Get some product context for the initial message
-            available_products = db.get_all_products()
+            available_products = bundle.products
             product_preview = ""
             if available_products:
                 featured_products = available_products[:3]  # Show 3 featured products
@@ -682,6 +824,9 @@ def show_customer_detail_view():
                 st.markdown(f'**🤖 Assistant:** {message["content"]}')
             st.divider()
         
+        # Replies stream here, below the history, before they are added to it
+        reply_area = st.container()
+        
         # Chat input
         user_input = st.text_input("Ask me anything about this customer...", key="chat_input", placeholder="e.g., What's the best approach for closing this deal? How should I handle their objections?")
         
@@ -690,19 +835,17 @@ def show_customer_detail_view():
             st.session_state.chat_history.append({"role": "user", "content": user_input})
             
             # Generate AI response using OpenAI with product information
-            with st.spinner("AI is thinking..."):
+            with reply_area:
+                st.markdown(f'**You:** {user_input}')
+                st.markdown('**🤖 Assistant:**')
                 try:
-                    # Get customer product interests and available products
-                    product_interests = db.get_customer_product_interests(customer['id'])
-                    available_products = db.get_all_products()
-                    
-                    ai_response = ai_client.generate_sales_advice(
+                    ai_response = st.write_stream(ai_client.stream_sales_advice(
                         customer, 
                         interactions, 
                         user_input, 
-                        product_interests, 
-                        available_products
-                    )
+                        bundle.product_interests, 
+                        bundle.products
+                    ))
                     st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
                 except Exception as e:
                     st.error(f"Error getting AI response: {e}")
@@ -720,18 +863,16 @@ def show_customer_detail_view():
         
         with col1:
             if st.button("📧 Draft Email", key="draft_email"):
-                with st.spinner("Crafting a personalized email..."):
+                with reply_area:
                     try:
-                        # Get customer product interests for email personalization
-                        product_interests = db.get_customer_product_interests(customer['id'])
-                        
                         # Generate AI email draft with product information
-                        email_draft = ai_client.generate_email_draft(
+                        st.markdown(f"**🤖 Assistant:** 📧 **Here's a personalized email draft you can send to {customer_name}:**")
+                        email_draft = st.write_stream(ai_client.stream_email_draft(
                             customer, 
                             f"Recent interactions: {len(interactions)} total. Last contact: {format_date(customer.get('last_contact'))}",
                             "follow_up",
-                            product_interests
-                        )
+                            bundle.product_interests
+                        ))
                         
                         st.session_state.chat_history.append({
                             "role": "assistant", 
@@ -749,7 +890,7 @@ def show_customer_detail_view():
         with col2:
             if st.button("📞 Call Prep", key="call_prep"):
                 # Get product context for call prep
-                available_products = db.get_all_products()
+                available_products = bundle.products
                 product_highlights = ""
                 if available_products:
                     featured_products = available_products[:3]
@@ -771,10 +912,99 @@ def show_customer_detail_view():
                 })
                 st.rerun()
 
-def show_analytics_placeholder():
-    """Placeholder analytics view"""
-    st.title("�� Analytics")
-    st.info("Analytics dashboard coming soon...")
+def show_analytics_page():
+    """Analytics dashboard: daily snapshots for history, today computed live"""
+    st.title("📊 Analytics")
+    
+    header_col, refresh_col = st.columns([5, 1])
+    with header_col:
+        period_label = st.selectbox("Group by", list(PERIODS), index=2)
+    with refresh_col:
+        st.write("")
+        if st.button("🔄 Refresh", width="stretch"):
+            st.rerun()
+    
+    try:
+        with st.spinner("Loading analytics data..."):
+            daily = snapshots.load_daily_rollups(db)
+    except Exception as e:
+        st.error(f"Failed to load analytics data: {e}")
+        return
+    
+    if daily.empty:
+        st.info("📝 No data yet. Start by adding some customers!")
+        return
+    
+    period = PERIODS[period_label]
+    revenue = snapshots.revenue_by_period(daily, period)
+    total_revenue = revenue['revenue'].sum()
+    total_orders = int(revenue['orders'].sum())
+    
+    # Headline metrics
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Revenue", f"${total_revenue:,.2f}")
+    with col2:
+        st.metric("Orders", f"{total_orders:,}")
+    with col3:
+        st.metric("Average Order Value", f"${total_revenue / total_orders if total_orders else 0:,.2f}")
+    with col4:
+        st.metric("Interactions", f"{int(snapshots.interactions_by_type(daily).sum()):,}")
+    
+    st.markdown("---")
+    
+    # Revenue over time
+    st.subheader(f"💰 {period_label} Revenue")
+    if revenue.empty:
+        st.info("No transactions yet.")
+    else:
+        st.line_chart(revenue['revenue'])
+        st.bar_chart(revenue['average_order_value'])
+    
+    mix_col, funnel_col = st.columns(2)
+    
+    # Category mix
+    with mix_col:
+        st.subheader("🛍️ Category Mix")
+        mix = snapshots.category_mix(daily)
+        if mix.empty:
+            st.info("No transactions yet.")
+        else:
+            st.bar_chart(mix['revenue'])
+            st.dataframe(mix.style.format({'revenue': '${:,.2f}', 'share': '{:.1%}'}), width="stretch")
+    
+    # Pipeline funnel
+    with funnel_col:
+        st.subheader("🔻 Pipeline Funnel")
+        funnel = snapshots.stage_funnel(daily)
+        st.bar_chart(funnel['customers'])
+        st.dataframe(funnel.style.format({'conversion': '{:.1%}'}), width="stretch")
+    
+    # Sentiment trend
+    st.subheader(f"😊 {period_label} Sentiment")
+    sentiment = snapshots.sentiment_trend(daily, period)
+    if sentiment.empty:
+        st.info("No interactions yet.")
+    else:
+        st.area_chart(sentiment[['positive', 'neutral', 'negative']])
+        st.line_chart(sentiment['net_score'])
+    
+    # Interaction mix
+    st.subheader("💬 Interactions by Type")
+    interaction_types = snapshots.interactions_by_type(daily)
+    if interaction_types.empty:
+        st.info("No interactions yet.")
+    else:
+        st.bar_chart(interaction_types)
+    
+    st.caption("History comes from daily snapshots (python -m analytics.snapshots); today is computed live.")
 
 if __name__ == "__main__":
-    main()
+    with track_queries() as queries:
+        try:
+            main()
+        finally:
+            queries.label = st.session_state.get("nav_page", "")
+            queries.log_summary()
+    if QUERY_DEBUG or queries.over_budget:
+        show_query_panel(queries)
@@ -0,0 +1,291 @@
+# benchmarks/hot_paths.py
+"""
+Benchmarks for the CRM hot paths at several dataset sizes.
+
+For each size a synthetic dataset is written to a LocalBackend file (reused
+across runs), then every page-level operation runs through SupabaseClient
+exactly as app.py calls it: latency percentiles over many iterations, peak
+Python memory (tracemalloc) and the number of queries per call. By default
+every iteration does the full database work: the query cache stores
+nothing (which also covers the dashboard rollup's own TTL) and the activity
+feed polls on every call instead of once per ACTIVITY_FEED_POLL_SECONDS.
+
+Results are written as JSON. With --baseline, each operation is compared
+with the saved run and the process exits non-zero on a regression in
+median latency, peak memory or query count.
+
+Usage (from the AiCRMv1 directory):
+    python -m benchmarks.hot_paths --sizes 1000 10000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.hot_paths --sizes 1000 10000 --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from analytics import snapshots
+from database.activity_feed import ActivityFeed
+from database.async_supabase_client import CUSTOMER_SORT_COLUMNS
+from database.cache import QueryCache
+from database.customer_360 import load_customer_360
+from database.local_backend import LocalBackend
+from database.query_log import track_queries
+from database.supabase_client import SupabaseClient
+from database.synthetic_data import DatasetSpec, populate
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_ITERATIONS = 30
+WARMUP_ITERATIONS = 3
+MEMORY_ITERATIONS = 3
+
+# Fixed end date so every run benchmarks byte-identical data
+DATASET_END = datetime(2025, 1, 1)
+
+# A metric regresses when it is this much worse than the baseline...
+DEFAULT_TOLERANCE = 0.3
+# ...and worse by more than this absolute amount, to ignore timer noise on tiny values
+MIN_REGRESSION_MS = 2.0
+MIN_REGRESSION_KB = 256.0
+
+SEARCH_TERMS = ('smith', 'ava', 'acme', 'nguyen', 'globex', 'kim')
+
+
+def _random_customer(rng: random.Random, spec: DatasetSpec) -> int:
+    return rng.randint(1, spec.customers)
+
+
+def _list_page(db: SupabaseClient, rng: random.Random, spec: DatasetSpec) -> None:
+    page = db.get_all_customers(sort_by=rng.choice(sorted(CUSTOMER_SORT_COLUMNS)))
+    db.get_overall_sentiment_for_customers([customer['id'] for customer in page['customers']])
+
+
+def _search_page(db: SupabaseClient, rng: random.Random, spec: DatasetSpec) -> None:
+    page = db.search_customers(rng.choice(SEARCH_TERMS))
+    db.get_overall_sentiment_for_customers([customer['id'] for customer in page['customers']])
+
+
+def _home_page(db: SupabaseClient, rng: random.Random, spec: DatasetSpec) -> None:
+    db.get_dashboard_rollup()
+    db.get_activity_feed(limit=5)
+
+
+def _analytics_page(db: SupabaseClient, rng: random.Random, spec: DatasetSpec) -> None:
+    daily = snapshots.load_daily_rollups(db, today=DATASET_END.date())
+    snapshots.revenue_by_period(daily)
+    snapshots.category_mix(daily)
+    snapshots.stage_funnel(daily)
+    snapshots.sentiment_trend(daily)
+
+
+# Operation name -> callable(db, rng, spec); one call is one page's worth of work
+OPERATIONS: Dict[str, Callable[[SupabaseClient, random.Random, DatasetSpec], None]] = {
+    'home_page': _home_page,
+    'customer_list_with_sentiment': _list_page,
+    'customer_search_with_sentiment': _search_page,
+    'customer_360_bundle': lambda db, rng, spec: load_customer_360(db, _random_customer(rng, spec)),
+    'product_interests': lambda db, rng, spec: db.get_customer_product_interests(_random_customer(rng, spec)),
+    'purchase_history': lambda db, rng, spec: db.get_customer_purchase_history(_random_customer(rng, spec)),
+    'stage_counts': lambda db, rng, spec: db.get_customer_counts_by_stage(),
+    'analytics_page': _analytics_page,
+}
+
+
+class _ErrorCounter(logging.Handler):
+    """Counts errors the client reports, which it otherwise swallows into empty results."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+
+
+def dataset_path(data_dir: str, spec: DatasetSpec) -> str:
+    """
+    Seed the dataset for spec into data_dir once, with its analytics
+    snapshots, and return its file. Benchmarks only read it afterwards.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"crm-{spec.customers}-seed{spec.seed}-{spec.end_time():%Y%m%d}.db")
+    if not os.path.exists(path):
+        partial = path + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        started = time.perf_counter()
+        backend = LocalBackend(partial)
+        counts = populate(backend, spec)
+        backend.close()
+
+        db = SupabaseClient(local_search=False, backend=f"sqlite:{partial}")
+        snapshots.refresh_snapshots(db)
+        # Closing checkpoints the WAL, so later runs read one compact file
+        db.client.close()
+        os.replace(partial, path)
+        print(f"Seeded {path} in {time.perf_counter() - started:.1f}s: {counts}", file=sys.stderr)
+    return path
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def benchmark_operation(db: SupabaseClient, name: str, spec: DatasetSpec, iterations: int, seed: int) -> Dict:
+    """Time one operation and measure its peak memory and queries per call."""
+    operation = OPERATIONS[name]
+    rng = random.Random(f"{seed}:{name}")
+
+    for _ in range(WARMUP_ITERATIONS):
+        operation(db, rng, spec)
+
+    with track_queries(name) as queries:
+        operation(db, rng, spec)
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        operation(db, rng, spec)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # tracemalloc slows everything down, so memory gets its own short pass
+    tracemalloc.start()
+    try:
+        for _ in range(MEMORY_ITERATIONS):
+            operation(db, rng, spec)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(_percentile(timings, 0.50), 3),
+        'p95_ms': round(_percentile(timings, 0.95), 3),
+        'p99_ms': round(_percentile(timings, 0.99), 3),
+        'max_ms': round(timings[-1], 3),
+        'peak_kb': round(peak / 1024, 1),
+        'queries': len(queries.records),
+    }
+
+
+def run_benchmarks(sizes: List[int], iterations: int = DEFAULT_ITERATIONS, data_dir: Optional[str] = None,
+                   operations: Optional[List[str]] = None, seed: int = 0, cache: bool = False) -> Dict:
+    """Run the selected operations at every size. Returns the JSON-ready results document."""
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), "aicrm-bench")
+    operations = operations or list(OPERATIONS)
+    errors = _ErrorCounter()
+    logging.getLogger("database").addHandler(errors)
+
+    results: Dict[str, Dict] = {}
+    try:
+        for size in sizes:
+            spec = DatasetSpec(customers=size, seed=seed, end=DATASET_END)
+            db = SupabaseClient(
+                local_search=False,
+                cache=QueryCache() if cache else QueryCache(max_entries=0),
+                backend=f"sqlite:{dataset_path(data_dir, spec)}",
+                activity_feed=ActivityFeed() if cache else ActivityFeed(poll_seconds=0),
+            )
+
+            results[str(size)] = {}
+            for name in operations:
+                before = errors.count
+                result = benchmark_operation(db, name, spec, iterations, seed)
+                result['errors'] = errors.count - before
+                results[str(size)][name] = result
+                print(
+                    f"{size:>7} {name:<32} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+                    f"peak {result['peak_kb']:>9.1f} KB  {result['queries']} queries",
+                    file=sys.stderr
+                )
+    finally:
+        logging.getLogger("database").removeHandler(errors)
+
+    return {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'seed': seed,
+            'cache': cache,
+        },
+        'results': results,
+    }
+
+
+def compare_to_baseline(current: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Describe every metric that regressed against the baseline; empty if none did.
+    Gates median latency, peak memory and query count; operations or sizes
+    missing from either run are skipped. Reported errors always count.
+    """
+    regressions = []
+    for size, operations in current['results'].items():
+        for name, result in operations.items():
+            if result.get('errors'):
+                regressions.append(f"{size} {name}: {result['errors']} errors reported")
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base is None:
+                continue
+
+            # Tail latencies are reported but not gated; they are too noisy on shared machines
+            for metric, floor in (('p50_ms', MIN_REGRESSION_MS), ('peak_kb', MIN_REGRESSION_KB)):
+                limit = base[metric] * (1 + tolerance)
+                if result[metric] > limit and result[metric] - base[metric] > floor:
+                    regressions.append(
+                        f"{size} {name}: {metric} {result[metric]:.1f} vs baseline {base[metric]:.1f} "
+                        f"(+{(result[metric] / base[metric] - 1) * 100 if base[metric] else float('inf'):.0f}%)"
+                    )
+            if result['queries'] > base['queries']:
+                regressions.append(f"{size} {name}: {result['queries']} queries vs baseline {base['queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AiCRM hot paths against a synthetic local backend.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Customer counts")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Timed calls per operation")
+    parser.add_argument("--operations", nargs="+", choices=sorted(OPERATIONS), help="Subset of operations to run")
+    parser.add_argument("--data-dir", help="Where seeded datasets are kept (default: <tmp>/aicrm-bench)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Leave the query cache and feed poll throttle on (measures warm reads)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", help="Saved results to compare against; exit 1 on regression")
+    parser.add_argument("--save-baseline", help="Also write this run's results here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown / memory growth as a fraction (default 0.3)")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.sizes, args.iterations, args.data_dir, args.operations, args.seed, args.cache)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f"Wrote {path}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(current, baseline, args.tolerance)
+        if regressions:
+            print(f"REGRESSIONS against {args.baseline}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# database/activity_feed.py
+"""
+Shared, incrementally refreshed feed of the newest interactions.
+
+One ActivityFeed per client serves every open dashboard from memory.
+AsyncSupabaseClient.get_activity_feed refreshes it at most once per poll
+interval, however many sessions ask: normally with a query for ids past
+the feed's cursor plus the recent gaps below it, which returns nothing when
+nothing happened, and with a full reload when the feed is new,
+was invalidated by a local write, or has gone resync_seconds without one
+(to pick up edits and deletes made elsewhere).
+
+Ids are handed out when a row is inserted but become visible when its
+transaction commits, so a lower id can appear after a higher one was
+polled. Each poll also asks for the ids its predecessors skipped (the
+gaps), but only for lookback_seconds after a gap was first seen: an id that
+is still missing by then was rolled back or deleted, and a row committing
+even later waits for the next full reload, as do rows committing late
+around a reload itself.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+# Interactions kept in memory; pages show the newest few
+ACTIVITY_FEED_SIZE = 50
+
+# Minimum seconds between database polls, shared by all sessions
+ACTIVITY_FEED_POLL_SECONDS = float(os.environ.get("AICRM_FEED_POLL", "5"))
+
+# Full reload interval, for edits and deletes the id cursor can't see
+ACTIVITY_FEED_RESYNC_SECONDS = float(os.environ.get("AICRM_FEED_RESYNC", "300"))
+
+# Seconds a skipped id below the cursor is polled for again, for rows that commit out of id order
+ACTIVITY_FEED_LOOKBACK_SECONDS = float(os.environ.get("AICRM_FEED_LOOKBACK_SECONDS", "60"))
+
+# Most skipped ids a poll asks for, newest first; bounds the request after a large rolled-back insert
+ACTIVITY_FEED_MAX_GAPS = 100
+
+
+def _newest_first(item: Mapping) -> tuple:
+    return str(item.get('date') or ''), item['id']
+
+
+class ActivityFeed:
+    """
+    Bounded buffer of the newest interactions by date, plus the highest
+    interaction id seen (the cursor) and the recently skipped ids below it
+    (the gaps). Thread-safe; items are shared, so they must be read-only rows.
+    """
+
+    def __init__(self, capacity: int = ACTIVITY_FEED_SIZE, poll_seconds: float = ACTIVITY_FEED_POLL_SECONDS,
+                 resync_seconds: float = ACTIVITY_FEED_RESYNC_SECONDS,
+                 lookback_seconds: float = ACTIVITY_FEED_LOOKBACK_SECONDS, max_gaps: int = ACTIVITY_FEED_MAX_GAPS):
+        self.capacity = capacity
+        self.poll_seconds = poll_seconds
+        self.resync_seconds = resync_seconds
+        self.lookback_seconds = lookback_seconds
+        self.max_gaps = max_gaps
+        self._lock = threading.Lock()
+        self._items: List[Mapping] = []
+        self._cursor = 0
+        # Skipped id -> monotonic time it was first skipped
+        self._gaps: Dict[int, float] = {}
+        self._polled_at: Optional[float] = None
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def cursor(self) -> int:
+        with self._lock:
+            return self._cursor
+
+    def gaps(self) -> List[int]:
+        """Skipped ids below the cursor a poll should ask for again, newest first."""
+        with self._lock:
+            self._expire_gaps(time.monotonic())
+            return sorted(self._gaps, reverse=True)
+
+    def poll_limit(self, gaps: int) -> int:
+        """Rows a poll asking for gaps skipped ids requests; a poll that fills it may have missed some."""
+        return self.capacity + gaps
+
+    def due(self) -> bool:
+        """Whether the poll interval has passed since the last poll."""
+        with self._lock:
+            return self._polled_at is None or time.monotonic() - self._polled_at >= self.poll_seconds
+
+    def needs_reload(self) -> bool:
+        """Whether the next poll must reload the feed instead of reading past the cursor."""
+        with self._lock:
+            return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.resync_seconds
+
+    def mark_polled(self) -> None:
+        """Start the poll interval; called before querying, so a failing poll is throttled too."""
+        with self._lock:
+            self._polled_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Reload on the next read, after a write that may have changed or removed feed items."""
+        with self._lock:
+            self._loaded_at = None
+            self._polled_at = None
+
+    def load(self, items: Iterable[Mapping]) -> None:
+        """Replace the contents with a full reload's newest items."""
+        items = sorted(items, key=_newest_first, reverse=True)[:self.capacity]
+        with self._lock:
+            self._items = items
+            self._cursor = max([self._cursor, *(item['id'] for item in items)])
+            self._gaps = {}
+            self._loaded_at = time.monotonic()
+
+    def merge(self, items: Iterable[Mapping]) -> int:
+        """
+        Add the items of a poll that were not held before, and record the
+        ids it skipped past the old cursor as gaps; returns how many were new.
+        """
+        items = list(items)
+        polled = {item['id'] for item in items}
+        now = time.monotonic()
+        with self._lock:
+            held = {item['id'] for item in self._items}
+            new = [item for item in items if item['id'] not in held]
+            if new:
+                self._items = sorted(self._items + new, key=_newest_first, reverse=True)[:self.capacity]
+
+            cursor = max([self._cursor, *polled])
+            # Only the newest max_gaps skipped ids are kept, so don't walk further down than that
+            floor = max(self._cursor, cursor - self.max_gaps - len(polled))
+            for row_id in range(floor + 1, cursor + 1):
+                if row_id not in polled:
+                    self._gaps[row_id] = now
+            for row_id in polled:
+                self._gaps.pop(row_id, None)
+            self._cursor = cursor
+            self._expire_gaps(now)
+            return len(new)
+
+    def snapshot(self, limit: int) -> Dict[str, Any]:
+        """The newest limit items and the cursor, as {'items': [...], 'cursor': 42}."""
+        with self._lock:
+            return {'items': self._items[:limit], 'cursor': self._cursor}
+
+    def _expire_gaps(self, now: float) -> None:
+        """Drop gaps older than the lookback and all but the newest max_gaps. Call with the lock held."""
+        expired = [row_id for row_id, seen_at in self._gaps.items() if now - seen_at >= self.lookback_seconds]
+        expired.extend(sorted(self._gaps, reverse=True)[self.max_gaps:])
+        for row_id in expired:
+            self._gaps.pop(row_id, None)
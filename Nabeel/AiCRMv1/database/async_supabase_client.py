@@ -0,0 +1,1622 @@
+import asyncio
+import contextvars
+import inspect
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from functools import partial, wraps
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, List, Dict, Iterable, Optional, Tuple, Type
+from supabase import acreate_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
+from dotenv import load_dotenv
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.product_matcher import ProductMentionMatcher
+
+from .activity_feed import ActivityFeed
+from .cache import QueryCache
+from .local_backend import LocalBackend
+from .local_mirror import DELETIONS_FEED, MIRROR_TABLES, LocalMirror, MirrorQuery
+from .models import Customer, FieldLoader, Interaction, Product, Row, Transaction
+from .query_log import QueryRecord, client_method, payload_bytes, query_log
+from .search_index import CustomerSearchIndex
+from .sentiment_stats import empty_stats, parse_timestamp
+from .transport import CircuitBreaker, DatabaseUnavailable, TransportConfig, is_transient
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# PostgREST caps responses at 1000 rows by default
+MAX_PAGE_SIZE = 1000
+
+# Upper bound on PostgREST requests in flight at once per client
+MAX_CONCURRENT_QUERIES = int(os.environ.get("AICRM_DB_MAX_CONCURRENCY", "10"))
+
+# Local mirror: how often to pull deltas, and how far back each pull re-reads
+# to catch rows whose transactions committed after a later-stamped one
+MIRROR_SYNC_SECONDS = float(os.environ.get("AICRM_MIRROR_SYNC_SECONDS", "30"))
+MIRROR_SYNC_OVERLAP_SECONDS = 5
+
+# Rows per filtered delete request, keeping the URL short
+DELETE_BATCH_SIZE = 100
+
+# Ids per lazy field request; see fetch_fields
+FIELD_FETCH_BATCH_SIZE = 200
+
+# Read-through query cache defaults, overridable from the environment
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("AICRM_QUERY_CACHE_SIZE", "1000"))
+QUERY_CACHE_TTL_SECONDS = float(os.environ.get("AICRM_QUERY_CACHE_TTL", "60"))
+# How long past expiry a cached read may still be served while the database is unavailable
+QUERY_CACHE_STALE_SECONDS = float(os.environ.get("AICRM_QUERY_CACHE_STALE", "600"))
+
+# Dashboard stage rollup is shared by all sessions for this long
+STAGE_ROLLUP_TTL_SECONDS = 30
+
+PIPELINE_STAGES = ('lead', 'prospect', 'customer')
+
+# Product catalog is reloaded after this long to pick up writes from other processes
+CATALOG_TTL_SECONDS = float(os.environ.get("AICRM_CATALOG_TTL", "300"))
+
+# Local search index is rebuilt after this long to pick up writes from other processes
+SEARCH_INDEX_MAX_AGE_SECONDS = 600
+
+# Customer list pagination
+CUSTOMER_PAGE_SIZE = 25
+
+# Sort option -> (column, descending). Rows with equal sort values are ordered by id.
+CUSTOMER_SORT_COLUMNS = {
+    'name': ('last_name', False),
+    'company': ('company', False),
+    'last_contact': ('last_contact', True),
+    'stage': ('stage', False),
+}
+
+# Transactions embed their product and customer, so their cache entries depend on all three tables
+TRANSACTION_COLUMNS = """
+    *,
+    products:product_id(name, category, price, description),
+    customers:customer_id(first_name, last_name, company)
+"""
+TRANSACTION_TABLES = ('transactions', 'products', 'customers')
+
+# The summary queue is written by database triggers on these tables (migration 006)
+SUMMARY_QUEUE_TABLES = ('ai_summary_queue', 'customers', 'interactions', 'transactions')
+
+# How long a claimed summary queue row is hidden from other workers
+SUMMARY_CLAIM_SECONDS = 600
+
+# Per-view projections. List and feed views leave out the large text columns
+# (notes, ai_summary, ai_insights, content); the row models load those lazily
+# if a view reads them. Detail views select everything.
+CUSTOMER_LIST_COLUMNS = "id, first_name, last_name, email, phone, company, stage, created_at, last_contact"
+INTERACTION_FEED_COLUMNS = "id, customer_id, type, subject, date, sentiment, customers(first_name, last_name, company)"
+TRANSACTION_LIST_COLUMNS = """
+    id, customer_id, product_id, quantity, total_amount, payment_method, transaction_date,
+    products:product_id(name, category, price),
+    customers:customer_id(first_name, last_name, company)
+"""
+
+# Errors raised while serving one call from the sync wrapper; see SupabaseClient.run
+error_sink = contextvars.ContextVar('error_sink', default=None)
+
+
+def report_error(message: str) -> None:
+    """
+    Surface a database error to the user.
+    Inside a SupabaseClient call the message is handed back to the calling
+    Streamlit session; in a script thread it goes to st.error; anywhere else
+    (workers, API processes) it is logged.
+    """
+    errors = error_sink.get()
+    if errors is not None:
+        errors.append(message)
+    elif get_script_run_ctx() is not None:
+        st.error(message)
+    else:
+        logger.error(message)
+
+
+def _names_queries(cls: type) -> type:
+    """
+    Class decorator: every public coroutine (and async generator) method sets
+    client_method to its name while it runs, so the QueryLog can attribute
+    queries to it. Context variables are per task, so calls gathered
+    concurrently each keep their own name; a nested public call names the
+    queries it makes itself.
+    """
+    def wrap_coroutine(name: str, method: Callable) -> Callable:
+        @wraps(method)
+        async def named(*args, **kwargs):
+            token = client_method.set(name)
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                client_method.reset(token)
+        return named
+
+    def wrap_generator(name: str, method: Callable) -> Callable:
+        # Set per step: a generator can be resumed from a different task each time
+        @wraps(method)
+        async def named(*args, **kwargs):
+            rows = method(*args, **kwargs)
+            try:
+                while True:
+                    token = client_method.set(name)
+                    try:
+                        row = await rows.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        client_method.reset(token)
+                    yield row
+            finally:
+                await rows.aclose()
+        return named
+
+    for name, member in list(vars(cls).items()):
+        if name.startswith('_'):
+            continue
+        if inspect.iscoroutinefunction(member):
+            setattr(cls, name, wrap_coroutine(name, member))
+        elif inspect.isasyncgenfunction(member):
+            setattr(cls, name, wrap_generator(name, member))
+    return cls
+
+
+@_names_queries
+class AsyncSupabaseClient:
+    """
+    Asyncio version of the AiCRM database client.
+
+    Same method surface as SupabaseClient, but every operation is a coroutine,
+    so independent queries can be awaited together with asyncio.gather.
+    At most max_concurrency requests are in flight at once.
+
+        client = await AsyncSupabaseClient.create()
+        customer, interactions = await asyncio.gather(
+            client.get_customer_by_id(1), client.get_customer_interactions(1)
+        )
+    """
+
+    def __init__(self, client: AsyncClient, local_search: Optional[bool] = None,
+                 cache: Optional[QueryCache] = None, max_concurrency: int = MAX_CONCURRENT_QUERIES,
+                 mirror: Optional[LocalMirror] = None, transport: Optional[TransportConfig] = None,
+                 activity_feed: Optional[ActivityFeed] = None):
+        """
+        Wrap a connected supabase AsyncClient, or a stand-in backend such as
+        LocalBackend; use AsyncSupabaseClient.create() to build one.
+        local_search enables the in-process customer search index;
+        defaults to the AICRM_LOCAL_SEARCH environment variable.
+        cache is the read-through query cache; defaults to an in-memory QueryCache.
+        mirror serves reads of the mirrored tables locally once it has synced.
+        transport sets timeouts, read retries and the circuit breaker;
+        defaults to TransportConfig.from_env().
+        activity_feed is the shared home page feed; defaults to an ActivityFeed
+        polling every ACTIVITY_FEED_POLL_SECONDS.
+        """
+        self.client: AsyncClient = client
+        self._query_slots = asyncio.Semaphore(max_concurrency)
+        self._transport = transport or TransportConfig.from_env()
+        self._breaker = CircuitBreaker(self._transport.breaker_failures, self._transport.breaker_reset_seconds)
+
+        # Read-through cache shared across Streamlit sessions; writes invalidate per table
+        self.cache = cache if cache is not None else QueryCache(
+            QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_STALE_SECONDS
+        )
+
+        # Product catalog shared across sessions; product writes bump the version
+        self._catalog_lock = threading.Lock()
+        self._catalog_load_lock = asyncio.Lock()
+        self._catalog_version = 0
+        self._catalog: Optional[List[Product]] = None
+        self._catalog_loaded_version = -1
+        self._catalog_loaded_at = 0.0
+
+        # Product mention automaton, rebuilt only when the catalog version changes
+        self._matcher_lock = threading.Lock()
+        self._product_matcher: Optional[ProductMentionMatcher] = None
+        self._product_matcher_version = -1
+
+        # Optional in-process trigram index for search_customers
+        if local_search is None:
+            local_search = os.environ.get("AICRM_LOCAL_SEARCH", "").lower() in ("1", "true", "yes")
+        self._search_index: Optional[CustomerSearchIndex] = CustomerSearchIndex() if local_search else None
+        self._search_index_lock = asyncio.Lock()
+        self._search_index_built_at: Optional[float] = None
+
+        # Optional local SQLite mirror, kept current by sync_mirror and write-through
+        self._mirror = mirror
+        self._mirror_sync_lock = asyncio.Lock()
+        self._mirror_sync_task: Optional[asyncio.Task] = None
+        self._mirror_sync_interval: Optional[float] = None
+        self._mirror_error: Optional[str] = None
+
+        # Newest interactions for the home page, shared by all sessions; see get_activity_feed
+        self._activity_feed = activity_feed if activity_feed is not None else ActivityFeed()
+        self._activity_feed_lock = asyncio.Lock()
+
+        # Loads (table, ids, fields) for the row models' lazy fields. Unset here,
+        # since a blocking load can't run on the event loop; SupabaseClient sets it.
+        self.field_loader: Optional[Callable[[str, List[Any], Tuple[str, ...]], Dict[Any, Dict]]] = None
+
+    @classmethod
+    async def create(cls, local_search: Optional[bool] = None, cache: Optional[QueryCache] = None,
+                     max_concurrency: int = MAX_CONCURRENT_QUERIES,
+                     mirror_path: Optional[str] = None, backend: Optional[str] = None,
+                     transport: Optional[TransportConfig] = None,
+                     activity_feed: Optional[ActivityFeed] = None) -> "AsyncSupabaseClient":
+        """
+        Connect to Supabase with credentials from environment.
+        mirror_path enables the local SQLite mirror at that path and starts
+        syncing it in the background; defaults to the AICRM_LOCAL_MIRROR
+        environment variable.
+        backend is 'supabase', or 'sqlite' / 'sqlite:<path>' for the offline
+        LocalBackend (in memory without a path); defaults to the AICRM_BACKEND
+        environment variable, then 'supabase'.
+        transport configures pooling, timeouts, retries and the circuit breaker;
+        defaults to TransportConfig.from_env().
+        activity_feed replaces the default home page feed; see __init__.
+        """
+        transport = transport or TransportConfig.from_env()
+        backend = backend or os.environ.get("AICRM_BACKEND") or "supabase"
+        if backend.split(':', 1)[0] == 'sqlite':
+            connection = LocalBackend(backend.partition(':')[2] or ':memory:')
+        elif backend == 'supabase':
+            url = os.environ.get("SUPABASE_URL")
+            key = os.environ.get("SUPABASE_KEY")
+
+            if not url or not key:
+                raise ValueError("Supabase URL and KEY must be set in environment variables")
+            connection = await acreate_client(url, key, options=_client_options(transport))
+        else:
+            raise ValueError(f"Unknown backend {backend!r}; expected 'supabase' or 'sqlite[:path]'")
+
+        mirror_path = mirror_path or os.environ.get("AICRM_LOCAL_MIRROR")
+        mirror = LocalMirror(mirror_path) if mirror_path else None
+
+        client = cls(connection, local_search, cache, max_concurrency, mirror, transport, activity_feed)
+        if mirror is not None:
+            client.start_mirror_sync()
+        return client
+
+    async def _execute(self, query) -> Any:
+        """
+        Run a query builder, waiting for a free slot if too many are in flight.
+        Remote queries get a per-call timeout, retries with jittered backoff
+        for transient read failures, and fail fast with DatabaseUnavailable
+        while the circuit breaker is open. Every attempt is recorded in the
+        current QueryLog, if any.
+        """
+        log = query_log.get()
+        method = client_method.get() if log is not None else None
+        if isinstance(query, MirrorQuery):
+            # Local SQLite: nothing to time out, retry or trip over
+            return await self._attempt(query, log, method)
+
+        # Only reads are idempotent enough to resend
+        attempts = self._transport.read_attempts if getattr(query, 'http_method', None) == 'GET' else 1
+        for attempt in range(attempts):
+            if not self._breaker.allow():
+                raise DatabaseUnavailable(f"Database unavailable, retrying in {self._breaker.retry_in():.0f}s")
+            try:
+                response = await self._attempt(query, log, method)
+            except Exception as e:
+                if not is_transient(e):
+                    # The database answered, so it is up; the query itself is wrong
+                    self._breaker.record_success()
+                    raise
+                self._breaker.record_failure()
+                if attempt + 1 == attempts:
+                    raise
+                logger.warning(f"Retrying {method or 'query'} after transient error: {e!r}")
+            except BaseException:
+                self._breaker.abandon()
+                raise
+            else:
+                self._breaker.record_success()
+                return response
+            await asyncio.sleep(self._transport.backoff(attempt))
+
+    async def _attempt(self, query, log, method: Optional[str]) -> Any:
+        """One timed, logged execution of a query builder in a concurrency slot."""
+        async with self._query_slots:
+            started = time.perf_counter()
+            try:
+                response = query.execute()
+                # Local mirror queries answer synchronously
+                if inspect.isawaitable(response):
+                    response = await asyncio.wait_for(response, self._transport.timeout)
+            except Exception as e:
+                if log is not None:
+                    log.record(_query_record(method, query, time.perf_counter() - started, None, e))
+                raise
+        if log is not None:
+            log.record(_query_record(method, query, time.perf_counter() - started, response.data))
+        return response
+
+    async def _fetch_data(self, query) -> List[Dict]:
+        """Run a query builder and return its rows."""
+        return (await self._execute(query)).data
+
+    def _models(self, model: Type[Row], table: str, rows: Iterable[Dict]) -> List[Row]:
+        """Wrap result rows in a row model whose lazy fields load through field_loader."""
+        loader: Optional[FieldLoader] = partial(self.field_loader, table) if self.field_loader is not None else None
+        return model.from_rows(rows, loader)
+
+    async def _fetch_models(self, model: Type[Row], table: str, query) -> List[Row]:
+        """_fetch_data, with the rows wrapped in a row model."""
+        return self._models(model, table, await self._fetch_data(query))
+
+    async def fetch_fields(self, table: str, ids: List[Any], fields: Iterable[str]) -> Dict[Any, Dict]:
+        """
+        Fetch some columns of the given rows.
+        Returns {id: {field: value}}; rows that no longer exist are left out.
+        Errors propagate to the caller.
+        """
+        columns = ", ".join(['id', *fields])
+        values = {}
+        for start in range(0, len(ids), FIELD_FETCH_BATCH_SIZE):
+            batch = ids[start:start + FIELD_FETCH_BATCH_SIZE]
+            for row in await self._fetch_data(self._read_table(table).select(columns).in_('id', batch)):
+                values[row['id']] = row
+        return values
+
+    def _read_source(self, table: str) -> str:
+        """Where a read of table goes now: 'mirror' once the local mirror has synced, otherwise 'server'."""
+        if self._mirror is not None and self._mirror.mirrors(table) and self._mirror.ready:
+            return 'mirror'
+        return 'server'
+
+    def _read_table(self, table: str, source: Optional[str] = None):
+        """
+        Query builder for a read of table from source, by default _read_source.
+        Pass the source of an earlier read to keep a keyset walk on it: the
+        mirror orders text by code point, the server by its collation.
+        """
+        if (source or self._read_source(table)) == 'mirror' and self._mirror is not None:
+            return self._mirror.table(table)
+        return self.client.table(table)
+
+    def _mirror_rows(self, table: str, rows: Iterable[Dict]) -> None:
+        """Write rows returned by a Supabase write through to the local mirror."""
+        if self._mirror is not None and rows:
+            self._mirror.upsert_rows(table, rows)
+
+    async def _refresh_mirrored_customers(self, customer_ids: Iterable[int]) -> None:
+        """
+        Re-read customers a trigger wrote (last_contact, migration 008) into
+        the local mirror. A failure is only logged: the write itself succeeded
+        and the next delta sync picks the rows up.
+        """
+        customer_ids = list(dict.fromkeys(customer_ids))
+        if self._mirror is None or not customer_ids:
+            return
+        try:
+            for start in range(0, len(customer_ids), FIELD_FETCH_BATCH_SIZE):
+                batch = customer_ids[start:start + FIELD_FETCH_BATCH_SIZE]
+                self._mirror_rows('customers', await self._fetch_data(
+                    self.client.table('customers').select("*").in_('id', batch)
+                ))
+        except Exception as e:
+            logger.warning(f"Failed to refresh mirrored customers {customer_ids}: {e!r}")
+
+    def _bulk_insert_query(self, table: str, rows: List[Dict]):
+        """
+        Insert request for a batch. Rows carrying an import_key (migration 007)
+        that is already stored are skipped and left out of the response, so a
+        batch replayed after a crash is not inserted twice.
+        """
+        if any(row.get('import_key') for row in rows):
+            return self.client.table(table).upsert(rows, on_conflict='import_key', ignore_duplicates=True)
+        return self.client.table(table).insert(rows)
+
+    async def test_connection(self) -> bool:
+        """
+        Test if we can connect to Supabase.
+        Returns True if successful, False otherwise.
+        """
+        try:
+            # Simple query to test connection
+            await self._execute(self.client.table('customers').select("id").limit(1))
+            return True
+        except Exception as e:
+            report_error(f"Database connection failed: {e}")
+            return False
+
+    async def _cached_read(self, key: Hashable, tables: Iterable[str], fetch: Callable[[], Awaitable[Any]],
+                           ttl_seconds: Optional[float] = None) -> Any:
+        """
+        Return the cached result for key, or await fetch and cache what it returns.
+        tables lists every table the query reads, embedded joins included,
+        so a write to any of them invalidates the entry. A result is not
+        cached if one of them was invalidated while it was being fetched:
+        it may predate that write.
+        """
+        hit, value = self.cache.get(key)
+        if hit:
+            log = query_log.get()
+            if log is not None:
+                log.record_cache_hit()
+            return value
+        tables = tuple(tables)
+        generation = self.cache.generation(tables)
+        try:
+            value = await fetch()
+        except Exception as e:
+            # While the database is degraded, an expired copy beats an error
+            if not is_transient(e):
+                raise
+            stale, value = self.cache.get_stale(key)
+            if not stale:
+                raise
+            logger.warning(f"Serving stale cache entry for {key!r}: {e!r}")
+            return value
+        self.cache.set(key, value, tables, ttl_seconds, generation=generation)
+        return value
+
+    async def _collect(self, rows: AsyncIterator[Dict]) -> List[Dict]:
+        """Drain an async row stream into a list."""
+        return [row async for row in rows]
+
+    def _invalidate(self, *tables: str) -> None:
+        """Drop cached reads of tables after a write."""
+        for table in tables:
+            self.cache.invalidate_table(table)
+        # Feed items embed customer names, so customer writes reload it too
+        if 'interactions' in tables or 'customers' in tables:
+            self._activity_feed.invalidate()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get read-through cache counters (hits, misses, hit_rate, size, evictions).
+        """
+        return self.cache.stats()
+
+    def transport_status(self) -> Dict[str, Any]:
+        """
+        Get circuit breaker state for the connection indicator.
+        Returns dict like {'state': 'closed', 'failures': 0, 'retry_in': 0.0};
+        state is 'closed', 'open' or 'half_open'.
+        """
+        return self._breaker.status()
+
+    async def iter_table_rows(self, table: str, columns: str = "*", page_size: int = MAX_PAGE_SIZE,
+                              between: Optional[Tuple[str, Any, Any]] = None, key: str = 'id') -> AsyncIterator[Dict]:
+        """
+        Stream every row of a table in key order, one page at a time.
+        columns must include key, which must be unique.
+        between=(column, start, end) limits rows to start <= column < end;
+        either bound may be None.
+        Uses keyset pagination on key so memory stays bounded for large tables.
+        Errors propagate to the caller; this is meant for batch jobs, not views.
+        """
+        last_key = None
+        while True:
+            query = self.client.table(table).select(columns)
+            if between is not None:
+                column, start, end = between
+                if start is not None:
+                    query = query.gte(column, start)
+                if end is not None:
+                    query = query.lt(column, end)
+            if last_key is not None:
+                query = query.gt(key, last_key)
+            rows = await self._fetch_data(query.order(key).limit(page_size))
+
+            for row in rows:
+                yield row
+
+            if len(rows) < page_size:
+                return
+            last_key = rows[-1][key]
+
+    # LOCAL MIRROR
+    def start_mirror_sync(self, interval_seconds: float = MIRROR_SYNC_SECONDS) -> None:
+        """
+        Keep the local mirror in sync from a background task on the running loop.
+        Reads stay on Supabase until the first full sync finishes.
+        """
+        if self._mirror is None or self._mirror_sync_task is not None:
+            return
+        self._mirror_sync_interval = interval_seconds
+        self._mirror_sync_task = asyncio.ensure_future(self._mirror_sync_loop(interval_seconds))
+
+    async def _mirror_sync_loop(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                await self.sync_mirror()
+            except Exception as e:
+                # Keep serving the last synced copy; the staleness indicator shows the error
+                self._mirror_error = str(e)
+                logger.warning("Local mirror sync failed: %s", e)
+            await asyncio.sleep(interval_seconds)
+
+    async def sync_mirror(self) -> Dict[str, int]:
+        """
+        Pull rows changed or deleted since the last sync into the local mirror.
+        Returns dict like {'customers': 3, ..., 'deleted': 1} of new changes applied.
+        Errors propagate.
+        """
+        if self._mirror is None:
+            return {}
+
+        async with self._mirror_sync_lock:
+            applied = {table: await self._sync_mirror_table(table) for table in MIRROR_TABLES}
+            deleted_tables = await self._sync_mirror_deletions()
+            applied['deleted'] = sum(deleted_tables.values())
+            self._mirror_error = None
+
+        changed = {table for table in MIRROR_TABLES if applied[table] or deleted_tables.get(table)}
+        if 'products' in changed:
+            self._bump_catalog_version()
+        self._invalidate(*changed)
+        return applied
+
+    async def _sync_mirror_table(self, table: str) -> int:
+        """
+        Copy rows with updated_at past the watermark, keyset-paginated on (updated_at, id).
+        Each pull starts MIRROR_SYNC_OVERLAP_SECONDS before the watermark;
+        re-applying a row is harmless. Returns the number of new changes.
+        """
+        since = self._mirror.get_watermark(table)
+        watermark, changes, last = since, 0, None
+
+        while True:
+            query = self.client.table(table).select("*")
+            if last is not None:
+                updated_at = _quote_filter_value(last['updated_at'])
+                query = query.or_(f"updated_at.gt.{updated_at},and(updated_at.eq.{updated_at},id.gt.{last['id']})")
+            elif since is not None:
+                query = query.gte('updated_at', _rewind(since, MIRROR_SYNC_OVERLAP_SECONDS))
+            rows = await self._fetch_data(query.order('updated_at').order('id').limit(MAX_PAGE_SIZE))
+
+            if rows:
+                self._mirror.upsert_rows(table, rows)
+                changed = [row for row in rows if since is None or row['updated_at'] > since]
+                changes += len(changed)
+                if table == 'customers' and self._search_index is not None:
+                    for customer in changed:
+                        self._search_index.add(customer)
+                last = rows[-1]
+                watermark = max(watermark or last['updated_at'], last['updated_at'])
+
+            if len(rows) < MAX_PAGE_SIZE:
+                break
+
+        self._mirror.set_watermark(table, watermark)
+        return changes
+
+    async def _sync_mirror_deletions(self) -> Dict[str, int]:
+        """Apply tombstones from deleted_rows. Returns deletions per table."""
+        since = self._mirror.get_watermark(DELETIONS_FEED)
+        start = _rewind(since, MIRROR_SYNC_OVERLAP_SECONDS) if since is not None else None
+        watermark, deleted = since, {}
+
+        async for tombstone in self.iter_table_rows(
+            'deleted_rows', "id, table_name, row_id, deleted_at", between=('deleted_at', start, None)
+        ):
+            table = tombstone['table_name']
+            self._mirror.delete_rows(table, [tombstone['row_id']])
+            if table == 'customers' and self._search_index is not None:
+                self._search_index.remove(tombstone['row_id'])
+            if since is None or tombstone['deleted_at'] > since:
+                deleted[table] = deleted.get(table, 0) + 1
+            watermark = max(watermark or tombstone['deleted_at'], tombstone['deleted_at'])
+
+        self._mirror.set_watermark(DELETIONS_FEED, watermark)
+        return deleted
+
+    def mirror_status(self) -> Dict[str, Any]:
+        """
+        Get local mirror state for the staleness indicator.
+        Returns dict like {'enabled': True, 'ready': True, 'age_seconds': 12.5,
+        'sync_interval': 30.0, 'error': None}; age_seconds is None before the first sync.
+        """
+        if self._mirror is None:
+            return {'enabled': False, 'ready': False, 'age_seconds': None, 'sync_interval': None, 'error': None}
+
+        synced_at = self._mirror.last_synced_at()
+        return {
+            'enabled': True,
+            'ready': synced_at is not None,
+            'age_seconds': time.time() - synced_at if synced_at is not None else None,
+            'sync_interval': self._mirror_sync_interval,
+            'error': self._mirror_error
+        }
+
+    # CUSTOMER OPERATIONS
+    async def get_all_customers(self, sort_by: str = 'name', cursor: Optional[Tuple[Any, int, str]] = None,
+                                page_size: int = CUSTOMER_PAGE_SIZE) -> Dict:
+        """
+        Fetch one page of customers, ordered by the chosen sort column.
+        Returns dict like {'customers': [...], 'next_cursor': ...};
+        pass next_cursor back in to get the following page (None on the last page).
+        """
+        try:
+            return await self._fetch_customer_page(sort_by, cursor, page_size)
+        except Exception as e:
+            report_error(f"Failed to fetch customers: {e}")
+            return {'customers': [], 'next_cursor': None}
+
+    async def get_customer_by_id(self, customer_id: int, columns: str = "*") -> Optional[Customer]:
+        """
+        Fetch a single customer by ID.
+        Returns a Customer row or None if not found.
+        """
+        try:
+            rows = await self._cached_read(
+                ('customers', 'by_id', customer_id, columns), ('customers',),
+                lambda: self._fetch_models(Customer, 'customers', self._read_table('customers').select(columns).eq(
+                    'id', customer_id
+                ))
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            report_error(f"Failed to fetch customer: {e}")
+            return None
+
+    async def search_customers(self, search_term: str, sort_by: str = 'name', cursor: Optional[Any] = None,
+                               page_size: int = CUSTOMER_PAGE_SIZE) -> Dict:
+        """
+        Search customers by name, email, or company.
+        Returns one page in the same shape as get_all_customers.
+        With the local search index enabled, results are ranked by relevance
+        (exact, then prefix, then fuzzy matches) instead of sort_by.
+        """
+        try:
+            if self._search_index is not None:
+                return await self._search_customers_locally(search_term, cursor or 0, page_size)
+
+            # Search in multiple fields using 'or' condition
+            term = _quote_filter_value(f"%{search_term}%")
+            search_filter = (
+                f"or(first_name.ilike.{term},"
+                f"last_name.ilike.{term},"
+                f"email.ilike.{term},"
+                f"company.ilike.{term})"
+            )
+            return await self._fetch_customer_page(sort_by, cursor, page_size, search_filter=search_filter)
+        except Exception as e:
+            report_error(f"Search failed: {e}")
+            return {'customers': [], 'next_cursor': None}
+
+    async def _search_customers_locally(self, search_term: str, offset: int, page_size: int) -> Dict:
+        """
+        Answer a search from the trigram index, then fetch just the page's rows by id.
+        The cursor is the offset into the ranked results.
+        """
+        await self._ensure_search_index()
+        ranked_ids = self._search_index.search(search_term)
+        page_ids = ranked_ids[offset:offset + page_size]
+
+        customers = []
+        if page_ids:
+            rows = await self._fetch_models(
+                Customer, 'customers', self._read_table('customers').select(CUSTOMER_LIST_COLUMNS).in_('id', page_ids)
+            )
+            rank = {customer_id: position for position, customer_id in enumerate(page_ids)}
+            customers = sorted(rows, key=lambda customer: rank[customer['id']])
+
+        next_offset = offset + page_size
+        return {'customers': customers, 'next_cursor': next_offset if next_offset < len(ranked_ids) else None}
+
+    async def _ensure_search_index(self) -> None:
+        """Build the search index on first use and refresh it once it gets old."""
+        async with self._search_index_lock:
+            built_at = self._search_index_built_at
+            if built_at is not None and time.monotonic() - built_at < SEARCH_INDEX_MAX_AGE_SECONDS:
+                return
+            customers = [row async for row in self.iter_table_rows('customers', "id, first_name, last_name, email, company")]
+            self._search_index.build(customers)
+            self._search_index_built_at = time.monotonic()
+
+    async def filter_customers_by_stage(self, stage: str, sort_by: str = 'name', cursor: Optional[Tuple[Any, int, str]] = None,
+                                        page_size: int = CUSTOMER_PAGE_SIZE) -> Dict:
+        """
+        Filter customers by pipeline stage.
+        Returns one page in the same shape as get_all_customers.
+        """
+        try:
+            return await self._fetch_customer_page(sort_by, cursor, page_size, stage=stage.lower())
+        except Exception as e:
+            report_error(f"Filter failed: {e}")
+            return {'customers': [], 'next_cursor': None}
+
+    async def _fetch_customer_page(self, sort_by: str, cursor: Optional[Tuple[Any, int, str]], page_size: int,
+                                   search_filter: Optional[str] = None, stage: Optional[str] = None) -> Dict:
+        """
+        Run a keyset-paginated customer query.
+        The cursor is the (sort value, id) of the last row on the previous page,
+        so every page is an index range scan no matter how deep it is, plus the
+        source that served the first page: a walk stays on it even if the
+        mirror becomes ready midway, since the two order text differently.
+        """
+        return await self._cached_read(
+            ('customers', 'page', sort_by, cursor, page_size, search_filter, stage), ('customers',),
+            lambda: self._query_customer_page(sort_by, cursor, page_size, search_filter, stage)
+        )
+
+    async def _query_customer_page(self, sort_by: str, cursor: Optional[Tuple[Any, int, str]], page_size: int,
+                                   search_filter: Optional[str], stage: Optional[str]) -> Dict:
+        """Uncached body of _fetch_customer_page."""
+        column, descending = CUSTOMER_SORT_COLUMNS[sort_by]
+        source = cursor[2] if cursor is not None else self._read_source('customers')
+
+        query = self._read_table('customers', source).select(CUSTOMER_LIST_COLUMNS)
+        if stage:
+            query = query.eq('stage', stage)
+
+        conditions = [search_filter] if search_filter else []
+        if cursor is not None:
+            conditions.append(_keyset_filter(column, descending, cursor[:2]))
+        if conditions:
+            query = query.or_(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+
+        # Fetch one extra row to learn whether another page exists
+        rows = await self._fetch_data(query.order(column, desc=descending).order('id').limit(page_size + 1))
+        customers = self._models(Customer, 'customers', rows[:page_size])
+
+        next_cursor = None
+        if len(rows) > page_size:
+            last = customers[-1]
+            next_cursor = (last.get(column), last['id'], source)
+
+        return {'customers': customers, 'next_cursor': next_cursor}
+
+    async def create_customer(self, customer_data: Dict) -> Optional[Dict]:
+        """
+        Create a new customer.
+        Returns the created customer dict or None if failed.
+        """
+        try:
+            response = await self._execute(self.client.table('customers').insert(customer_data))
+            self._mirror_rows('customers', response.data)
+            self._invalidate('customers')
+            if self._search_index is not None and response.data:
+                self._search_index.add(response.data[0])
+            return response.data[0] if response.data else None
+        except Exception as e:
+            report_error(f"Failed to create customer: {e}")
+            return None
+
+    async def bulk_create_customers(self, customers: List[Dict]) -> List[Dict]:
+        """
+        Insert a batch of customers in one request.
+        Rows whose import_key is already stored are skipped; see _bulk_insert_query.
+        Returns the created rows. Errors propagate; this is meant for batch jobs, not views.
+        """
+        if not customers:
+            return []
+        created = await self._fetch_data(self._bulk_insert_query('customers', customers))
+        self._mirror_rows('customers', created)
+        self._invalidate('customers')
+        if self._search_index is not None:
+            for customer in created:
+                self._search_index.add(customer)
+        return created
+
+    async def update_customer(self, customer_id: int, updates: Dict) -> Optional[Dict]:
+        """
+        Update an existing customer.
+        Returns the updated customer dict or None if failed.
+        """
+        try:
+            # Add updated_at timestamp
+            updates['updated_at'] = 'now()'
+            response = await self._execute(self.client.table('customers').update(updates).eq('id', customer_id))
+            self._mirror_rows('customers', response.data)
+            self._invalidate('customers')
+            if self._search_index is not None and response.data:
+                self._search_index.add(response.data[0])
+            return response.data[0] if response.data else None
+        except Exception as e:
+            report_error(f"Failed to update customer: {e}")
+            return None
+
+    async def delete_customer(self, customer_id: int) -> bool:
+        """
+        Delete a customer and all their interactions.
+        Returns True if successful, False otherwise.
+        """
+        try:
+            # First delete all interactions and the sentiment aggregate for this customer
+            await asyncio.gather(
+                self._execute(self.client.table('interactions').delete().eq('customer_id', customer_id)),
+                self._execute(self.client.table('customer_sentiment_stats').delete().eq('customer_id', customer_id))
+            )
+
+            # Then delete the customer
+            await self._execute(self.client.table('customers').delete().eq('id', customer_id))
+            if self._mirror is not None:
+                self._mirror.delete_where('interactions', 'customer_id', customer_id)
+                self._mirror.delete_rows('customers', [customer_id])
+            self._invalidate('customers', 'interactions', 'customer_sentiment_stats')
+            if self._search_index is not None:
+                self._search_index.remove(customer_id)
+            return True
+        except Exception as e:
+            report_error(f"Failed to delete customer: {e}")
+            return False
+
+    # INTERACTION OPERATIONS
+    async def get_customer_interactions(self, customer_id: int, columns: str = "*") -> List[Interaction]:
+        """
+        Get all interactions for a specific customer.
+        Ordered by date (newest first).
+        """
+        try:
+            return await self._cached_read(
+                ('interactions', 'by_customer', customer_id, columns), ('interactions',),
+                lambda: self._fetch_models(Interaction, 'interactions', self._read_table('interactions').select(
+                    columns
+                ).eq('customer_id', customer_id).order('date', desc=True))
+            )
+        except Exception as e:
+            report_error(f"Failed to fetch interactions: {e}")
+            return []
+
+    async def get_recent_interactions(self, limit: int = 10) -> List[Interaction]:
+        """
+        Get the most recent interactions across all customers.
+        Useful for dashboard activity feed. content is loaded lazily.
+        """
+        try:
+            return await self._cached_read(
+                ('interactions', 'recent', limit), ('interactions', 'customers'),
+                lambda: self._fetch_models(Interaction, 'interactions', self._read_table('interactions').select(
+                    INTERACTION_FEED_COLUMNS
+                ).order('date', desc=True).limit(limit))
+            )
+        except Exception as e:
+            report_error(f"Failed to fetch recent interactions: {e}")
+            return []
+
+    async def get_activity_feed(self, limit: int = 10) -> Dict:
+        """
+        Get the newest interactions from the shared activity feed.
+        Returns dict like {'items': [Interaction, ...], 'cursor': 42}; items
+        with an id past a cursor returned earlier arrived since then, though
+        one committed late can arrive with a lower id.
+        The feed polls the database at most once per ACTIVITY_FEED_POLL_SECONDS
+        for all callers; if a poll fails the last items are served.
+        content is loaded lazily.
+        """
+        try:
+            await self._refresh_activity_feed()
+        except Exception as e:
+            # Don't flash an error on every dashboard refresh; the breaker status shows outages
+            logger.warning(f"Activity feed refresh failed: {e}")
+        return self._activity_feed.snapshot(limit)
+
+    async def _refresh_activity_feed(self) -> None:
+        """Poll for interactions past the feed's cursor or in its gaps, or reload the feed when it is due."""
+        feed = self._activity_feed
+        if not feed.due():
+            return
+        async with self._activity_feed_lock:
+            # Another caller may have polled while this one waited
+            if not feed.due():
+                return
+            feed.mark_polled()
+
+            if not feed.needs_reload():
+                gaps = feed.gaps()
+                query = self._read_table('interactions').select(INTERACTION_FEED_COLUMNS)
+                if gaps:
+                    query = query.or_(f"id.gt.{feed.cursor},id.in.({','.join(map(str, gaps))})")
+                else:
+                    query = query.gt('id', feed.cursor)
+                poll_limit = feed.poll_limit(len(gaps))
+                rows = await self._fetch_models(
+                    Interaction, 'interactions', query.order('id', desc=True).limit(poll_limit)
+                )
+                if len(rows) < poll_limit:
+                    feed.merge(rows)
+                    return
+                # A burst too big for one poll; the newest ids need not be the newest dates
+
+            feed.load(await self._fetch_models(Interaction, 'interactions', self._read_table('interactions').select(
+                INTERACTION_FEED_COLUMNS
+            ).order('date', desc=True).limit(feed.capacity)))
+
+    async def get_interactions_to_score(self, source: str, after_id: int = 0, limit: int = MAX_PAGE_SIZE) -> List[Dict]:
+        """
+        Get a page of interactions whose sentiment was not set by source, in id order after after_id.
+        Rows look like {'id': 1, 'customer_id': 2, 'content': '...', 'sentiment': 'neutral'}.
+        Reads Supabase, not the mirror. Errors propagate; this is meant for batch jobs.
+        """
+        return await self._fetch_data(self.client.table('interactions').select(
+            "id, customer_id, content, sentiment"
+        ).or_(
+            f"sentiment_source.is.null,sentiment_source.neq.{_quote_filter_value(source)}"
+        ).gt('id', after_id).order('id').limit(limit))
+
+    async def set_interaction_sentiments(self, sentiments: Dict[int, str], source: str) -> List[Dict]:
+        """
+        Set sentiment, and sentiment_source to source, on many interactions:
+        one request per distinct sentiment. Returns the updated rows.
+        Does not refresh customer_sentiment_stats; run
+        database.backfill_sentiment_stats when done. Errors propagate.
+        """
+        ids_by_sentiment: Dict[str, List[int]] = {}
+        for interaction_id, sentiment in sentiments.items():
+            ids_by_sentiment.setdefault(sentiment, []).append(interaction_id)
+
+        responses = await asyncio.gather(*(
+            self._execute(self.client.table('interactions').update({
+                'sentiment': sentiment, 'sentiment_source': source
+            }).in_('id', ids))
+            for sentiment, ids in ids_by_sentiment.items()
+        ))
+        rows = [row for response in responses for row in response.data]
+        self._mirror_rows('interactions', rows)
+        self._invalidate('interactions')
+        return rows
+
+    async def create_interaction(self, interaction_data: Dict) -> Optional[Dict]:
+        """
+        Create a new interaction.
+        The database moves the customer's last_contact forward and folds the
+        interaction into their sentiment aggregate in the same write
+        (migration 008). Returns the created row, or None if it was not created.
+        """
+        try:
+            response = await self._execute(self.client.table('interactions').insert(interaction_data))
+        except Exception as e:
+            report_error(f"Failed to create interaction: {e}")
+            return None
+        if not response.data:
+            return None
+
+        self._mirror_rows('interactions', response.data)
+        self._invalidate('interactions', 'customers', 'customer_sentiment_stats')
+        await self._refresh_mirrored_customers([interaction_data['customer_id']])
+        return response.data[0]
+
+    async def bulk_create_interactions(self, interactions: List[Dict]) -> List[Dict]:
+        """
+        Insert a batch of interactions in one request.
+        Rows whose import_key is already stored are skipped; see _bulk_insert_query.
+        The database folds the rows into the sentiment aggregate and moves
+        last_contact forward (never back) in the same write (migration 008),
+        so no upkeep is left undone if the import dies after the insert.
+        The batch's customers are then re-read into the local mirror.
+        Returns the created rows. Errors propagate; this is meant for batch jobs, not views.
+        """
+        if not interactions:
+            return []
+        created = await self._fetch_data(self._bulk_insert_query('interactions', interactions))
+        self._mirror_rows('interactions', created)
+        self._invalidate('interactions', 'customers', 'customer_sentiment_stats')
+        # From the input rows: replayed ones are not in created, but their customers may be stale too
+        await self._refresh_mirrored_customers(interaction['customer_id'] for interaction in interactions)
+        return created
+
+    async def get_overall_sentiment_for_customers(self, customer_ids: List[int]) -> Dict[int, str]:
+        """
+        Get the overall sentiment for a page of customers in one query.
+        Reads the precomputed customer_sentiment_stats aggregate.
+        Returns dict like {12: 'positive', 15: 'neutral'}.
+        """
+        try:
+            customer_ids = list(dict.fromkeys(customer_ids))
+            sentiments = {customer_id: 'neutral' for customer_id in customer_ids}
+
+            if customer_ids:
+                rows = await self._cached_read(
+                    ('customer_sentiment_stats', 'overall', tuple(customer_ids)), ('customer_sentiment_stats',),
+                    lambda: self._fetch_data(self.client.table('customer_sentiment_stats').select(
+                        "customer_id, overall_sentiment"
+                    ).in_('customer_id', customer_ids))
+                )
+
+                for row in rows:
+                    sentiments[row['customer_id']] = row['overall_sentiment']
+
+            return sentiments
+        except Exception as e:
+            report_error(f"Failed to get customer sentiments: {e}")
+            return {}
+
+    async def get_customer_sentiment_stats(self, customer_id: int) -> Dict:
+        """
+        Get the sentiment aggregate for a customer.
+        Returns an empty aggregate if the customer has no interactions yet.
+        """
+        try:
+            rows = await self._cached_read(
+                ('customer_sentiment_stats', 'by_customer', customer_id), ('customer_sentiment_stats',),
+                lambda: self._fetch_data(
+                    self.client.table('customer_sentiment_stats').select("*").eq('customer_id', customer_id)
+                )
+            )
+            return rows[0] if rows else empty_stats(customer_id)
+        except Exception as e:
+            report_error(f"Failed to fetch customer sentiment: {e}")
+            return empty_stats(customer_id)
+
+    async def rebuild_sentiment_stats(self) -> int:
+        """
+        Recompute every customer's sentiment aggregate from their interactions,
+        inside the database (rebuild_customer_sentiment_stats, migration 008),
+        and drop the aggregates of customers with none left.
+        Returns the number of customers written. Errors propagate; this is
+        meant for batch jobs, not views.
+        """
+        response = await self._execute(self.client.rpc('rebuild_customer_sentiment_stats', {}))
+        self._invalidate('customer_sentiment_stats')
+        return response.data or 0
+
+    # ANALYTICS OPERATIONS
+    async def get_dashboard_rollup(self) -> Dict:
+        """
+        Get customer counts per pipeline stage plus totals, in one query.
+        Returns dict like {'stages': {'lead': 5, ...}, 'total_customers': 20, 'new_this_week': 3}.
+        Cached for STAGE_ROLLUP_TTL_SECONDS and invalidated by customer writes.
+        """
+        try:
+            return await self._cached_read(
+                ('customer_stage_counts', 'rollup'), ('customers',),
+                self._query_dashboard_rollup, ttl_seconds=STAGE_ROLLUP_TTL_SECONDS
+            )
+        except Exception as e:
+            report_error(f"Failed to get stage counts: {e}")
+            return {'stages': {stage: 0 for stage in PIPELINE_STAGES}, 'total_customers': 0, 'new_this_week': 0}
+
+    async def _query_dashboard_rollup(self) -> Dict:
+        """Uncached body of get_dashboard_rollup."""
+        rows = await self._fetch_data(self.client.table('customer_stage_counts').select("stage, total, new_this_week"))
+
+        stages = {stage: 0 for stage in PIPELINE_STAGES}
+        new_this_week = 0
+        for row in rows:
+            stages[row['stage']] = row['total']
+            new_this_week += row['new_this_week']
+
+        return {
+            'stages': stages,
+            'total_customers': sum(stages.values()),
+            'new_this_week': new_this_week
+        }
+
+    async def get_customer_counts_by_stage(self) -> Dict[str, int]:
+        """
+        Get count of customers in each pipeline stage.
+        Returns dict like {'lead': 5, 'prospect': 3, 'customer': 12}
+        """
+        return dict((await self.get_dashboard_rollup())['stages'])
+
+    async def get_daily_snapshots(self, start_day: Optional[str] = None, end_day: Optional[str] = None) -> List[Dict]:
+        """
+        Get daily analytics rollups for start_day <= day < end_day (ISO dates, either may be None).
+        Rows look like {'day': '2024-05-01', 'metric': 'revenue', 'dimension': 'suits',
+        'sentiment': '', 'count': 3, 'amount': 1250.0}.
+        """
+        try:
+            return await self._cached_read(
+                ('daily_analytics_snapshots', start_day, end_day), ('daily_analytics_snapshots',),
+                lambda: self._collect(self.iter_table_rows(
+                    'daily_analytics_snapshots', "id, day, metric, dimension, sentiment, count, amount",
+                    between=('day', start_day, end_day)
+                ))
+            )
+        except Exception as e:
+            report_error(f"Failed to fetch analytics snapshots: {e}")
+            return []
+
+    async def replace_daily_snapshots(self, days: List[str], rows: List[Dict]) -> None:
+        """
+        Replace every snapshot row for days (ISO dates) with rows.
+        Errors propagate; this is meant for batch jobs, not views.
+        """
+        for start in range(0, len(days), DELETE_BATCH_SIZE):
+            await self._execute(
+                self.client.table('daily_analytics_snapshots').delete().in_('day', days[start:start + DELETE_BATCH_SIZE])
+            )
+        for start in range(0, len(rows), MAX_PAGE_SIZE):
+            await self._execute(self.client.table('daily_analytics_snapshots').insert(rows[start:start + MAX_PAGE_SIZE]))
+        self._invalidate('daily_analytics_snapshots')
+
+    async def get_analytics_dirty_days(self) -> List[Dict]:
+        """
+        Get days whose snapshots are out of date, oldest first.
+        Rows look like {'day': '2024-05-01', 'marked_at': '...'}; the triggers in
+        migration 003 mark a day whenever a row dated on it is written.
+        Errors propagate; this is meant for batch jobs, not views.
+        """
+        return await self._collect(self.iter_table_rows('analytics_dirty_days', "day, marked_at", key='day'))
+
+    async def clear_analytics_dirty_days(self, dirty_days: List[Dict]) -> None:
+        """
+        Mark days as snapshotted. A day touched again after it was read
+        (marked_at moved on) stays dirty for the next run.
+        Errors propagate; this is meant for batch jobs, not views.
+        """
+        for start in range(0, len(dirty_days), DELETE_BATCH_SIZE):
+            conditions = ",".join(
+                f"and(day.eq.{row['day']},marked_at.lte.{_quote_filter_value(row['marked_at'])})"
+                for row in dirty_days[start:start + DELETE_BATCH_SIZE]
+            )
+            await self._execute(self.client.table('analytics_dirty_days').delete().or_(conditions))
+
+    # AI SUMMARY OPERATIONS
+    async def get_summary_queue(self) -> List[Dict]:
+        """
+        Get customers whose AI summary is out of date, longest waiting first.
+        Rows look like {'customer_id': 7, 'marked_at': '...'}; the triggers in
+        migration 006 queue a customer whenever their interactions,
+        transactions or profile are written.
+        Errors propagate; this is meant for batch jobs, not views.
+        """
+        rows = await self._collect(self.iter_table_rows('ai_summary_queue', "customer_id, marked_at", key='customer_id'))
+        return sorted(rows, key=lambda row: str(row['marked_at']))
+
+    async def claim_summary_queue(self, limit: int, customer_id: Optional[int] = None,
+                                  lease_seconds: int = SUMMARY_CLAIM_SECONDS) -> List[Dict]:
+        """
+        Claim up to limit queued customers (or just customer_id), longest
+        waiting first, so no other worker takes them for lease_seconds.
+        Rows look like get_summary_queue's. Clear a row once its summary is
+        saved; a failed one is claimable again when the lease lapses.
+        Errors propagate; this is meant for batch jobs, not views.
+        """
+        return await self._fetch_data(self.client.rpc('claim_ai_summaries', {
+            'max_rows': limit, 'lease_seconds': lease_seconds, 'only_customer': customer_id
+        }))
+
+    async def get_summary_queue_entry(self, customer_id: int) -> Optional[Dict]:
+        """
+        Get a customer's summary queue row, or None if their summary is up to date.
+        """
+        try:
+            rows = await self._cached_read(
+                ('ai_summary_queue', customer_id), SUMMARY_QUEUE_TABLES,
+                lambda: self._fetch_data(
+                    self.client.table('ai_summary_queue').select("customer_id, marked_at").eq('customer_id', customer_id)
+                )
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            report_error(f"Failed to fetch summary queue: {e}")
+            return None
+
+    async def enqueue_customer_summaries(self, customer_ids: List[int]) -> bool:
+        """
+        Queue customers for a new AI summary, e.g. after a prompt change.
+        Returns True if successful, False otherwise.
+        """
+        try:
+            for start in range(0, len(customer_ids), MAX_PAGE_SIZE):
+                await self._execute(self.client.table('ai_summary_queue').upsert([
+                    {'customer_id': customer_id, 'marked_at': 'now()'}
+                    for customer_id in customer_ids[start:start + MAX_PAGE_SIZE]
+                ], on_conflict='customer_id'))
+            self._invalidate('ai_summary_queue')
+            return True
+        except Exception as e:
+            report_error(f"Failed to queue customer summaries: {e}")
+            return False
+
+    async def save_customer_summary(self, customer_id: int, summary: str,
+                                    marked_at: Optional[str] = None) -> Optional[Dict]:
+        """
+        Store a customer's new AI summary and take them off the summary queue.
+        marked_at is the queue row's value when the summary's data was read;
+        if the customer was queued again since, they stay queued. Without it
+        the queue row is removed regardless.
+        Returns the updated customer dict, or None if the customer is gone.
+        Errors propagate to the caller.
+        """
+        response = await self._execute(self.client.table('customers').update({
+            'ai_summary': summary,
+            'ai_summary_generated_at': 'now()',
+            'updated_at': 'now()'
+        }).eq('id', customer_id))
+        self._mirror_rows('customers', response.data)
+        await self.clear_summary_queue([{'customer_id': customer_id, 'marked_at': marked_at}])
+        self._invalidate('customers')
+        return response.data[0] if response.data else None
+
+    async def clear_summary_queue(self, entries: List[Dict]) -> None:
+        """
+        Take summary queue rows off the queue. A row whose marked_at moved on
+        since it was read stays queued; one with marked_at None is removed
+        regardless.
+        Errors propagate; this is meant for batch jobs, not views.
+        """
+        for start in range(0, len(entries), DELETE_BATCH_SIZE):
+            conditions = ",".join(
+                f"customer_id.eq.{row['customer_id']}" if row.get('marked_at') is None else
+                f"and(customer_id.eq.{row['customer_id']},marked_at.lte.{_quote_filter_value(row['marked_at'])})"
+                for row in entries[start:start + DELETE_BATCH_SIZE]
+            )
+            await self._execute(self.client.table('ai_summary_queue').delete().or_(conditions))
+        self._invalidate('ai_summary_queue')
+
+    # PRODUCT OPERATIONS
+    def get_catalog_version(self) -> int:
+        """
+        Get the current product catalog version.
+        Bumped by every product write made through this client, and when a
+        reload after CATALOG_TTL_SECONDS finds the catalog changed elsewhere.
+        """
+        with self._catalog_lock:
+            return self._catalog_version
+
+    async def _get_catalog(self) -> Tuple[int, List[Product]]:
+        """
+        Get the cached catalog, as read-only Product rows shared by every
+        caller, and the version it belongs to. Fetches from Supabase when a
+        product write has bumped the version or the catalog is older than
+        CATALOG_TTL_SECONDS; concurrent callers wait for a single fetch.
+        """
+        cached = self._cached_catalog()
+        if cached is not None:
+            return cached
+
+        async with self._catalog_load_lock:
+            # Another caller may have loaded it while this one waited
+            cached = self._cached_catalog()
+            if cached is not None:
+                return cached
+
+            with self._catalog_lock:
+                version, previous = self._catalog_version, self._catalog
+            products = Product.from_rows([row async for row in self.iter_table_rows('products')])
+
+            with self._catalog_lock:
+                if previous is not None and version == self._catalog_version and products != previous:
+                    # Changed by another process; the product matcher follows the version
+                    self._catalog_version += 1
+                    version = self._catalog_version
+                # A write during the fetch leaves the version ahead, forcing a refetch next time
+                self._catalog = products
+                self._catalog_loaded_version = version
+                self._catalog_loaded_at = time.monotonic()
+            return version, products
+
+    def _cached_catalog(self) -> Optional[Tuple[int, List[Product]]]:
+        """The cached catalog and its version, if no write or CATALOG_TTL_SECONDS has made it stale."""
+        with self._catalog_lock:
+            if (self._catalog is not None and self._catalog_loaded_version == self._catalog_version
+                    and time.monotonic() - self._catalog_loaded_at < CATALOG_TTL_SECONDS):
+                return self._catalog_version, self._catalog
+        return None
+
+    def _bump_catalog_version(self) -> None:
+        """Mark the cached catalog stale after a product write."""
+        with self._catalog_lock:
+            self._catalog_version += 1
+            self._catalog = None
+
+    async def get_all_products(self) -> List[Product]:
+        """
+        Get all products from the database.
+        Returns a list of read-only Product rows, served from the shared catalog cache.
+        """
+        try:
+            _, products = await self._get_catalog()
+            return list(products)
+        except Exception as e:
+            report_error(f"Failed to fetch products: {e}")
+            return []
+
+    async def get_products_by_category(self, category: str) -> List[Product]:
+        """
+        Get products filtered by category.
+        """
+        try:
+            _, products = await self._get_catalog()
+            return [product for product in products if product.get('category') == category]
+        except Exception as e:
+            report_error(f"Failed to fetch products by category: {e}")
+            return []
+
+    async def get_product_by_id(self, product_id: int) -> Optional[Product]:
+        """
+        Get a specific product by ID.
+        """
+        try:
+            _, products = await self._get_catalog()
+            return next((product for product in products if product.get('id') == product_id), None)
+        except Exception as e:
+            report_error(f"Failed to fetch product: {e}")
+            return None
+
+    async def create_product(self, product_data: Dict) -> Optional[Dict]:
+        """
+        Create a new product.
+        """
+        try:
+            response = await self._execute(self.client.table('products').insert(product_data))
+            self._mirror_rows('products', response.data)
+            self._bump_catalog_version()
+            self._invalidate('products')
+            return response.data[0] if response.data else None
+        except Exception as e:
+            report_error(f"Failed to create product: {e}")
+            return None
+
+    async def bulk_create_products(self, products: List[Dict]) -> List[Dict]:
+        """
+        Insert a batch of products in one request.
+        Rows whose import_key is already stored are skipped; see _bulk_insert_query.
+        Returns the created rows. Errors propagate; this is meant for batch jobs, not views.
+        """
+        if not products:
+            return []
+        created = await self._fetch_data(self._bulk_insert_query('products', products))
+        self._mirror_rows('products', created)
+        self._bump_catalog_version()
+        self._invalidate('products')
+        return created
+
+    async def update_product(self, product_id: int, product_data: Dict) -> bool:
+        """
+        Update an existing product.
+        """
+        try:
+            response = await self._execute(self.client.table('products').update(product_data).eq('id', product_id))
+            self._mirror_rows('products', response.data)
+            self._bump_catalog_version()
+            self._invalidate('products')
+            return True
+        except Exception as e:
+            report_error(f"Failed to update product: {e}")
+            return False
+
+    async def delete_product(self, product_id: int) -> bool:
+        """
+        Delete a product.
+        """
+        try:
+            await self._execute(self.client.table('products').delete().eq('id', product_id))
+            if self._mirror is not None:
+                self._mirror.delete_rows('products', [product_id])
+            self._bump_catalog_version()
+            self._invalidate('products')
+            return True
+        except Exception as e:
+            report_error(f"Failed to delete product: {e}")
+            return False
+
+    async def get_product_matcher(self) -> ProductMentionMatcher:
+        """
+        Get the product mention matcher for the current catalog.
+        The automaton is shared across sessions and rebuilt once per catalog version.
+        """
+        version, products = await self._get_catalog()
+
+        with self._matcher_lock:
+            if self._product_matcher is None or self._product_matcher_version != version:
+                self._product_matcher = ProductMentionMatcher(products)
+                self._product_matcher_version = version
+            return self._product_matcher
+
+    async def get_customer_product_interests(self, customer_id: int) -> List[Dict]:
+        """
+        Extract product interests from customer interactions.
+        Returns a list of products mentioned or discussed in interactions.
+        """
+        try:
+            # Get all interactions for the customer and the matcher over the cached catalog
+            interactions, matcher = await asyncio.gather(
+                self.get_customer_interactions(customer_id),
+                self.get_product_matcher()
+            )
+            return matcher.find_product_interests(interactions)
+
+        except Exception as e:
+            report_error(f"Failed to get customer product interests: {e}")
+            return []
+
+    async def get_products_by_interest_keywords(self, keywords: List[str]) -> List[Dict]:
+        """
+        Find products that match interest keywords.
+        """
+        try:
+            all_products = await self.get_all_products()
+            matching_products = []
+
+            for product in all_products:
+                product_text = f"{product.get('name', '')} {product.get('description', '')} {product.get('category', '')}".lower()
+
+                for keyword in keywords:
+                    if keyword.lower() in product_text:
+                        matching_products.append(product)
+                        break
+
+            return matching_products
+
+        except Exception as e:
+            report_error(f"Failed to get products by keywords: {e}")
+            return []
+
+    # TRANSACTION OPERATIONS
+    async def get_customer_transactions(self, customer_id: int) -> List[Transaction]:
+        """
+        Get all transactions for a specific customer.
+        """
+        try:
+            return await self._cached_read(
+                ('transactions', 'by_customer', customer_id), TRANSACTION_TABLES,
+                lambda: self._fetch_models(Transaction, 'transactions', self._read_table('transactions').select(
+                    TRANSACTION_COLUMNS
+                ).eq('customer_id', customer_id).order('transaction_date', desc=True))
+            )
+        except Exception as e:
+            report_error(f"Failed to fetch customer transactions: {e}")
+            return []
+
+    async def get_all_transactions(self) -> List[Transaction]:
+        """
+        Get all transactions with product and customer details.
+        notes is loaded lazily.
+        """
+        try:
+            return await self._cached_read(
+                ('transactions', 'all'), TRANSACTION_TABLES,
+                lambda: self._fetch_models(Transaction, 'transactions', self._read_table('transactions').select(
+                    TRANSACTION_LIST_COLUMNS
+                ).order('transaction_date', desc=True))
+            )
+        except Exception as e:
+            report_error(f"Failed to fetch transactions: {e}")
+            return []
+
+    async def create_transaction(self, transaction_data: Dict) -> Optional[Dict]:
+        """
+        Create a new transaction.
+        """
+        try:
+            response = await self._execute(self.client.table('transactions').insert(transaction_data))
+            self._mirror_rows('transactions', response.data)
+            self._invalidate('transactions')
+            return response.data[0] if response.data else None
+        except Exception as e:
+            report_error(f"Failed to create transaction: {e}")
+            return None
+
+    async def bulk_create_transactions(self, transactions: List[Dict]) -> List[Dict]:
+        """
+        Insert a batch of transactions in one request.
+        Rows whose import_key is already stored are skipped; see _bulk_insert_query.
+        Returns the created rows. Errors propagate; this is meant for batch jobs, not views.
+        """
+        if not transactions:
+            return []
+        created = await self._fetch_data(self._bulk_insert_query('transactions', transactions))
+        self._mirror_rows('transactions', created)
+        self._invalidate('transactions')
+        return created
+
+    async def get_transaction_by_id(self, transaction_id: int) -> Optional[Transaction]:
+        """
+        Get a specific transaction by ID.
+        """
+        try:
+            rows = await self._cached_read(
+                ('transactions', 'by_id', transaction_id), TRANSACTION_TABLES,
+                lambda: self._fetch_models(
+                    Transaction, 'transactions',
+                    self._read_table('transactions').select(TRANSACTION_COLUMNS).eq('id', transaction_id)
+                )
+            )
+            return rows[0] if rows else None
+        except Exception as e:
+            report_error(f"Failed to fetch transaction: {e}")
+            return None
+
+    async def get_customer_purchase_history(self, customer_id: int) -> Dict:
+        """
+        Get comprehensive purchase history for a customer.
+        """
+        try:
+            transactions = await self.get_customer_transactions(customer_id)
+
+            if not transactions:
+                return {
+                    'total_transactions': 0,
+                    'total_spent': 0,
+                    'average_transaction': 0,
+                    'favorite_categories': [],
+                    'recent_purchases': [],
+                    'purchase_timeline': []
+                }
+
+            # Calculate metrics
+            total_spent = sum(t.get('total_amount', 0) for t in transactions)
+            total_transactions = len(transactions)
+            average_transaction = total_spent / total_transactions if total_transactions > 0 else 0
+
+            # Get favorite categories
+            categories = {}
+            for transaction in transactions:
+                product = transaction.get('products', {})
+                category = product.get('category', 'Unknown')
+                categories[category] = categories.get(category, 0) + 1
+
+            favorite_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)
+
+            return {
+                'total_transactions': total_transactions,
+                'total_spent': total_spent,
+                'average_transaction': average_transaction,
+                'favorite_categories': favorite_categories,
+                'recent_purchases': transactions[:5],  # Last 5 purchases
+                'purchase_timeline': transactions
+            }
+
+        except Exception as e:
+            report_error(f"Failed to get purchase history: {e}")
+            return {}
+
+
+def _client_options(transport: TransportConfig) -> AsyncClientOptions:
+    """supabase client options with the transport's timeout and, where supported, its pooled HTTP client."""
+    options = AsyncClientOptions(postgrest_client_timeout=transport.timeout)
+    # Older supabase-py versions build their own httpx client from the timeout alone
+    if hasattr(options, 'httpx_client'):
+        options.httpx_client = transport.http_client()
+    return options
+
+
+def _query_record(method: str, query, seconds: float, data: Optional[List[Dict]],
+                  error: Optional[Exception] = None) -> QueryRecord:
+    """Describe one executed query builder for the query log."""
+    rows = data if isinstance(data, list) else [] if data is None else [data]
+    return QueryRecord(
+        method=method,
+        table=getattr(query, 'path', '').rsplit('/', 1)[-1],
+        operation=getattr(query, 'http_method', '?'),
+        source='mirror' if isinstance(query, MirrorQuery) else 'supabase',
+        seconds=seconds,
+        rows=len(rows),
+        bytes=payload_bytes(data) if data is not None else 0,
+        error=str(error) if error is not None else None
+    )
+
+
+def _quote_filter_value(value: Any) -> str:
+    """
+    Quote a value for use inside a PostgREST logic tree (or/and filters),
+    so commas, dots and parentheses in user data can't break the filter.
+    """
+    if isinstance(value, (int, float)):
+        return str(value)
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _rewind(timestamp: str, seconds: float) -> str:
+    """Move an ISO timestamp back by seconds, keeping it comparable to stored values."""
+    parsed = parse_timestamp(timestamp)
+    if parsed is None:
+        return timestamp
+    return (parsed - timedelta(seconds=seconds)).isoformat()
+
+
+def _keyset_filter(column: str, descending: bool, cursor: Tuple[Any, int]) -> str:
+    """
+    Build the PostgREST condition for rows after the cursor.
+    Postgres sorts NULL above every value (last ascending, first descending),
+    so the NULL cases mirror that ordering.
+    """
+    value, last_id = cursor
+
+    if value is None:
+        after_in_nulls = f"and({column}.is.null,id.gt.{last_id})"
+        # Descending puts NULLs first, so every non-NULL row still follows
+        return f"or({after_in_nulls},{column}.not.is.null)" if descending else after_in_nulls
+
+    value = _quote_filter_value(value)
+    past_value = f"{column}.{'lt' if descending else 'gt'}.{value}"
+    tie_break = f"and({column}.eq.{value},id.gt.{last_id})"
+    if descending:
+        return f"or({past_value},{tie_break})"
+    return f"or({past_value},{tie_break},{column}.is.null)"
@@ -0,0 +1,36 @@
+# database/backfill_sentiment_stats.py
+"""
+Build the customer_sentiment_stats aggregate from existing interactions.
+
+Usage (from the AiCRMv1 directory):
+    python -m database.backfill_sentiment_stats
+
+Safe to re-run, and to run while interactions are being logged: the database
+recomputes every customer's row from scratch in one transaction
+(rebuild_customer_sentiment_stats, migration 008), deletes the rows of
+customers with no interactions left, and holds back concurrent inserts until
+it commits so none of their updates are lost.
+"""
+
+import argparse
+
+from .supabase_client import SupabaseClient
+
+
+def backfill(db: SupabaseClient) -> int:
+    """
+    Recompute the aggregate for every customer with interactions.
+    Returns the number of customers written.
+    """
+    return db.rebuild_sentiment_stats()
+
+
+def main():
+    argparse.ArgumentParser(description="Backfill per-customer sentiment aggregates.").parse_args()
+
+    written = backfill(SupabaseClient())
+    print(f"Backfilled sentiment stats for {written} customers")
+
+
+if __name__ == "__main__":
+    main()
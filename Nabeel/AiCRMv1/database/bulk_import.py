@@ -0,0 +1,329 @@
+# database/bulk_import.py
+"""
+Streaming bulk import for customers, interactions, transactions and products.
+
+Reads CSV or JSONL one row at a time, validates each row against the table
+schema and inserts valid rows in chunks, so memory stays bounded by the
+chunk size however large the file is. After every chunk a checkpoint is
+written; re-running the same command resumes after the last committed chunk.
+
+Every row is stored with an import_key (migration 007) made of the import's
+id and its row number in the file. If a run dies after inserting a chunk but
+before checkpointing it, the resumed run sends that chunk again and the rows
+already written are skipped, so no row is inserted twice.
+
+Usage (from the AiCRMv1 directory):
+    python -m database.bulk_import interactions history.jsonl --chunk-size 1000
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .sentiment_stats import parse_timestamp
+from .supabase_client import SupabaseClient
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class RowValidationError(ValueError):
+    """Raised when an import row does not match the table schema."""
+
+
+def _text(value) -> str:
+    return str(value)
+
+
+def _integer(value) -> int:
+    return int(value)
+
+
+def _decimal(value) -> float:
+    return float(value)
+
+
+def _boolean(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in ('true', 't', 'yes', 'y', '1'):
+        return True
+    if normalized in ('false', 'f', 'no', 'n', '0'):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _timestamp(value) -> str:
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        raise ValueError(f"not a timestamp: {value!r}")
+    return parsed.isoformat()
+
+
+def _one_of(*choices: str) -> Callable:
+    def convert(value) -> str:
+        normalized = str(value).strip().lower()
+        if normalized not in choices:
+            raise ValueError(f"must be one of {', '.join(choices)}")
+        return normalized
+    return convert
+
+
+# Table -> {column: (converter, required)}, following the schema in PRD.md
+IMPORT_SCHEMAS: Dict[str, Dict[str, Tuple[Callable, bool]]] = {
+    'customers': {
+        'first_name': (_text, True),
+        'last_name': (_text, True),
+        'email': (_text, False),
+        'phone': (_text, False),
+        'company': (_text, False),
+        'stage': (_one_of('lead', 'prospect', 'customer'), False),
+        'notes': (_text, False),
+        'created_at': (_timestamp, False),
+        'last_contact': (_timestamp, False),
+    },
+    'interactions': {
+        'customer_id': (_integer, True),
+        'type': (_one_of('email', 'call', 'meeting', 'note'), True),
+        'date': (_timestamp, True),
+        'subject': (_text, False),
+        'content': (_text, False),
+        'sentiment': (_one_of('positive', 'neutral', 'negative'), False),
+    },
+    'transactions': {
+        'customer_id': (_integer, True),
+        'product_id': (_integer, True),
+        'total_amount': (_decimal, True),
+        'transaction_date': (_timestamp, True),
+        'quantity': (_integer, False),
+        'payment_method': (_text, False),
+        'notes': (_text, False),
+    },
+    'products': {
+        'name': (_text, True),
+        'category': (_text, True),
+        'price': (_decimal, True),
+        'description': (_text, False),
+        'brand': (_text, False),
+        'in_stock': (_boolean, False),
+    },
+}
+
+BULK_INSERTERS = {
+    'customers': SupabaseClient.bulk_create_customers,
+    'interactions': SupabaseClient.bulk_create_interactions,
+    'transactions': SupabaseClient.bulk_create_transactions,
+    'products': SupabaseClient.bulk_create_products,
+}
+
+
+def validate_row(table: str, row: Dict) -> Dict:
+    """
+    Check a raw row against the table schema and convert its values.
+    Empty strings count as missing. Raises RowValidationError on any problem.
+    """
+    schema = IMPORT_SCHEMAS[table]
+
+    unknown = sorted(set(row) - set(schema))
+    if unknown:
+        raise RowValidationError(f"unknown columns: {', '.join(unknown)}")
+
+    clean = {}
+    for column, (convert, required) in schema.items():
+        value = row.get(column)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if required:
+                raise RowValidationError(f"missing required column '{column}'")
+            continue
+        try:
+            clean[column] = convert(value)
+        except (TypeError, ValueError) as e:
+            raise RowValidationError(f"invalid {column}: {e}")
+    return clean
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    """
+    Stream rows from a .csv or .jsonl file, one dict at a time.
+    JSONL lines that are not valid JSON objects come back as {'__error__': message}
+    so the caller can reject them without losing its place in the file.
+    """
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    elif path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {'__error__': f"invalid JSON: {e}"}
+                    continue
+                yield row if isinstance(row, dict) else {'__error__': "line is not a JSON object"}
+    else:
+        raise ValueError(f"Unsupported file type for {path}; use .csv or .jsonl")
+
+
+@dataclass
+class ImportProgress:
+    """Counters for one import run, persisted as the resume checkpoint."""
+    table: str
+    path: str
+    rows_done: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    resumed_from: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    # Prefix of the rows' import_key; kept across resumes of the same import
+    import_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def to_checkpoint(self) -> Dict:
+        return {
+            'table': self.table,
+            'path': os.path.abspath(self.path),
+            'import_id': self.import_id,
+            'rows_done': self.rows_done,
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+        }
+
+    def rate(self) -> float:
+        """Rows per second in this run, not counting rows skipped on resume."""
+        elapsed = time.monotonic() - self.started_at
+        return (self.rows_done - self.resumed_from) / elapsed if elapsed > 0 else 0.0
+
+
+def load_checkpoint(checkpoint_path: str, table: str, path: str) -> ImportProgress:
+    """
+    Resume counters from a checkpoint for the same table and file,
+    or start fresh if there is none.
+    """
+    progress = ImportProgress(table=table, path=path)
+    if not os.path.exists(checkpoint_path):
+        return progress
+
+    with open(checkpoint_path, encoding='utf-8') as f:
+        saved = json.load(f)
+    if saved.get('table') != table or saved.get('path') != os.path.abspath(path):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different import")
+
+    progress.rows_done = progress.resumed_from = saved['rows_done']
+    progress.inserted = saved['inserted']
+    progress.rejected = saved['rejected']
+    # Checkpoints from before import keys keep the fresh id
+    progress.import_id = saved.get('import_id', progress.import_id)
+    return progress
+
+
+def save_checkpoint(checkpoint_path: str, progress: ImportProgress) -> None:
+    """Write the checkpoint atomically so a crash never leaves it half-written."""
+    temp_path = f"{checkpoint_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress.to_checkpoint(), f)
+    os.replace(temp_path, checkpoint_path)
+
+
+def import_file(db: SupabaseClient, table: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                checkpoint_path: Optional[str] = None, rejects_path: Optional[str] = None,
+                on_progress: Optional[Callable[[ImportProgress], None]] = None) -> ImportProgress:
+    """
+    Stream a file into table in chunks of chunk_size rows.
+    Invalid rows are skipped and, if rejects_path is given, appended there as
+    JSONL with their line number and error. Returns the final counters;
+    rows of a chunk replayed after a crash that were already written are
+    not counted as inserted again.
+    """
+    if table not in IMPORT_SCHEMAS:
+        raise ValueError(f"Unknown table '{table}'; expected one of {', '.join(IMPORT_SCHEMAS)}")
+
+    checkpoint_path = checkpoint_path or f"{path}.{table}.checkpoint.json"
+    progress = load_checkpoint(checkpoint_path, table, path)
+    insert = BULK_INSERTERS[table]
+    if not os.path.exists(checkpoint_path):
+        # Persist the import id before the first insert, so a crash in the
+        # first chunk resumes with the same import keys
+        save_checkpoint(checkpoint_path, progress)
+    rejects = open(rejects_path, 'a', encoding='utf-8') if rejects_path else None
+
+    chunk: List[Dict] = []
+    chunk_rejected = 0
+    rows_seen = 0
+
+    def flush():
+        nonlocal chunk, chunk_rejected
+        created = insert(db, chunk) if chunk else []
+        progress.inserted += len(created)
+        progress.rejected += chunk_rejected
+        progress.rows_done = rows_seen
+        save_checkpoint(checkpoint_path, progress)
+        if on_progress:
+            on_progress(progress)
+        chunk, chunk_rejected = [], 0
+
+    try:
+        for row in read_rows(path):
+            rows_seen += 1
+            # Skip rows committed by a previous run
+            if rows_seen <= progress.rows_done:
+                continue
+
+            try:
+                if '__error__' in row:
+                    raise RowValidationError(row['__error__'])
+                clean = validate_row(table, row)
+                clean['import_key'] = f"{progress.import_id}:{rows_seen}"
+                chunk.append(clean)
+            except RowValidationError as e:
+                chunk_rejected += 1
+                if rejects:
+                    rejects.write(json.dumps({'row': rows_seen, 'error': str(e), 'data': row}, default=str) + "\n")
+
+            if len(chunk) + chunk_rejected >= chunk_size:
+                flush()
+
+        if chunk or chunk_rejected:
+            flush()
+    finally:
+        if rejects:
+            rejects.close()
+
+    return progress
+
+
+def _print_progress(progress: ImportProgress) -> None:
+    print(
+        f"{progress.table}: {progress.rows_done:,} rows read, {progress.inserted:,} inserted, "
+        f"{progress.rejected:,} rejected ({progress.rate():,.0f} rows/s)",
+        file=sys.stderr
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import CSV or JSONL data into AiCRM.")
+    parser.add_argument("table", choices=sorted(IMPORT_SCHEMAS), help="Table to import into")
+    parser.add_argument("path", help="Path to a .csv or .jsonl file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per insert request")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.<table>.checkpoint.json)")
+    parser.add_argument("--rejects", help="Append rejected rows to this JSONL file")
+    args = parser.parse_args()
+
+    progress = import_file(
+        SupabaseClient(), args.table, args.path,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint,
+        rejects_path=args.rejects,
+        on_progress=_print_progress
+    )
+    print(f"Done: {progress.inserted:,} inserted, {progress.rejected:,} rejected")
+
+
+if __name__ == "__main__":
+    main()
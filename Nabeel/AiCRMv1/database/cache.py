@@ -0,0 +1,148 @@
+# database/cache.py
+"""
+Read-through query cache for SupabaseClient.
+
+Entries are keyed by table and query, evicted by LRU and TTL, and tagged
+with every table they were read from so a write to any of those tables
+drops them. Each table also has a generation, moved by every invalidation:
+a reader takes generation() before querying and passes it to set(), which
+then skips storing a result that a write may have made stale meanwhile.
+Expired entries are kept for a grace period so they can be served stale
+while the database is unavailable. Any object with the same
+get/get_stale/generation/set/invalidate_table/clear/stats methods can be
+passed to SupabaseClient in its place.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+# Sentinel so cached None / empty results still count as hits
+_MISSING = object()
+
+
+class QueryCache:
+    """
+    Thread-safe LRU + TTL cache with per-table invalidation.
+
+    Values are shared between callers, so they must be treated as read-only.
+    max_entries=0 disables caching while still counting misses.
+    stale_seconds is how long past expiry an entry stays available to get_stale.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 60.0, stale_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_table: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}
+        self._clears = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key.
+        Returns (True, value) on a fresh hit, (False, None) otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[1] <= time.monotonic():
+                if entry is not _MISSING and entry[1] + self.stale_seconds <= time.monotonic():
+                    self._drop(key)
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def get_stale(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key, accepting entries up to stale_seconds past expiry.
+        Returns (True, value) if one is held, (False, None) otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[1] + self.stale_seconds <= time.monotonic():
+                return False, None
+            return True, entry[0]
+
+    def generation(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        """Token that changes whenever any of tables is invalidated (or the cache cleared)."""
+        with self._lock:
+            return (self._clears, *(self._generations.get(table, 0) for table in tables))
+
+    def set(self, key: Hashable, value: Any, tables: Iterable[str], ttl_seconds: Optional[float] = None,
+            generation: Optional[Tuple[int, ...]] = None) -> None:
+        """
+        Store a value read from the given tables. With the generation() taken
+        before the read, nothing is stored if a table was invalidated since.
+        """
+        if self.max_entries <= 0:
+            return
+
+        tables = tuple(tables)
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+
+        with self._lock:
+            if generation is not None and generation != (
+                self._clears, *(self._generations.get(table, 0) for table in tables)
+            ):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires_at, tables)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._drop(oldest_key)
+                self.evictions += 1
+
+    def invalidate_table(self, table: str) -> None:
+        """Drop every entry that was read from table."""
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in list(self._keys_by_table.get(table, ())):
+                self._drop(key)
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._clears += 1
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters for sizing.
+        Returns dict like {'hits': 90, 'misses': 10, 'hit_rate': 0.9, 'size': 40, ...}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        """Remove one entry and its table tags. Caller holds the lock."""
+        _, _, tables = self._entries.pop(key)
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
@@ -0,0 +1,67 @@
+# database/customer_360.py
+"""
+Customer-360 loader for the customer detail view.
+
+Fetches the customer, their interactions, transactions, sentiment aggregate
+and the product catalog concurrently with asyncio.gather, derives product
+interests from what was fetched, and returns one immutable bundle.
+Time to first paint is then roughly the latency of the slowest single query.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from utils.product_matcher import ProductMentionMatcher
+
+from .async_supabase_client import AsyncSupabaseClient, report_error
+from .supabase_client import SupabaseClient
+
+
+@dataclass(frozen=True)
+class CustomerBundle:
+    """Everything the detail view and its AI actions need for one customer."""
+    customer: Optional[Dict]
+    interactions: Tuple[Dict, ...]
+    transactions: Tuple[Dict, ...]
+    products: Tuple[Dict, ...]
+    product_interests: Tuple[Dict, ...]
+    sentiment: Dict
+
+
+async def _get_product_matcher(client: AsyncSupabaseClient) -> ProductMentionMatcher:
+    """Get the catalog matcher, or an empty one if the catalog can't be fetched."""
+    try:
+        return await client.get_product_matcher()
+    except Exception as e:
+        report_error(f"Failed to fetch products: {e}")
+        return ProductMentionMatcher([])
+
+
+async def aload_customer_360(client: AsyncSupabaseClient, customer_id: int) -> CustomerBundle:
+    """
+    Load a customer's detail-view data with all reads in flight at once.
+    bundle.customer is None if the customer does not exist.
+    """
+    customer, interactions, transactions, sentiment, matcher = await asyncio.gather(
+        client.get_customer_by_id(customer_id),
+        client.get_customer_interactions(customer_id),
+        client.get_customer_transactions(customer_id),
+        client.get_customer_sentiment_stats(customer_id),
+        _get_product_matcher(client)
+    )
+
+    interactions = tuple(interactions)
+    return CustomerBundle(
+        customer=customer,
+        interactions=interactions,
+        transactions=tuple(transactions),
+        products=tuple(matcher.products),
+        product_interests=tuple(matcher.find_product_interests(interactions)),
+        sentiment=sentiment
+    )
+
+
+def load_customer_360(db: SupabaseClient, customer_id: int) -> CustomerBundle:
+    """Blocking version of aload_customer_360 for Streamlit pages."""
+    return db.run(aload_customer_360(db.aio, customer_id))
@@ -0,0 +1,432 @@
+# database/local_backend.py
+"""
+SQLite stand-in for Supabase, for benchmarks, load tests and offline runs.
+
+AsyncSupabaseClient reaches its backend only through client.table(name) and
+the subset of the PostgREST request builder it uses: select with embedded
+joins, eq/neq/gt/gte/lt/lte/like/ilike/is_/in_/or_ filters, order, limit and
+range for reads, and insert, upsert, update and delete for writes. Any
+object with that surface can stand in for the supabase AsyncClient.
+
+LocalBackend implements it on the local mirror's row store and query
+compiler, and adds what the database does on write: serial ids, column
+defaults, 'now()' timestamps, updated_at, the customer_stage_counts view,
+deleted_rows tombstones, analytics dirty-day marks, the AI summary queue
+with its claim function, and the sentiment aggregate, its rebuild and the
+last_contact upkeep of interaction inserts (migrations 002-004, 006 and 008; the products
+category trigger is not mimicked).
+
+Select it with AICRM_BACKEND=sqlite (in memory) or
+AICRM_BACKEND=sqlite:/path/to/crm.db, and fill it with
+python -m database.synthetic_data.
+"""
+
+import contextlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .local_mirror import (
+    DELETIONS_FEED, MIRROR_TABLES, LocalMirror, MirrorQuery, MirrorResponse, _column_sql, _identifier
+)
+from .sentiment_stats import apply_interaction, empty_stats, parse_timestamp
+
+BACKEND_TABLES = (
+    *MIRROR_TABLES, 'customer_sentiment_stats', 'daily_analytics_snapshots', 'analytics_dirty_days', 'ai_summary_queue',
+    DELETIONS_FEED
+)
+
+# Tables keyed by a natural key instead of a serial id
+_NATURAL_KEYS = {
+    'customer_sentiment_stats': ('customer_id',),
+    'analytics_dirty_days': ('day',),
+    'ai_summary_queue': ('customer_id',),
+}
+
+# Column defaults from the schema in PRD.md
+_DEFAULTS = {
+    'customers': {'stage': 'lead'},
+    'products': {'brand': 'Luxe Couture', 'in_stock': True},
+}
+
+# Tables with a created_at DEFAULT NOW()
+_CREATED_AT_TABLES = ('customers', 'interactions', 'products')
+
+# Tables with an updated_at that defaults to NOW() and moves on every update
+_UPDATED_AT_TABLES = (*MIRROR_TABLES, 'customer_sentiment_stats')
+
+# Dated tables whose writes mark analytics days dirty (migration 003)
+_DAY_COLUMNS = {
+    'customers': 'created_at',
+    'interactions': 'date',
+    'transactions': 'transaction_date',
+}
+
+# Tables whose writes queue their customer for a new AI summary (migration 006),
+# and for tables listed below, the only columns whose updates do the same
+_SUMMARY_CUSTOMER_COLUMNS = {
+    'customers': 'id',
+    'interactions': 'customer_id',
+    'transactions': 'customer_id',
+}
+_SUMMARY_UPDATE_COLUMNS = {
+    'customers': frozenset(('first_name', 'last_name', 'email', 'phone', 'company', 'stage', 'notes')),
+    'interactions': frozenset(('customer_id', 'type', 'subject', 'content', 'date')),
+}
+
+# Stored functions callable with rpc(), as LocalBackend methods of the same name
+_FUNCTIONS = ('claim_ai_summaries', 'rebuild_customer_sentiment_stats')
+
+_VIEWS = {
+    'customer_stage_counts': """
+        SELECT NULL AS id, json_object(
+            'stage', json_extract(data, '$.stage'),
+            'total', COUNT(*),
+            'new_this_week', SUM(json_extract(data, '$.created_at') >= strftime('%Y-%m-%dT%H:%M:%S', 'now', '-7 days'))
+        ) AS data
+        FROM customers
+        GROUP BY json_extract(data, '$.stage')
+    """,
+}
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _resolve_now(row: Dict, now: str) -> Dict:
+    """Replace 'now()' values with the current timestamp, as Postgres would."""
+    return {
+        column: now if isinstance(value, str) and value.lower() in ('now()', 'now') else value
+        for column, value in row.items()
+    }
+
+
+class BackendQuery(MirrorQuery):
+    """Request builder for one LocalBackend table: mirror reads plus writes."""
+
+    def __init__(self, backend: "LocalBackend", table: str):
+        super().__init__(backend, table)
+        self._backend = backend
+        self._operation = 'select'
+        self._payload: Any = None
+        self._on_conflict: Optional[Tuple[str, ...]] = None
+        self._ignore_duplicates = False
+
+    def _write(self, operation: str, http_method: str, payload: Any = None) -> "BackendQuery":
+        self._operation = operation
+        self.http_method = http_method
+        self._payload = payload
+        return self
+
+    def insert(self, rows: Any, **options) -> "BackendQuery":
+        return self._write('insert', "POST", rows)
+
+    def upsert(self, rows: Any, on_conflict: str = "", ignore_duplicates: bool = False,
+               **options) -> "BackendQuery":
+        if on_conflict:
+            self._on_conflict = tuple(column.strip() for column in on_conflict.split(','))
+        self._ignore_duplicates = ignore_duplicates
+        return self._write('upsert', "POST", rows)
+
+    def update(self, values: Dict, **options) -> "BackendQuery":
+        return self._write('update', "PATCH", values)
+
+    def delete(self, **options) -> "BackendQuery":
+        return self._write('delete', "DELETE")
+
+    def execute(self) -> MirrorResponse:
+        if self._operation == 'select':
+            return super().execute()
+        if self._operation in ('insert', 'upsert'):
+            rows = self._payload if isinstance(self._payload, list) else [self._payload]
+            return MirrorResponse(self._backend.insert_rows(
+                self._table, rows, upsert=self._operation == 'upsert', on_conflict=self._on_conflict,
+                ignore_duplicates=self._ignore_duplicates
+            ))
+        if self._operation == 'update':
+            return MirrorResponse(self._backend.update_where(self._table, self._payload, self._where, self._params))
+        return MirrorResponse(self._backend.delete_where_matching(self._table, self._where, self._params))
+
+
+class BackendRPC(MirrorQuery):
+    """Stored function call on a LocalBackend, like supabase Client.rpc()."""
+
+    def __init__(self, backend: "LocalBackend", function: str, arguments: Dict):
+        super().__init__(backend, function)
+        self.path = f"/rpc/{function}"
+        self.http_method = "POST"
+        self._backend = backend
+        self._function = function
+        self._arguments = arguments
+
+    def execute(self) -> MirrorResponse:
+        return MirrorResponse(getattr(self._backend, self._function)(**self._arguments))
+
+
+class LocalBackend(LocalMirror):
+    """
+    Supabase stand-in on one SQLite database; path defaults to in memory.
+    Safe to share between threads. Writes are validated only as far as
+    unique keys go.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        super().__init__(path, BACKEND_TABLES)
+        with self._lock:
+            for table, columns in _NATURAL_KEYS.items():
+                key_sql = ", ".join(_column_sql(column) for column in columns)
+                self._connection.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}_key_idx" ON "{table}" ({key_sql})')
+            for view, sql in _VIEWS.items():
+                self._connection.execute(f'CREATE VIEW IF NOT EXISTS "{view}" AS {sql}')
+                self._known_tables.add(view)
+            self._connection.commit()
+        # Reads go straight to the tables; there is nothing to sync
+        self._ready = True
+
+    def table(self, table: str) -> BackendQuery:
+        """Start a query, like supabase Client.table()."""
+        if not self.mirrors(table) and table not in _VIEWS:
+            raise ValueError(f"Unknown table {table}")
+        return BackendQuery(self, table)
+
+    def rpc(self, function: str, arguments: Optional[Dict] = None) -> BackendRPC:
+        """Call a stored function, like supabase Client.rpc()."""
+        if function not in _FUNCTIONS:
+            raise ValueError(f"Unknown function {function}")
+        return BackendRPC(self, function, arguments or {})
+
+    def claim_ai_summaries(self, max_rows: int, lease_seconds: int = 600,
+                           only_customer: Optional[int] = None) -> List[Dict]:
+        """The claim_ai_summaries function of migration 006, atomic under the write lock."""
+        now = datetime.utcnow()
+        with self._transaction():
+            claimable = sorted(
+                (row for _, row in self._matching_locked('ai_summary_queue', [], [])
+                 if (row.get('claimed_until') is None or row['claimed_until'] < now.isoformat())
+                 and only_customer in (None, row['customer_id'])),
+                key=lambda row: row['marked_at']
+            )[:max_rows]
+            claimed_until = (now + timedelta(seconds=lease_seconds)).isoformat()
+            self._insert_locked('ai_summary_queue', [
+                {**row, 'claimed_until': claimed_until} for row in claimable
+            ], True, None, now.isoformat())
+        return [{'customer_id': row['customer_id'], 'marked_at': row['marked_at']} for row in claimable]
+
+    def rebuild_customer_sentiment_stats(self) -> int:
+        """The rebuild_customer_sentiment_stats function of migration 008, atomic under the write lock."""
+        now = _now()
+        with self._transaction():
+            stats_by_customer: Dict[int, Dict] = {}
+            for _, interaction in sorted(self._matching_locked('interactions', [], []), key=lambda match: match[0]):
+                customer_id = interaction.get('customer_id')
+                if customer_id is not None:
+                    stats_by_customer[customer_id] = apply_interaction(
+                        stats_by_customer.get(customer_id) or empty_stats(customer_id),
+                        interaction.get('sentiment'), interaction.get('date')
+                    )
+            self._connection.execute('DELETE FROM "customer_sentiment_stats"')
+            self._insert_locked('customer_sentiment_stats', [
+                dict(stats, updated_at=now) for stats in stats_by_customer.values()
+            ], False, None, now)
+        return len(stats_by_customer)
+
+    def insert_rows(self, table: str, rows: Iterable[Dict], upsert: bool = False,
+                    on_conflict: Optional[Sequence[str]] = None, ignore_duplicates: bool = False) -> List[Dict]:
+        """
+        Insert rows, filling ids and defaults; returns them as stored.
+        With upsert, rows matching on the conflict columns (the table's key
+        by default) are merged into the existing row instead, or with
+        ignore_duplicates left alone and not returned.
+        """
+        now = _now()
+        with self._transaction():
+            return self._insert_locked(
+                table, [_resolve_now(row, now) for row in rows], upsert, on_conflict, now, ignore_duplicates
+            )
+
+    def update_where(self, table: str, values: Dict, where: Sequence[str], params: Sequence[Any]) -> List[Dict]:
+        """Merge values into every row matching the compiled filters; returns the updated rows."""
+        now = _now()
+        values = _resolve_now(values, now)
+        updated = []
+        with self._transaction():
+            matched = self._matching_locked(table, where, params)
+            for row_id, old in matched:
+                row = {**old, **values}
+                # A summary not stamped as generated is hand-written, like the migration 006 trigger
+                if (table == 'customers' and 'ai_summary_generated_at' not in values
+                        and row.get('ai_summary') != old.get('ai_summary')):
+                    row['ai_summary_generated_at'] = None
+                self._stamp_updated(table, row, now)
+                self._store_locked(table, row_id, row)
+                updated.append(row)
+            self._mark_days_locked(table, [old for _, old in matched] + updated, now)
+            if table not in _SUMMARY_UPDATE_COLUMNS or _SUMMARY_UPDATE_COLUMNS[table].intersection(values):
+                self._queue_summaries_locked(table, [old for _, old in matched] + updated, now)
+        return updated
+
+    def delete_where_matching(self, table: str, where: Sequence[str], params: Sequence[Any]) -> List[Dict]:
+        """Delete every row matching the compiled filters; returns the deleted rows."""
+        now = _now()
+        with self._transaction():
+            matched = self._matching_locked(table, where, params)
+            self._connection.executemany(f'DELETE FROM "{table}" WHERE id = ?', [(row_id,) for row_id, _ in matched])
+            deleted = [row for _, row in matched]
+            if table in MIRROR_TABLES:
+                self._insert_locked(DELETIONS_FEED, [
+                    {'table_name': table, 'row_id': row['id'], 'deleted_at': now} for row in deleted
+                ], False, None, now)
+            self._mark_days_locked(table, deleted, now)
+            if table == 'customers':
+                self._connection.executemany(
+                    f'DELETE FROM "ai_summary_queue" WHERE {_column_sql("customer_id")} = ?',
+                    [(row['id'],) for row in deleted]
+                )
+            else:
+                self._queue_summaries_locked(table, deleted, now)
+        return deleted
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Hold the lock for one write; commit it, or roll it back on error."""
+        with self._lock:
+            try:
+                yield
+            except Exception:
+                self._connection.rollback()
+                raise
+            self._connection.commit()
+
+    def _insert_locked(self, table: str, rows: List[Dict], upsert: bool,
+                       on_conflict: Optional[Sequence[str]], now: str, ignore_duplicates: bool = False) -> List[Dict]:
+        """Body of insert_rows. Caller holds a _transaction."""
+        table = _identifier(table)
+        key_columns = tuple(on_conflict or _NATURAL_KEYS.get(table, ('id',)))
+        serial = table not in _NATURAL_KEYS
+        if serial:
+            next_id = self._connection.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{table}"').fetchone()[0]
+
+        written, inserted = [], []
+        for row in rows:
+            existing = self._find_locked(table, key_columns, row)
+            if existing is not None:
+                if not upsert:
+                    raise ValueError(f"Duplicate key {key_columns} in {table}")
+                if ignore_duplicates:
+                    continue
+                row_id, old = existing
+                row = {**old, **row}
+                self._stamp_updated(table, row, now)
+                self._store_locked(table, row_id, row)
+                self._mark_days_locked(table, [old], now)
+                self._queue_summaries_locked(table, [old], now)
+            else:
+                row = {**_DEFAULTS.get(table, {}), **row}
+                if table in _CREATED_AT_TABLES:
+                    row.setdefault('created_at', now)
+                if table in _UPDATED_AT_TABLES:
+                    row.setdefault('updated_at', now)
+                if serial:
+                    if row.get('id') is None:
+                        row['id'] = next_id
+                    next_id = max(next_id, row['id'] + 1)
+                self._store_locked(table, row.get('id') if serial else None, row)
+                inserted.append(row)
+            written.append(row)
+
+        self._mark_days_locked(table, written, now)
+        self._queue_summaries_locked(table, written, now)
+        if table == 'interactions':
+            self._apply_interactions_locked(inserted, now)
+        return written
+
+    def _find_locked(self, table: str, key_columns: Sequence[str], row: Dict) -> Optional[Tuple[int, Dict]]:
+        """Existing (rowid, row) with the same key values as row, if any."""
+        if any(row.get(column) is None for column in key_columns):
+            return None
+        conditions = " AND ".join(f"{_column_sql(column)} = ?" for column in key_columns)
+        found = self._connection.execute(
+            f'SELECT id, data FROM "{table}" WHERE {conditions}', [row[column] for column in key_columns]
+        ).fetchone()
+        return (found[0], json.loads(found[1])) if found else None
+
+    def _matching_locked(self, table: str, where: Sequence[str], params: Sequence[Any]) -> List[Tuple[int, Dict]]:
+        sql = f'SELECT id, data FROM "{_identifier(table)}"'
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return [(row_id, json.loads(data)) for row_id, data in self._connection.execute(sql, params)]
+
+    def _store_locked(self, table: str, row_id: Optional[int], row: Dict) -> None:
+        """Write one row. The stored JSON round-trips values the way a PostgREST response would."""
+        data = json.dumps(row, default=str)
+        row.clear()
+        row.update(json.loads(data))
+        self._connection.execute(f'INSERT OR REPLACE INTO "{table}" (id, data) VALUES (?, ?)', (row_id, data))
+
+    @staticmethod
+    def _stamp_updated(table: str, row: Dict, now: str) -> None:
+        """Move updated_at on an update, like the touch_updated_at trigger."""
+        if table in _UPDATED_AT_TABLES:
+            row['updated_at'] = now
+
+    def _mark_days_locked(self, table: str, rows: Iterable[Dict], now: str) -> None:
+        """Mark the analytics days the rows are dated on as dirty, like the migration 003 triggers."""
+        column = _DAY_COLUMNS.get(table)
+        if column is None:
+            return
+        days = sorted({str(row[column])[:10] for row in rows if row.get(column)})
+        if days:
+            self._insert_locked('analytics_dirty_days', [{'day': day, 'marked_at': now} for day in days], True, None, now)
+
+    def _queue_summaries_locked(self, table: str, rows: Iterable[Dict], now: str) -> None:
+        """Queue the customers the rows belong to for a new AI summary, like the migration 006 triggers."""
+        column = _SUMMARY_CUSTOMER_COLUMNS.get(table)
+        if column is None:
+            return
+        customer_ids = sorted({row[column] for row in rows if row.get(column) is not None})
+        if customer_ids:
+            placeholders = ", ".join("?" * len(customer_ids))
+            existing = self._connection.execute(
+                f'SELECT id FROM "customers" WHERE id IN ({placeholders}) ORDER BY id', customer_ids
+            ).fetchall()
+            self._insert_locked('ai_summary_queue', [
+                {'customer_id': customer_id, 'marked_at': now} for customer_id, in existing
+            ], True, None, now)
+
+    def _apply_interactions_locked(self, interactions: List[Dict], now: str) -> None:
+        """
+        Fold new interactions into their customers' sentiment aggregates and
+        move last_contact forward, like the migration 008 triggers.
+        """
+        customer_ids = sorted({row['customer_id'] for row in interactions if row.get('customer_id') is not None})
+        if not customer_ids:
+            return
+        placeholders = ", ".join("?" * len(customer_ids))
+
+        stats_by_customer = {
+            row['customer_id']: row for _, row in self._matching_locked(
+                'customer_sentiment_stats', [f"{_column_sql('customer_id')} IN ({placeholders})"], customer_ids
+            )
+        }
+        latest_contact = {}
+        for interaction in interactions:
+            customer_id = interaction.get('customer_id')
+            if customer_id is None:
+                continue
+            stats = stats_by_customer.get(customer_id) or empty_stats(customer_id)
+            stats_by_customer[customer_id] = apply_interaction(stats, interaction.get('sentiment'), interaction.get('date'))
+            interaction_at = parse_timestamp(interaction.get('date'))
+            if interaction_at and (customer_id not in latest_contact or interaction_at > latest_contact[customer_id]):
+                latest_contact[customer_id] = interaction_at
+        self._insert_locked('customer_sentiment_stats', [
+            dict(stats_by_customer[customer_id], updated_at=now) for customer_id in customer_ids
+        ], True, None, now)
+
+        for row_id, customer in self._matching_locked('customers', [f"id IN ({placeholders})"], customer_ids):
+            interaction_at = latest_contact.get(customer['id'])
+            last_contact = parse_timestamp(customer.get('last_contact'))
+            if interaction_at and (last_contact is None or last_contact < interaction_at):
+                customer['last_contact'] = interaction_at.isoformat()
+                self._stamp_updated('customers', customer, now)
+                self._store_locked('customers', row_id, customer)
@@ -0,0 +1,506 @@
+# database/local_mirror.py
+"""
+Optional local SQLite mirror of customers, interactions, products and transactions.
+
+Rows are stored as JSON keyed by id and read back through the subset of the
+PostgREST query builder that AsyncSupabaseClient uses (select with embedded
+joins, eq/in_/gt/gte/lt/lte/like/ilike/or_ filters, order, limit, range), so
+the client can send the same read query to the mirror as to Supabase. The client
+keeps the mirror current by write-through of every row it writes and by delta
+sync on (updated_at, id) plus the deleted_rows tombstone feed
+(see migrations/004_mirror_sync.sql).
+"""
+
+import functools
+import json
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+MIRROR_TABLES = ('customers', 'interactions', 'products', 'transactions')
+
+# Sync state key for the deleted_rows tombstone feed
+DELETIONS_FEED = 'deleted_rows'
+
+# Expression indexes for the filters and sort orders the client uses
+_INDEXED_COLUMNS = {
+    'customers': ('last_name', 'company', 'last_contact', 'stage'),
+    'interactions': ('customer_id', 'date'),
+    'products': ('category',),
+    'transactions': ('customer_id', 'transaction_date'),
+}
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+_COMPARISONS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+# SQLite caps bound parameters per statement
+_MAX_PARAMS = 500
+
+
+@dataclass
+class MirrorResponse:
+    """Mirror counterpart of a PostgREST APIResponse."""
+    data: List[Dict]
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column or table name: {name!r}")
+    return name
+
+
+def _column_sql(column: str) -> str:
+    """SQL expression for a row column; id is a real column, the rest live in the JSON."""
+    column = _identifier(column)
+    return 'id' if column == 'id' else f"json_extract(data, '$.{column}')"
+
+
+def _filter_sql(column: str, op: str, value: Any) -> Tuple[str, List[Any]]:
+    """Compile one PostgREST filter to SQL. Comparisons with NULL are false, as in Postgres."""
+    expr = _column_sql(column)
+    if op in _COMPARISONS:
+        return f"{expr} {_COMPARISONS[op]} ?", [_bindable(value)]
+    if op == 'like':
+        # SQLite LIKE ignores ASCII case; GLOB is case-sensitive like Postgres LIKE
+        return f"{expr} GLOB ?", [_like_to_glob(str(value))]
+    if op == 'ilike':
+        # SQLite LIKE ignores case for ASCII only, so accented letters still match exactly
+        return f"{expr} LIKE ? ESCAPE '\\'", [str(value).replace('*', '%')]
+    if op == 'in':
+        values = [_bindable(item) for item in value]
+        if not values:
+            return "0", []
+        return f"{expr} IN ({', '.join('?' * len(values))})", values
+    if op == 'is':
+        if value is None:
+            return f"{expr} IS NULL", []
+        return f"{expr} = ?", [1 if value else 0]
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _like_to_glob(pattern: str) -> str:
+    """
+    Translate a LIKE pattern (PostgREST also accepts * for %) to GLOB.
+    Backslash escapes the next character, as in Postgres.
+    """
+    glob = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == '\\':
+            char = next(chars, '\\')
+        elif char in '%*':
+            glob.append('*')
+            continue
+        elif char == '_':
+            glob.append('?')
+            continue
+        glob.append(f"[{char}]" if char in '*?[' else char)
+    return ''.join(glob)
+
+
+def _bindable(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _literal(raw: str) -> Any:
+    """Type an unquoted logic-tree value the way PostgREST would cast it."""
+    lowered = raw.lower()
+    if lowered == 'null':
+        return None
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    for cast in (int, float):
+        try:
+            return cast(raw)
+        except ValueError:
+            pass
+    return raw
+
+
+class _LogicTreeParser:
+    """
+    Parses a PostgREST logic tree such as
+    'last_name.ilike."%ann%",and(stage.eq.lead,id.gt.10)' into SQL.
+    Quoted values are strings; unquoted ones are typed with _literal.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def parse(self, joiner: str = 'or') -> Tuple[str, List[Any]]:
+        sql, params = self._conditions(joiner)
+        if self.pos != len(self.text):
+            raise ValueError(f"Unexpected {self.text[self.pos:]!r} in filter {self.text!r}")
+        return sql, params
+
+    def _conditions(self, joiner: str) -> Tuple[str, List[Any]]:
+        parts, params = [], []
+        while True:
+            sql, condition_params = self._condition()
+            parts.append(sql)
+            params.extend(condition_params)
+            if self.pos < len(self.text) and self.text[self.pos] == ',':
+                self.pos += 1
+                continue
+            return "(" + f" {joiner.upper()} ".join(parts) + ")", params
+
+    def _condition(self) -> Tuple[str, List[Any]]:
+        negate = self.text.startswith('not.', self.pos) and self.text.startswith(('and(', 'or('), self.pos + 4)
+        if negate:
+            self.pos += 4
+        for group in ('and', 'or'):
+            if self.text.startswith(group + '(', self.pos):
+                self.pos += len(group) + 1
+                sql, params = self._conditions(group)
+                self._expect(')')
+                return (f"NOT {sql}" if negate else sql), params
+
+        column = self._until('.')
+        op = self._until('.')
+        negate = op == 'not'
+        if negate:
+            op = self._until('.')
+
+        if op == 'in':
+            self._expect('(')
+            values = []
+            while self.text[self.pos] != ')':
+                values.append(self._value())
+                if self.text[self.pos] == ',':
+                    self.pos += 1
+            self._expect(')')
+            value = values
+        else:
+            value = self._value()
+
+        sql, params = _filter_sql(column, op, value)
+        return (f"NOT ({sql})" if negate else sql), params
+
+    def _until(self, delimiter: str) -> str:
+        end = self.text.index(delimiter, self.pos)
+        token = self.text[self.pos:end]
+        self.pos = end + 1
+        return token
+
+    def _expect(self, char: str) -> None:
+        if self.pos >= len(self.text) or self.text[self.pos] != char:
+            raise ValueError(f"Expected {char!r} at {self.pos} in filter {self.text!r}")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        if self.text[self.pos] == '"':
+            self.pos += 1
+            chars = []
+            while self.text[self.pos] != '"':
+                if self.text[self.pos] == '\\':
+                    self.pos += 1
+                chars.append(self.text[self.pos])
+                self.pos += 1
+            self.pos += 1
+            return ''.join(chars)
+
+        start = self.pos
+        while self.pos < len(self.text) and self.text[self.pos] not in ',)':
+            self.pos += 1
+        return _literal(self.text[start:self.pos])
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a select string on commas that are not inside an embed."""
+    parts, depth, start = [], 0, 0
+    for position, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:position])
+            start = position + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_select(columns: str) -> Tuple[Optional[Tuple[str, ...]], Tuple[Tuple[str, str, str, Optional[Tuple[str, ...]]], ...]]:
+    """
+    Parse a select string into (fields, embeds).
+    fields is None for '*'. Each embed is (alias, table, foreign key, fields):
+    'customers(...)' joins customers on customer_id and
+    'products:product_id(...)' joins products on product_id.
+    """
+    fields, embeds, star = [], [], False
+    for item in _split_top_level(columns):
+        if '(' not in item:
+            if item == '*':
+                star = True
+            else:
+                fields.append(_identifier(item))
+            continue
+
+        head, inner = item.split('(', 1)
+        alias, _, hint = (part.strip() for part in head.partition(':'))
+        if hint.endswith('_id'):
+            foreign_key, table = hint, f"{hint[:-3]}s"
+        else:
+            table = hint or alias
+            foreign_key = f"{table[:-1] if table.endswith('s') else table}_id"
+        embed_fields, _ = _parse_select(inner.rsplit(')', 1)[0])
+        embeds.append((alias, _identifier(table), _identifier(foreign_key), embed_fields))
+
+    return (None if star else tuple(fields)), tuple(embeds)
+
+
+def _project(row: Dict, fields: Optional[Sequence[str]]) -> Dict:
+    return dict(row) if fields is None else {field: row.get(field) for field in fields}
+
+
+class MirrorQuery:
+    """Read-only query builder over one mirrored table."""
+
+    def __init__(self, mirror: "LocalMirror", table: str):
+        self._mirror = mirror
+        self._table = table
+        # Same labels as PostgREST request builders, for the query log
+        self.path = f"/{table}"
+        self.http_method = "GET"
+        self._columns = "*"
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+
+    def select(self, columns: str = "*") -> "MirrorQuery":
+        self._columns = columns
+        return self
+
+    def _filter(self, column: str, op: str, value: Any) -> "MirrorQuery":
+        sql, params = _filter_sql(column, op, value)
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    def eq(self, column: str, value: Any) -> "MirrorQuery":
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column: str, value: Any) -> "MirrorQuery":
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column: str, value: Any) -> "MirrorQuery":
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column: str, value: Any) -> "MirrorQuery":
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column: str, value: Any) -> "MirrorQuery":
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column: str, value: Any) -> "MirrorQuery":
+        return self._filter(column, 'lte', value)
+
+    def like(self, column: str, pattern: str) -> "MirrorQuery":
+        return self._filter(column, 'like', pattern)
+
+    def ilike(self, column: str, pattern: str) -> "MirrorQuery":
+        return self._filter(column, 'ilike', pattern)
+
+    def is_(self, column: str, value: Any) -> "MirrorQuery":
+        return self._filter(column, 'is', None if value in (None, 'null') else value)
+
+    def in_(self, column: str, values: Iterable[Any]) -> "MirrorQuery":
+        return self._filter(column, 'in', list(values))
+
+    def or_(self, filters: str) -> "MirrorQuery":
+        sql, params = _LogicTreeParser(filters).parse('or')
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "MirrorQuery":
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size: int) -> "MirrorQuery":
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int) -> "MirrorQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def execute(self) -> MirrorResponse:
+        return MirrorResponse(self._mirror.select(
+            self._table, self._columns, self._where, self._params, self._order, self._limit, self._offset
+        ))
+
+
+class LocalMirror:
+    """
+    SQLite store for mirrored rows and their sync watermarks.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str, tables: Sequence[str] = MIRROR_TABLES):
+        self.path = path
+        self.tables = tuple(tables)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._known_tables = set()
+        self._ready = False
+
+        with self._lock:
+            if path != ':memory:':
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS _mirror_sync (name TEXT PRIMARY KEY, watermark TEXT, synced_at REAL)"
+            )
+            for table in self.tables:
+                self._create_table(table)
+            self._connection.commit()
+
+    def _create_table(self, table: str) -> None:
+        """Create a row table and its indexes. Caller holds the lock."""
+        table = _identifier(table)
+        self._connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY, data TEXT NOT NULL)')
+        for column in _INDEXED_COLUMNS.get(table, ()):
+            self._connection.execute(
+                f'CREATE INDEX IF NOT EXISTS "{table}_{column}_idx" ON "{table}" ({_column_sql(column)})'
+            )
+        self._known_tables.add(table)
+
+    def mirrors(self, table: str) -> bool:
+        """True if reads of table can be served from the mirror."""
+        return table in self.tables
+
+    def table(self, table: str) -> MirrorQuery:
+        """Start a read query, like supabase Client.table()."""
+        if not self.mirrors(table):
+            raise ValueError(f"Table {table} is not mirrored")
+        return MirrorQuery(self, table)
+
+    def select(self, table: str, columns: str, where: Sequence[str], params: Sequence[Any],
+               order: Sequence[Tuple[str, bool]], limit: Optional[int], offset: int) -> List[Dict]:
+        """Run a compiled query and shape rows like PostgREST would."""
+        fields, embeds = _parse_select(columns)
+
+        sql = f'SELECT data FROM "{_identifier(table)}"'
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if order:
+            # Postgres puts NULLs last ascending and first descending. Text sorts
+            # by code point (SQLite BINARY), which matches Postgres only under
+            # the C collation: with a locale collation such as en_US, mixed-case
+            # and accented text orders differently, so the client keeps each
+            # keyset walk on the source of its first page (_query_customer_page).
+            terms = []
+            for column, desc in order:
+                expr = _column_sql(column)
+                direction = "DESC" if desc else "ASC"
+                terms.append(f"({expr} IS NULL) {direction}, {expr} {direction}")
+            sql += " ORDER BY " + ", ".join(terms)
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = list(params) + [-1 if limit is None else limit, offset]
+
+        with self._lock:
+            rows = [json.loads(data) for (data,) in self._connection.execute(sql, params)]
+
+        shaped = [_project(row, fields) for row in rows]
+        for alias, embed_table, foreign_key, embed_fields in embeds:
+            targets = self._rows_by_id(embed_table, {row.get(foreign_key) for row in rows})
+            for row, shaped_row in zip(rows, shaped):
+                target = targets.get(row.get(foreign_key))
+                shaped_row[alias] = _project(target, embed_fields) if target is not None else None
+        return shaped
+
+    def _rows_by_id(self, table: str, ids: Iterable[Any]) -> Dict[Any, Dict]:
+        ids = [row_id for row_id in ids if row_id is not None]
+        found = {}
+        if table not in self._known_tables:
+            return found
+        for start in range(0, len(ids), _MAX_PARAMS):
+            chunk = ids[start:start + _MAX_PARAMS]
+            with self._lock:
+                cursor = self._connection.execute(
+                    f'SELECT id, data FROM "{table}" WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+                )
+                found.update((row_id, json.loads(data)) for row_id, data in cursor)
+        return found
+
+    def upsert_rows(self, table: str, rows: Iterable[Dict]) -> None:
+        """Store full rows, replacing any with the same id."""
+        if not self.mirrors(table):
+            return
+        records = [(row['id'], json.dumps(row, default=str)) for row in rows]
+        with self._lock:
+            self._connection.executemany(f'INSERT OR REPLACE INTO "{table}" (id, data) VALUES (?, ?)', records)
+            self._connection.commit()
+
+    def delete_rows(self, table: str, ids: Iterable[Any]) -> None:
+        """Remove rows by id."""
+        if not self.mirrors(table):
+            return
+        with self._lock:
+            self._connection.executemany(f'DELETE FROM "{table}" WHERE id = ?', [(row_id,) for row_id in ids])
+            self._connection.commit()
+
+    def delete_where(self, table: str, column: str, value: Any) -> None:
+        """Remove every row whose column equals value."""
+        if not self.mirrors(table):
+            return
+        sql, params = _filter_sql(column, 'eq', value)
+        with self._lock:
+            self._connection.execute(f'DELETE FROM "{table}" WHERE {sql}', params)
+            self._connection.commit()
+
+    def get_watermark(self, name: str) -> Optional[str]:
+        """Latest updated_at (or deleted_at) already pulled for a table or feed."""
+        with self._lock:
+            row = self._connection.execute("SELECT watermark FROM _mirror_sync WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, name: str, watermark: Optional[str]) -> None:
+        """Record a completed sync of a table or feed."""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO _mirror_sync (name, watermark, synced_at) VALUES (?, ?, ?)",
+                (name, watermark, time.time())
+            )
+            self._connection.commit()
+
+    def last_synced_at(self) -> Optional[float]:
+        """
+        Epoch time of the oldest completed sync across tables and the deletions feed,
+        or None until every one of them has synced once.
+        """
+        names = (*self.tables, DELETIONS_FEED)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT synced_at FROM _mirror_sync WHERE name IN ({', '.join('?' * len(names))})", names
+            ).fetchall()
+        if len(rows) < len(names):
+            return None
+        return min(synced_at for (synced_at,) in rows)
+
+    def close(self) -> None:
+        """Close the SQLite connection; the mirror can't be used afterwards."""
+        with self._lock:
+            self._connection.close()
+
+    @property
+    def ready(self) -> bool:
+        """True once every mirrored table has been fully synced at least once."""
+        if not self._ready:
+            self._ready = self.last_synced_at() is not None
+        return self._ready
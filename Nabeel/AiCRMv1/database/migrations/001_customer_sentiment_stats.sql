@@ -0,0 +1,22 @@
+-- Per-customer sentiment aggregate, maintained on interaction insert by the
+-- migration 008 trigger.
+-- Rebuild from existing interactions with: python -m database.backfill_sentiment_stats
+CREATE TABLE IF NOT EXISTS customer_sentiment_stats (
+    customer_id INTEGER PRIMARY KEY REFERENCES customers(id) ON DELETE CASCADE,
+
+    -- Counts by sentiment
+    positive_count INTEGER NOT NULL DEFAULT 0,
+    neutral_count INTEGER NOT NULL DEFAULT 0,
+    negative_count INTEGER NOT NULL DEFAULT 0,
+
+    -- Most recent interaction
+    last_sentiment VARCHAR(20),
+    last_interaction_at TIMESTAMP,
+
+    -- Recency-weighted score, decayed to last_interaction_at
+    weighted_score DOUBLE PRECISION NOT NULL DEFAULT 0,
+    weighted_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    overall_sentiment VARCHAR(20) NOT NULL DEFAULT 'neutral',
+
+    updated_at TIMESTAMP DEFAULT NOW()
+);
@@ -0,0 +1,9 @@
+-- One-row-per-stage rollup behind the dashboard metrics and sidebar Quick Stats.
+-- Read by SupabaseClient.get_dashboard_rollup in a single request.
+CREATE OR REPLACE VIEW customer_stage_counts AS
+SELECT
+    stage,
+    COUNT(*) AS total,
+    COUNT(*) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days') AS new_this_week
+FROM customers
+GROUP BY stage;
@@ -0,0 +1,91 @@
+-- Daily analytics rollups behind the Analytics page history.
+-- Refreshed by: python -m analytics.snapshots
+-- Metrics (dimension / sentiment):
+--   revenue        product category / ''     count = orders, amount = revenue
+--   new_customers  current stage / ''        count = customers created that day
+--   interactions   interaction type / sentiment  count = interactions
+CREATE TABLE IF NOT EXISTS daily_analytics_snapshots (
+    id BIGSERIAL PRIMARY KEY,
+    day DATE NOT NULL,
+    metric VARCHAR(40) NOT NULL,
+    dimension VARCHAR(100) NOT NULL,
+    sentiment VARCHAR(20) NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    UNIQUE (day, metric, dimension, sentiment)
+);
+
+CREATE INDEX IF NOT EXISTS daily_analytics_snapshots_day_idx ON daily_analytics_snapshots (day);
+
+-- Days whose snapshot rows are out of date. marked_at moves forward on every
+-- touch, so the job only clears days that were not written again while it ran.
+CREATE TABLE IF NOT EXISTS analytics_dirty_days (
+    day DATE PRIMARY KEY,
+    marked_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION mark_analytics_day(touched TIMESTAMP) RETURNS VOID AS $$
+BEGIN
+    IF touched IS NOT NULL THEN
+        INSERT INTO analytics_dirty_days (day, marked_at)
+        VALUES (touched::date, clock_timestamp())
+        ON CONFLICT (day) DO UPDATE SET marked_at = EXCLUDED.marked_at;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Row trigger; TG_ARGV[0] names the column that dates the row
+CREATE OR REPLACE FUNCTION mark_analytics_days() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM mark_analytics_day((to_jsonb(OLD) ->> TG_ARGV[0])::timestamp);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM mark_analytics_day((to_jsonb(NEW) ->> TG_ARGV[0])::timestamp);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Renaming a product category moves revenue between categories on every day it sold
+CREATE OR REPLACE FUNCTION mark_product_analytics_days() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.category IS DISTINCT FROM OLD.category THEN
+        INSERT INTO analytics_dirty_days (day, marked_at)
+        SELECT DISTINCT transaction_date::date, clock_timestamp()
+        FROM transactions
+        WHERE product_id = NEW.id AND transaction_date IS NOT NULL
+        ON CONFLICT (day) DO UPDATE SET marked_at = EXCLUDED.marked_at;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS transactions_mark_analytics_days ON transactions;
+CREATE TRIGGER transactions_mark_analytics_days
+AFTER INSERT OR UPDATE OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION mark_analytics_days('transaction_date');
+
+DROP TRIGGER IF EXISTS interactions_mark_analytics_days ON interactions;
+CREATE TRIGGER interactions_mark_analytics_days
+AFTER INSERT OR UPDATE OR DELETE ON interactions
+FOR EACH ROW EXECUTE FUNCTION mark_analytics_days('date');
+
+DROP TRIGGER IF EXISTS customers_mark_analytics_days ON customers;
+CREATE TRIGGER customers_mark_analytics_days
+AFTER INSERT OR UPDATE OF stage, created_at OR DELETE ON customers
+FOR EACH ROW EXECUTE FUNCTION mark_analytics_days('created_at');
+
+DROP TRIGGER IF EXISTS products_mark_analytics_days ON products;
+CREATE TRIGGER products_mark_analytics_days
+AFTER UPDATE OF category ON products
+FOR EACH ROW EXECUTE FUNCTION mark_product_analytics_days();
+
+-- Existing history needs a first snapshot
+INSERT INTO analytics_dirty_days (day)
+SELECT transaction_date::date FROM transactions WHERE transaction_date IS NOT NULL
+UNION
+SELECT date::date FROM interactions WHERE date IS NOT NULL
+UNION
+SELECT created_at::date FROM customers WHERE created_at IS NOT NULL
+ON CONFLICT (day) DO NOTHING;
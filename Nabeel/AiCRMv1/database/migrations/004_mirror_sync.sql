@@ -0,0 +1,65 @@
+-- Change feed for the optional local SQLite mirror (AICRM_LOCAL_MIRROR).
+-- The mirror pulls rows by (updated_at, id) and deletions from deleted_rows.
+
+-- Every mirrored table gets an updated_at that moves on every write
+ALTER TABLE interactions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+UPDATE customers SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+UPDATE interactions SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+UPDATE products SET updated_at = COALESCE(created_at, NOW()) WHERE updated_at IS NULL;
+UPDATE transactions SET updated_at = NOW() WHERE updated_at IS NULL;
+
+ALTER TABLE customers ALTER COLUMN updated_at SET DEFAULT NOW(), ALTER COLUMN updated_at SET NOT NULL;
+ALTER TABLE interactions ALTER COLUMN updated_at SET DEFAULT NOW(), ALTER COLUMN updated_at SET NOT NULL;
+ALTER TABLE products ALTER COLUMN updated_at SET DEFAULT NOW(), ALTER COLUMN updated_at SET NOT NULL;
+ALTER TABLE transactions ALTER COLUMN updated_at SET DEFAULT NOW(), ALTER COLUMN updated_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS customers_updated_at_id_idx ON customers (updated_at, id);
+CREATE INDEX IF NOT EXISTS interactions_updated_at_id_idx ON interactions (updated_at, id);
+CREATE INDEX IF NOT EXISTS products_updated_at_id_idx ON products (updated_at, id);
+CREATE INDEX IF NOT EXISTS transactions_updated_at_id_idx ON transactions (updated_at, id);
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tombstones for deleted rows; safe to prune entries older than any mirror's last sync
+CREATE TABLE IF NOT EXISTS deleted_rows (
+    id BIGSERIAL PRIMARY KEY,
+    table_name VARCHAR(40) NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS deleted_rows_deleted_at_idx ON deleted_rows (deleted_at);
+
+CREATE OR REPLACE FUNCTION record_deleted_row() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    mirrored TEXT;
+BEGIN
+    FOREACH mirrored IN ARRAY ARRAY['customers', 'interactions', 'products', 'transactions'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', mirrored || '_touch_updated_at', mirrored);
+        EXECUTE format(
+            'CREATE TRIGGER %I BEFORE UPDATE ON %I FOR EACH ROW EXECUTE FUNCTION touch_updated_at()',
+            mirrored || '_touch_updated_at', mirrored
+        );
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', mirrored || '_record_deleted_row', mirrored);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I FOR EACH ROW EXECUTE FUNCTION record_deleted_row()',
+            mirrored || '_record_deleted_row', mirrored
+        );
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,4 @@
+-- Which classifier set each interaction's sentiment, so the batch backfill
+-- (python -m ai.backfill_sentiment) can resume and skip rows it already scored.
+-- NULL means set by hand or by the single-text classifier on the log form.
+ALTER TABLE interactions ADD COLUMN IF NOT EXISTS sentiment_source VARCHAR(80);
@@ -0,0 +1,96 @@
+-- Background AI customer summaries.
+-- Regenerated by: python -m ai.summary_queue
+-- Writing a customer's interactions or transactions, or the profile fields the
+-- summary prompt reads, queues the customer; the job regenerates queued
+-- summaries and stamps ai_summary_generated_at. Existing customers are not
+-- queued here; python -m ai.summary_queue --all does that on purpose.
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS ai_summary_generated_at TIMESTAMP;
+
+-- Customers whose ai_summary is out of date. marked_at moves forward on every
+-- touch, so the job only clears customers that were not written again while
+-- their summary was being generated.
+CREATE TABLE IF NOT EXISTS ai_summary_queue (
+    customer_id INTEGER PRIMARY KEY REFERENCES customers(id) ON DELETE CASCADE,
+    marked_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    -- Set while a worker holds the row; see claim_ai_summaries
+    claimed_until TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ai_summary_queue_marked_at_idx ON ai_summary_queue (marked_at);
+
+-- Row trigger; TG_ARGV[0] names the column holding the customer id
+CREATE OR REPLACE FUNCTION queue_ai_summaries() RETURNS TRIGGER AS $$
+DECLARE
+    customer INTEGER;
+BEGIN
+    FOR customer IN
+        SELECT (to_jsonb(OLD) ->> TG_ARGV[0])::integer WHERE TG_OP IN ('UPDATE', 'DELETE')
+        UNION
+        SELECT (to_jsonb(NEW) ->> TG_ARGV[0])::integer WHERE TG_OP IN ('INSERT', 'UPDATE')
+    LOOP
+        IF customer IS NOT NULL THEN
+            INSERT INTO ai_summary_queue (customer_id, marked_at)
+            SELECT customer, clock_timestamp() WHERE EXISTS (SELECT 1 FROM customers WHERE id = customer)
+            ON CONFLICT (customer_id) DO UPDATE SET marked_at = EXCLUDED.marked_at;
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Not on sentiment updates: re-scoring history (python -m ai.backfill_sentiment)
+-- would otherwise queue every customer for a new summary
+DROP TRIGGER IF EXISTS interactions_queue_ai_summaries ON interactions;
+CREATE TRIGGER interactions_queue_ai_summaries
+AFTER INSERT OR UPDATE OF customer_id, type, subject, content, date OR DELETE ON interactions
+FOR EACH ROW EXECUTE FUNCTION queue_ai_summaries('customer_id');
+
+DROP TRIGGER IF EXISTS transactions_queue_ai_summaries ON transactions;
+CREATE TRIGGER transactions_queue_ai_summaries
+AFTER INSERT OR UPDATE OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION queue_ai_summaries('customer_id');
+
+-- Only the columns the summary prompt reads; writing ai_summary itself must not requeue
+DROP TRIGGER IF EXISTS customers_queue_ai_summaries ON customers;
+CREATE TRIGGER customers_queue_ai_summaries
+AFTER INSERT OR UPDATE OF first_name, last_name, email, phone, company, stage, notes ON customers
+FOR EACH ROW EXECUTE FUNCTION queue_ai_summaries('id');
+
+-- A summary written other than by the job or the app's generate buttons
+-- (which stamp ai_summary_generated_at) is hand-written; the job leaves it alone
+CREATE OR REPLACE FUNCTION mark_manual_ai_summary() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.ai_summary IS DISTINCT FROM OLD.ai_summary
+       AND NEW.ai_summary_generated_at IS NOT DISTINCT FROM OLD.ai_summary_generated_at THEN
+        NEW.ai_summary_generated_at := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS customers_mark_manual_ai_summary ON customers;
+CREATE TRIGGER customers_mark_manual_ai_summary
+BEFORE UPDATE OF ai_summary ON customers
+FOR EACH ROW EXECUTE FUNCTION mark_manual_ai_summary();
+
+-- Claim up to max_rows queued customers for lease_seconds, longest waiting
+-- first (or just only_customer). Rows another worker holds are skipped, so
+-- concurrent drainers never generate the same summary; a claim that is never
+-- cleared (the worker failed or died) lapses and the row is claimed again.
+CREATE OR REPLACE FUNCTION claim_ai_summaries(max_rows INTEGER, lease_seconds INTEGER DEFAULT 600,
+                                              only_customer INTEGER DEFAULT NULL)
+RETURNS TABLE (customer_id INTEGER, marked_at TIMESTAMP) AS $$
+    UPDATE ai_summary_queue queued
+    SET claimed_until = clock_timestamp() + make_interval(secs => lease_seconds)
+    FROM (
+        SELECT candidate.customer_id
+        FROM ai_summary_queue candidate
+        WHERE (candidate.claimed_until IS NULL OR candidate.claimed_until < clock_timestamp())
+          AND (only_customer IS NULL OR candidate.customer_id = only_customer)
+        ORDER BY candidate.marked_at
+        LIMIT max_rows
+        FOR UPDATE SKIP LOCKED
+    ) claimable
+    WHERE queued.customer_id = claimable.customer_id
+    RETURNING queued.customer_id, queued.marked_at;
+$$ LANGUAGE sql;
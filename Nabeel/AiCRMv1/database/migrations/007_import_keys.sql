@@ -0,0 +1,15 @@
+-- Idempotent bulk imports (python -m database.bulk_import).
+-- Each imported row carries import_key = '<import id>:<row number in file>'.
+-- A run that crashes after inserting a chunk but before checkpointing it
+-- replays that chunk on resume; the unique index lets the import skip rows
+-- it already wrote instead of inserting them twice. NULL for rows created
+-- any other way, which the index does not constrain.
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS import_key VARCHAR(80);
+ALTER TABLE interactions ADD COLUMN IF NOT EXISTS import_key VARCHAR(80);
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS import_key VARCHAR(80);
+ALTER TABLE products ADD COLUMN IF NOT EXISTS import_key VARCHAR(80);
+
+CREATE UNIQUE INDEX IF NOT EXISTS customers_import_key_idx ON customers (import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS interactions_import_key_idx ON interactions (import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS transactions_import_key_idx ON transactions (import_key);
+CREATE UNIQUE INDEX IF NOT EXISTS products_import_key_idx ON products (import_key);
@@ -0,0 +1,159 @@
+-- Per-customer upkeep of interaction inserts, done by the database in the
+-- inserting transaction: the customer_sentiment_stats aggregate (001) and
+-- customers.last_contact. Concurrent inserts for one customer each add to
+-- the stored row instead of overwriting one another's read-modify-write.
+-- The arithmetic follows database/sentiment_stats.py; keep the two in step.
+
+-- Weight of an interaction elapsed older than the reference time (30-day half-life)
+CREATE OR REPLACE FUNCTION sentiment_decay(elapsed INTERVAL) RETURNS DOUBLE PRECISION AS $$
+    SELECT power(0.5, EXTRACT(EPOCH FROM elapsed) / 86400.0 / 30.0);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- overall_sentiment always follows the weighted score, however the row was written
+CREATE OR REPLACE FUNCTION classify_sentiment_stats() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.overall_sentiment := CASE
+        WHEN NEW.weighted_total = 0 THEN 'neutral'
+        WHEN NEW.weighted_score / NEW.weighted_total >= 0.2 THEN 'positive'
+        WHEN NEW.weighted_score / NEW.weighted_total <= -0.2 THEN 'negative'
+        ELSE 'neutral'
+    END;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS customer_sentiment_stats_classify ON customer_sentiment_stats;
+CREATE TRIGGER customer_sentiment_stats_classify
+BEFORE INSERT OR UPDATE ON customer_sentiment_stats
+FOR EACH ROW EXECUTE FUNCTION classify_sentiment_stats();
+
+-- Fold one new interaction into its customer's aggregate in a single upsert.
+-- A newer interaction decays the stored score forward and becomes the last
+-- one; a backdated one is added already decayed to the stored reference time.
+CREATE OR REPLACE FUNCTION apply_interaction_sentiment() RETURNS TRIGGER AS $$
+DECLARE
+    sentiment TEXT := CASE WHEN NEW.sentiment IN ('positive', 'neutral', 'negative') THEN NEW.sentiment ELSE 'neutral' END;
+BEGIN
+    IF NEW.customer_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO customer_sentiment_stats AS stats (
+        customer_id, positive_count, neutral_count, negative_count, last_sentiment, last_interaction_at,
+        weighted_score, weighted_total, updated_at
+    )
+    VALUES (
+        NEW.customer_id, (sentiment = 'positive')::int, (sentiment = 'neutral')::int, (sentiment = 'negative')::int,
+        sentiment, NEW.date,
+        CASE sentiment WHEN 'positive' THEN 1.0 WHEN 'negative' THEN -1.0 ELSE 0.0 END, 1.0, NOW()
+    )
+    ON CONFLICT (customer_id) DO UPDATE SET
+        positive_count = stats.positive_count + EXCLUDED.positive_count,
+        neutral_count = stats.neutral_count + EXCLUDED.neutral_count,
+        negative_count = stats.negative_count + EXCLUDED.negative_count,
+        last_sentiment = CASE
+            WHEN stats.last_interaction_at IS NULL OR EXCLUDED.last_interaction_at >= stats.last_interaction_at
+            THEN EXCLUDED.last_sentiment ELSE stats.last_sentiment END,
+        last_interaction_at = GREATEST(stats.last_interaction_at, EXCLUDED.last_interaction_at),
+        weighted_score = CASE
+            WHEN stats.last_interaction_at IS NULL THEN EXCLUDED.weighted_score
+            WHEN EXCLUDED.last_interaction_at >= stats.last_interaction_at
+            THEN stats.weighted_score * sentiment_decay(EXCLUDED.last_interaction_at - stats.last_interaction_at)
+                 + EXCLUDED.weighted_score
+            ELSE stats.weighted_score
+                 + EXCLUDED.weighted_score * sentiment_decay(stats.last_interaction_at - EXCLUDED.last_interaction_at)
+        END,
+        weighted_total = CASE
+            WHEN stats.last_interaction_at IS NULL THEN 1.0
+            WHEN EXCLUDED.last_interaction_at >= stats.last_interaction_at
+            THEN stats.weighted_total * sentiment_decay(EXCLUDED.last_interaction_at - stats.last_interaction_at) + 1.0
+            ELSE stats.weighted_total + sentiment_decay(stats.last_interaction_at - EXCLUDED.last_interaction_at)
+        END,
+        updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS interactions_apply_sentiment ON interactions;
+CREATE TRIGGER interactions_apply_sentiment
+AFTER INSERT ON interactions
+FOR EACH ROW EXECUTE FUNCTION apply_interaction_sentiment();
+
+-- last_contact only moves forward, so logging a backdated interaction or
+-- importing history never rewinds it. One UPDATE per insert statement.
+CREATE OR REPLACE FUNCTION touch_last_contact() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE customers
+    SET last_contact = latest.contact
+    FROM (
+        SELECT customer_id, MAX(date) AS contact FROM new_interactions GROUP BY customer_id
+    ) latest
+    WHERE customers.id = latest.customer_id
+      AND (customers.last_contact IS NULL OR customers.last_contact < latest.contact);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS interactions_touch_last_contact ON interactions;
+CREATE TRIGGER interactions_touch_last_contact
+AFTER INSERT ON interactions
+REFERENCING NEW TABLE AS new_interactions
+FOR EACH STATEMENT EXECUTE FUNCTION touch_last_contact();
+
+-- Recompute every aggregate from the interactions table in one transaction
+-- (python -m database.backfill_sentiment_stats), e.g. after sentiments were
+-- re-scored. Aggregates of customers with no interactions left are deleted.
+-- The table lock makes concurrent inserts wait, so their trigger adds to the
+-- rebuilt row rather than being overwritten by it. Returns the rows written.
+CREATE OR REPLACE FUNCTION rebuild_customer_sentiment_stats() RETURNS INTEGER AS $$
+DECLARE
+    written INTEGER;
+BEGIN
+    LOCK TABLE customer_sentiment_stats IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM customer_sentiment_stats stats
+    WHERE NOT EXISTS (SELECT 1 FROM interactions WHERE interactions.customer_id = stats.customer_id);
+
+    INSERT INTO customer_sentiment_stats AS stats (
+        customer_id, positive_count, neutral_count, negative_count, last_sentiment, last_interaction_at,
+        weighted_score, weighted_total, updated_at
+    )
+    SELECT
+        scored.customer_id,
+        COUNT(*) FILTER (WHERE scored.sentiment = 'positive'),
+        COUNT(*) FILTER (WHERE scored.sentiment = 'neutral'),
+        COUNT(*) FILTER (WHERE scored.sentiment = 'negative'),
+        latest.sentiment,
+        latest.date,
+        SUM(scored.value * sentiment_decay(latest.date - scored.date)),
+        SUM(sentiment_decay(latest.date - scored.date)),
+        NOW()
+    FROM (
+        SELECT customer_id, date, sentiment_label AS sentiment,
+               CASE sentiment_label WHEN 'positive' THEN 1.0 WHEN 'negative' THEN -1.0 ELSE 0.0 END AS value
+        FROM interactions,
+             LATERAL (SELECT CASE WHEN sentiment IN ('positive', 'neutral', 'negative')
+                                  THEN sentiment ELSE 'neutral' END AS sentiment_label) label
+        WHERE customer_id IS NOT NULL
+    ) scored
+    JOIN (
+        SELECT DISTINCT ON (customer_id) customer_id, date,
+               CASE WHEN sentiment IN ('positive', 'neutral', 'negative') THEN sentiment ELSE 'neutral' END AS sentiment
+        FROM interactions
+        WHERE customer_id IS NOT NULL
+        ORDER BY customer_id, date DESC, id DESC
+    ) latest ON latest.customer_id = scored.customer_id
+    GROUP BY scored.customer_id, latest.sentiment, latest.date
+    ON CONFLICT (customer_id) DO UPDATE SET
+        positive_count = EXCLUDED.positive_count,
+        neutral_count = EXCLUDED.neutral_count,
+        negative_count = EXCLUDED.negative_count,
+        last_sentiment = EXCLUDED.last_sentiment,
+        last_interaction_at = EXCLUDED.last_interaction_at,
+        weighted_score = EXCLUDED.weighted_score,
+        weighted_total = EXCLUDED.weighted_total,
+        updated_at = EXCLUDED.updated_at;
+
+    GET DIAGNOSTICS written = ROW_COUNT;
+    RETURN written;
+END;
+$$ LANGUAGE plpgsql;
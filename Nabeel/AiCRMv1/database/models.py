@@ -0,0 +1,159 @@
+# database/models.py
+"""
+Compact read-only row models for customers, interactions, transactions and products.
+
+Rows keep their columns in __slots__ instead of a per-row dict, and behave
+as read-only mappings, so existing code using row['id'] and row.get(...)
+keeps working. Large text columns left out of a query's projection are
+lazy: the first access loads that column for every row from the same query
+in one request, instead of one request per row.
+"""
+
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+# Loads (ids, fields) -> {id: {field: value}} for one table
+FieldLoader = Callable[[List[Any], Tuple[str, ...]], Dict[Any, Dict]]
+
+
+class LazyFields:
+    """Shared by the rows of one query result; fills a lazy column for all of them at once."""
+
+    __slots__ = ('_rows', '_loader', '_lock')
+
+    def __init__(self, loader: FieldLoader):
+        self._rows: List["Row"] = []
+        self._loader = loader
+        self._lock = threading.Lock()
+
+    def load(self, field: str) -> None:
+        with self._lock:
+            pending = [row for row in self._rows if not hasattr(row, field)]
+            if not pending:
+                return
+            values = self._loader([row['id'] for row in pending], (field,))
+            for row in pending:
+                object.__setattr__(row, field, values.get(row['id'], {}).get(field))
+
+
+class Row(Mapping):
+    """
+    Base row model. Subclasses list their columns in FIELDS (which become
+    the slots) and the large ones in LAZY_FIELDS. Columns outside FIELDS,
+    such as embedded joins, are kept in a small side dict.
+    """
+
+    __slots__ = ('_extra', '_lazy')
+    FIELDS: Tuple[str, ...] = ()
+    LAZY_FIELDS: Tuple[str, ...] = ()
+
+    def __init__(self, data: Mapping, lazy: Optional[LazyFields] = None):
+        extra = None
+        for key, value in data.items():
+            if key in self._field_set:
+                object.__setattr__(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        object.__setattr__(self, '_extra', extra)
+        object.__setattr__(self, '_lazy', lazy)
+        if lazy is not None:
+            lazy._rows.append(self)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+
+    @classmethod
+    def from_rows(cls: Type["Row"], rows: Iterable[Mapping], loader: Optional[FieldLoader] = None) -> List["Row"]:
+        """Wrap query results; with a loader, unselected LAZY_FIELDS load on first access."""
+        lazy = LazyFields(loader) if loader is not None and cls.LAZY_FIELDS else None
+        return [cls(row, lazy) for row in rows]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                if key in self.LAZY_FIELDS and self._lazy is not None:
+                    self._lazy.load(key)
+                    return getattr(self, key)
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def _loaded_keys(self) -> Iterator[str]:
+        for field in self.FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._loaded_keys()
+        if self._lazy is not None:
+            for field in self.LAZY_FIELDS:
+                if not hasattr(self, field):
+                    yield field
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._field_set:
+            return hasattr(self, key) or (key in self.LAZY_FIELDS and self._lazy is not None)
+        return self._extra is not None and key in self._extra
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} rows are read-only")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict of the columns loaded so far; never triggers a lazy load."""
+        return {key: self[key] for key in self._loaded_keys()}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Row):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return type(self), (self.to_dict(),)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Customer(Row):
+    FIELDS = (
+        'id', 'first_name', 'last_name', 'email', 'phone', 'company', 'stage',
+        'notes', 'ai_summary', 'ai_insights', 'created_at', 'updated_at', 'last_contact',
+    )
+    LAZY_FIELDS = ('notes', 'ai_summary', 'ai_insights')
+    __slots__ = FIELDS
+
+
+class Interaction(Row):
+    FIELDS = ('id', 'customer_id', 'type', 'subject', 'content', 'date', 'sentiment', 'created_at', 'updated_at')
+    LAZY_FIELDS = ('content',)
+    __slots__ = FIELDS
+
+
+class Transaction(Row):
+    FIELDS = (
+        'id', 'customer_id', 'product_id', 'quantity', 'total_amount', 'payment_method',
+        'transaction_date', 'notes', 'created_at', 'updated_at',
+    )
+    LAZY_FIELDS = ('notes',)
+    __slots__ = FIELDS
+
+
+class Product(Row):
+    FIELDS = ('id', 'name', 'category', 'price', 'description', 'brand', 'in_stock', 'created_at', 'updated_at')
+    __slots__ = FIELDS
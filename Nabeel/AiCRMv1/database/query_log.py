@@ -0,0 +1,144 @@
+# database/query_log.py
+"""
+Per-rerun database query instrumentation.
+
+AsyncSupabaseClient records every query it sends (to Supabase or the local
+mirror) in the QueryLog current for the calling context: the client method
+that issued it, the table, latency, row count and payload size. Cache hits
+are counted but send nothing. app.py opens one log per Streamlit rerun with
+track_queries, shows it in a debug panel and logs a one-line JSON summary,
+warning when the rerun makes more queries than the budget allows.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Queries one rerun may make before it is flagged; a page that exceeds this
+# usually fetches per row (N+1) somewhere
+QUERY_BUDGET = int(os.environ.get("AICRM_QUERY_BUDGET", "20"))
+
+# Log of the rerun in progress; SupabaseClient.run carries it onto its event loop
+query_log = contextvars.ContextVar('query_log', default=None)
+
+# Public client method being served, recorded with each query it makes; set on
+# entry to every public AsyncSupabaseClient method, so gathered calls keep their own
+client_method = contextvars.ContextVar('client_method', default='unknown')
+
+
+@dataclass(frozen=True)
+class QueryRecord:
+    """One query sent to the database."""
+    method: str
+    table: str
+    operation: str
+    source: str
+    seconds: float
+    rows: int
+    bytes: int
+    error: Optional[str] = None
+
+
+class QueryLog:
+    """
+    Thread-safe list of the queries made while it is current.
+    budget is the number of queries allowed before over_budget is set.
+    """
+
+    def __init__(self, label: str = "", budget: int = QUERY_BUDGET):
+        self.label = label
+        self.budget = budget
+        self.records: List[QueryRecord] = []
+        self.cache_hits = 0
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, record: QueryRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def record_cache_hit(self) -> None:
+        with self._lock:
+            self.cache_hits += 1
+
+    @property
+    def over_budget(self) -> bool:
+        return len(self.records) > self.budget
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals for the log and per client method, e.g.
+        {'label': 'Home', 'queries': 4, 'cache_hits': 2, 'db_ms': 85.2, ...,
+         'by_method': {'get_recent_interactions': {'calls': 1, 'ms': 40.1, 'rows': 5, 'bytes': 1800}}}
+        """
+        with self._lock:
+            records = list(self.records)
+            cache_hits = self.cache_hits
+
+        by_method: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            totals = by_method.setdefault(record.method, {'calls': 0, 'ms': 0.0, 'rows': 0, 'bytes': 0, 'errors': 0})
+            totals['calls'] += 1
+            totals['ms'] += record.seconds * 1000
+            totals['rows'] += record.rows
+            totals['bytes'] += record.bytes
+            totals['errors'] += record.error is not None
+        for totals in by_method.values():
+            totals['ms'] = round(totals['ms'], 1)
+
+        return {
+            'label': self.label,
+            'queries': len(records),
+            'cache_hits': cache_hits,
+            'db_ms': round(sum(record.seconds for record in records) * 1000, 1),
+            'wall_ms': round((time.perf_counter() - self._started) * 1000, 1),
+            'rows': sum(record.rows for record in records),
+            'bytes': sum(record.bytes for record in records),
+            'errors': sum(record.error is not None for record in records),
+            'budget': self.budget,
+            'over_budget': self.over_budget,
+            'by_method': dict(sorted(by_method.items(), key=lambda item: -item[1]['calls'])),
+        }
+
+    def log_summary(self) -> Dict[str, Any]:
+        """Write the summary to the log as one JSON line and return it."""
+        summary = self.summary()
+        line = json.dumps({'event': 'query_summary', **summary})
+        if summary['over_budget']:
+            logger.warning(line)
+        else:
+            logger.info(line)
+        return summary
+
+
+@contextlib.contextmanager
+def track_queries(label: str = "", budget: int = QUERY_BUDGET) -> Iterator[QueryLog]:
+    """
+    Record the queries made inside the block.
+
+        with track_queries("Home") as queries:
+            show_home_page()
+        queries.log_summary()
+    """
+    log = QueryLog(label, budget)
+    token = query_log.set(log)
+    try:
+        yield log
+    finally:
+        query_log.reset(token)
+
+
+def payload_bytes(data: Any) -> int:
+    """Size of response data as compact JSON, approximating the response body."""
+    try:
+        return len(json.dumps(data, default=str, separators=(',', ':')))
+    except (TypeError, ValueError):
+        return 0
@@ -0,0 +1,186 @@
+# database/search_index.py
+"""
+In-process trigram index over customer name, company and email.
+
+Used by SupabaseClient.search_customers when the local index is enabled,
+so each keystroke-driven rerun is answered from memory instead of an
+ilike table scan on the server.
+"""
+
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Share of the query's trigrams a customer must contain to count as a fuzzy match
+MIN_SIMILARITY = 0.3
+
+# Queries shorter than this have too few trigrams, so they scan field prefixes instead
+MIN_TRIGRAM_QUERY_LENGTH = 3
+
+# Rank tiers: lower sorts first
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+
+
+def _normalize(value) -> str:
+    """Lowercase and collapse whitespace."""
+    return ' '.join(str(value or '').lower().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Split text into trigrams the way pg_trgm does: each word padded
+    with two leading spaces and one trailing space.
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class CustomerSearchIndex:
+    """
+    Ranked, typo-tolerant customer search kept in memory.
+
+    Exact field matches rank first, then prefix matches (of a field or any
+    word in it), then substring matches, then fuzzy trigram matches by
+    similarity. Callers keep it current with add() and remove().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fields: Dict[int, Tuple[str, ...]] = {}
+        self._grams: Dict[int, Set[str]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        # add()/remove() calls made while build() runs, replayed onto the new contents
+        self._changes: Optional[List[Tuple[int, Optional[Dict]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def build(self, customers: Iterable[Dict]) -> None:
+        """
+        Replace the index contents with the given customers. The new index is
+        built outside the lock and swapped in, so searches keep answering from
+        the old one meanwhile; add() and remove() calls made during the build
+        are applied to both.
+        """
+        with self._lock:
+            self._changes = []
+
+        fields: Dict[int, Tuple[str, ...]] = {}
+        grams: Dict[int, Set[str]] = {}
+        postings: Dict[str, Set[int]] = {}
+        try:
+            for customer in customers:
+                self._add(customer, fields, grams, postings)
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+
+        with self._lock:
+            for customer_id, customer in self._changes:
+                self._remove(customer_id, fields, grams, postings)
+                if customer is not None:
+                    self._add(customer, fields, grams, postings)
+            self._fields, self._grams, self._postings = fields, grams, postings
+            self._changes = None
+
+    def add(self, customer: Dict) -> None:
+        """Index a new customer or re-index an updated one."""
+        with self._lock:
+            self._remove(customer['id'])
+            self._add(customer)
+            if self._changes is not None:
+                self._changes.append((customer['id'], customer))
+
+    def remove(self, customer_id: int) -> None:
+        """Drop a customer from the index."""
+        with self._lock:
+            self._remove(customer_id)
+            if self._changes is not None:
+                self._changes.append((customer_id, None))
+
+    def search(self, term: str, limit: int = 500) -> List[int]:
+        """
+        Return up to limit customer ids matching term, best match first.
+        """
+        query = _normalize(term)
+        if not query:
+            return []
+
+        with self._lock:
+            if len(query) < MIN_TRIGRAM_QUERY_LENGTH:
+                candidates = {customer_id: 0.0 for customer_id in self._fields}
+            else:
+                query_grams = trigrams(query)
+                shared = Counter()
+                for gram in query_grams:
+                    shared.update(self._postings.get(gram, ()))
+                candidates = {
+                    customer_id: count / len(query_grams)
+                    for customer_id, count in shared.items()
+                }
+
+            ranked = []
+            for customer_id, similarity in candidates.items():
+                tier = self._tier(query, self._fields[customer_id])
+                if tier == FUZZY and similarity < MIN_SIMILARITY:
+                    continue
+                ranked.append((tier, -similarity, customer_id))
+
+        ranked.sort()
+        return [customer_id for _, _, customer_id in ranked[:limit]]
+
+    def _add(self, customer: Dict, fields_by_id: Optional[Dict[int, Tuple[str, ...]]] = None,
+             grams_by_id: Optional[Dict[int, Set[str]]] = None,
+             postings: Optional[Dict[str, Set[int]]] = None) -> None:
+        """Index customer into the given structures, the live ones by default."""
+        fields_by_id = self._fields if fields_by_id is None else fields_by_id
+        grams_by_id = self._grams if grams_by_id is None else grams_by_id
+        postings = self._postings if postings is None else postings
+
+        first_name = _normalize(customer.get('first_name'))
+        last_name = _normalize(customer.get('last_name'))
+        fields = (
+            f"{first_name} {last_name}".strip(),
+            first_name,
+            last_name,
+            _normalize(customer.get('company')),
+            _normalize(customer.get('email')),
+        )
+        grams = trigrams(' '.join(fields[0:1] + fields[3:]))
+
+        fields_by_id[customer['id']] = fields
+        grams_by_id[customer['id']] = grams
+        for gram in grams:
+            postings.setdefault(gram, set()).add(customer['id'])
+
+    def _remove(self, customer_id: int, fields_by_id: Optional[Dict[int, Tuple[str, ...]]] = None,
+                grams_by_id: Optional[Dict[int, Set[str]]] = None,
+                postings: Optional[Dict[str, Set[int]]] = None) -> None:
+        """Drop customer_id from the given structures, the live ones by default."""
+        fields_by_id = self._fields if fields_by_id is None else fields_by_id
+        grams_by_id = self._grams if grams_by_id is None else grams_by_id
+        postings = self._postings if postings is None else postings
+
+        fields_by_id.pop(customer_id, None)
+        for gram in grams_by_id.pop(customer_id, ()):
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(customer_id)
+                if not ids:
+                    del postings[gram]
+
+    @staticmethod
+    def _tier(query: str, fields: Tuple[str, ...]) -> int:
+        """Classify how well the query matches a customer's fields."""
+        if query in fields:
+            return EXACT
+        for field in fields:
+            if field.startswith(query) or f" {query}" in field:
+                return PREFIX
+        if any(query in field for field in fields):
+            return SUBSTRING
+        return FUZZY
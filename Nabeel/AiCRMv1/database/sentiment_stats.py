@@ -0,0 +1,108 @@
+# database/sentiment_stats.py
+"""
+Incrementally maintained per-customer sentiment aggregate.
+
+Each row in customer_sentiment_stats holds counts by sentiment, the last
+sentiment seen and a recency-weighted score. The weighted score is stored
+decayed to last_interaction_at, so folding in a new interaction only needs
+the current row - never the full interaction history.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+SENTIMENT_VALUES = {'positive': 1.0, 'neutral': 0.0, 'negative': -1.0}
+
+# An interaction from 30 days ago counts half as much as one from today
+HALF_LIFE_DAYS = 30.0
+
+# Normalised weighted score needed to call a customer positive or negative
+SENTIMENT_THRESHOLD = 0.2
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    Parse a Supabase timestamp (or datetime) into a naive UTC datetime.
+    Returns None if the value is missing or unparseable.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def empty_stats(customer_id: int) -> Dict:
+    """Return an aggregate row for a customer with no interactions."""
+    return {
+        'customer_id': customer_id,
+        'positive_count': 0,
+        'neutral_count': 0,
+        'negative_count': 0,
+        'last_sentiment': None,
+        'last_interaction_at': None,
+        'weighted_score': 0.0,
+        'weighted_total': 0.0,
+        'overall_sentiment': 'neutral',
+    }
+
+
+def apply_interaction(stats: Dict, sentiment: Optional[str], date) -> Dict:
+    """
+    Fold one interaction into an aggregate row.
+    Returns a new row; the input row is not modified.
+    """
+    sentiment = sentiment if sentiment in SENTIMENTS else 'neutral'
+    value = SENTIMENT_VALUES[sentiment]
+    interaction_at = parse_timestamp(date) or datetime.utcnow()
+    last_at = parse_timestamp(stats.get('last_interaction_at'))
+
+    updated = dict(stats)
+    updated[f'{sentiment}_count'] = (stats.get(f'{sentiment}_count') or 0) + 1
+    score = stats.get('weighted_score') or 0.0
+    total = stats.get('weighted_total') or 0.0
+
+    if last_at is None or interaction_at >= last_at:
+        # Newer interaction: decay the stored score forward, then add it at full weight
+        decay = _decay(interaction_at - last_at) if last_at else 0.0
+        updated['weighted_score'] = score * decay + value
+        updated['weighted_total'] = total * decay + 1.0
+        updated['last_sentiment'] = sentiment
+        updated['last_interaction_at'] = interaction_at.isoformat()
+    else:
+        # Backdated interaction: add it already decayed to the stored reference time
+        weight = _decay(last_at - interaction_at)
+        updated['weighted_score'] = score + value * weight
+        updated['weighted_total'] = total + weight
+
+    updated['overall_sentiment'] = overall_sentiment(updated)
+    return updated
+
+
+def overall_sentiment(stats: Optional[Dict]) -> str:
+    """
+    Classify an aggregate row as positive, neutral or negative.
+    Decay applies equally to score and total, so the ratio needs no 'now'.
+    """
+    if not stats or not stats.get('weighted_total'):
+        return 'neutral'
+    ratio = stats['weighted_score'] / stats['weighted_total']
+    if ratio >= SENTIMENT_THRESHOLD:
+        return 'positive'
+    if ratio <= -SENTIMENT_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def _decay(elapsed) -> float:
+    """Weight multiplier for a time gap under the configured half-life."""
+    days = elapsed.total_seconds() / 86400.0
+    return 0.5 ** (days / HALF_LIFE_DAYS)
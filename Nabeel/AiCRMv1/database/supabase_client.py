@@ -1,443 +1,235 @@
-import os
-from typing import List, Dict, Optional
-from supabase import create_client, Client
-from dotenv import load_dotenv
+import asyncio
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from supabase import AsyncClient
 import streamlit as st
 
-# Load environment variables
-load_dotenv()
+from .activity_feed import ActivityFeed
+from .async_supabase_client import MAX_PAGE_SIZE, AsyncSupabaseClient, error_sink, report_error
+from .cache import QueryCache
+from .query_log import query_log
+
+
+def _sync_method(name: str) -> Callable:
+    """Expose AsyncSupabaseClient.<name> as a blocking method."""
+    async_method = getattr(AsyncSupabaseClient, name)
+
+    @functools.wraps(async_method)
+    def method(self, *args, **kwargs):
+        return self.run(getattr(self.aio, name)(*args, **kwargs))
+
+    return method
+
 
 class SupabaseClient:
     """
     Handles all database operations for the AiCRM application.
-    
+
     This class follows the Singleton pattern - only one instance
     should exist to avoid multiple connections.
+
+    It is a blocking wrapper around AsyncSupabaseClient: the async client
+    lives on a private event loop thread and every method waits for its
+    coroutine there. Use run() to await several async calls at once.
     """
-    
-    def __init__(self):
-        """Initialize the Supabase client with credentials from environment."""
-        self.url: str = os.environ.get("SUPABASE_URL")
-        self.key: str = os.environ.get("SUPABASE_KEY")
-        
-        if not self.url or not self.key:
-            raise ValueError("Supabase URL and KEY must be set in environment variables")
-        
-        self.client: Client = create_client(self.url, self.key)
-    
-    def test_connection(self) -> bool:
-        """
-        Test if we can connect to Supabase.
-        Returns True if successful, False otherwise.
-        """
-        try:
-            # Simple query to test connection
-            response = self.client.table('customers').select("id").limit(1).execute()
-            return True
-        except Exception as e:
-            st.error(f"Database connection failed: {e}")
-            return False
-    
-    # CUSTOMER OPERATIONS
-    def get_all_customers(self) -> List[Dict]:
-        """
-        Fetch all customers from the database.
-        Returns a list of customer dictionaries.
-        """
-        try:
-            response = self.client.table('customers').select("*").execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Failed to fetch customers: {e}")
-            return []
-    
-    def get_customer_by_id(self, customer_id: int) -> Optional[Dict]:
+
+    def __init__(self, local_search: Optional[bool] = None, cache: Optional[QueryCache] = None,
+                 mirror_path: Optional[str] = None, backend: Optional[str] = None,
+                 activity_feed: Optional[ActivityFeed] = None):
+        """
+        Initialize Supabase connection using credentials from environment.
+        local_search enables the in-process customer search index;
+        defaults to the AICRM_LOCAL_SEARCH environment variable.
+        cache is the read-through query cache; defaults to an in-memory QueryCache.
+        mirror_path enables the local SQLite mirror, synced in the background;
+        defaults to the AICRM_LOCAL_MIRROR environment variable.
+        backend selects Supabase or the offline SQLite stand-in
+        ('sqlite' or 'sqlite:<path>'); defaults to the AICRM_BACKEND
+        environment variable, then Supabase.
+        activity_feed is the shared home page feed; defaults to an ActivityFeed
+        polling every ACTIVITY_FEED_POLL_SECONDS.
+        """
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="supabase-client", daemon=True)
+        self._loop_thread.start()
+
+        self.aio: AsyncSupabaseClient = asyncio.run_coroutine_threadsafe(
+            AsyncSupabaseClient.create(
+                local_search, cache, mirror_path=mirror_path, backend=backend, activity_feed=activity_feed
+            ),
+            self._loop
+        ).result()
+        self.aio.field_loader = self._load_fields
+
+    @property
+    def client(self) -> AsyncClient:
+        """The underlying supabase AsyncClient."""
+        return self.aio.client
+
+    @property
+    def cache(self) -> QueryCache:
+        """The read-through query cache shared with the async client."""
+        return self.aio.cache
+
+    def run(self, awaitable: Awaitable) -> Any:
         """
-        Fetch a single customer by ID.
-        Returns customer dict or None if not found.
+        Wait for an awaitable on the client's event loop and return its result.
+        Errors the async client reports while running it are shown in the
+        calling Streamlit session, and its queries go to the caller's QueryLog.
+
+            customer, interactions = db.run(asyncio.gather(
+                db.aio.get_customer_by_id(1), db.aio.get_customer_interactions(1)
+            ))
         """
+        errors: List[str] = []
+        log = query_log.get()
+
+        async def scoped():
+            error_sink.set(errors)
+            query_log.set(log)
+            return await awaitable
+
         try:
-            response = self.client.table('customers').select("*").eq('id', customer_id).execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to fetch customer: {e}")
-            return None
-    
-    def search_customers(self, search_term: str) -> List[Dict]:
+            return asyncio.run_coroutine_threadsafe(scoped(), self._loop).result()
+        finally:
+            for message in errors:
+                report_error(message)
+
+    test_connection = _sync_method('test_connection')
+
+    def _load_fields(self, table: str, ids: List[Any], fields: Tuple[str, ...]) -> Dict[Any, Dict]:
         """
-        Search customers by name, email, or company.
-        Uses Supabase's text search capabilities.
+        Field loader for the row models: fetch lazy columns on first access.
+        Errors are reported and the fields read as None.
         """
+        if threading.current_thread() is self._loop_thread:
+            raise RuntimeError(f"Lazy fields {fields} of {table} can't load on the event loop; select them instead")
         try:
-            # Search in multiple fields using 'or' condition
-            response = self.client.table('customers').select("*").or_(
-                f"first_name.ilike.%{search_term}%,"
-                f"last_name.ilike.%{search_term}%,"
-                f"email.ilike.%{search_term}%,"
-                f"company.ilike.%{search_term}%"
-            ).execute()
-            return response.data
+            return self.run(self.aio.fetch_fields(table, ids, fields))
         except Exception as e:
-            st.error(f"Search failed: {e}")
-            return []
-    
-    def filter_customers_by_stage(self, stage: str) -> List[Dict]:
+            report_error(f"Failed to load {', '.join(fields)} for {table}: {e}")
+            return {}
+
+    fetch_fields = _sync_method('fetch_fields')
+
+    def cache_stats(self) -> Dict[str, Any]:
         """
-        Filter customers by pipeline stage.
+        Get read-through cache counters (hits, misses, hit_rate, size, evictions).
         """
-        try:
-            response = self.client.table('customers').select("*").eq('stage', stage.lower()).execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Filter failed: {e}")
-            return []
-    
-    def create_customer(self, customer_data: Dict) -> Optional[Dict]:
+        return self.aio.cache_stats()
+
+    def transport_status(self) -> Dict[str, Any]:
         """
-        Create a new customer.
-        Returns the created customer dict or None if failed.
+        Get circuit breaker state for the connection indicator.
+        Returns dict like {'state': 'closed', 'failures': 0, 'retry_in': 0.0}.
         """
-        try:
-            response = self.client.table('customers').insert(customer_data).execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to create customer: {e}")
-            return None
-    
-    def update_customer(self, customer_id: int, updates: Dict) -> Optional[Dict]:
+        return self.aio.transport_status()
+
+    def iter_table_rows(self, table: str, columns: str = "*", page_size: int = MAX_PAGE_SIZE,
+                        between: Optional[Tuple[str, Any, Any]] = None, key: str = 'id') -> Iterator[Dict]:
         """
-        Update an existing customer.
-        Returns the updated customer dict or None if failed.
+        Stream every row of a table in key order, one page at a time.
+        columns must include key, which must be unique.
+        between=(column, start, end) limits rows to start <= column < end;
+        either bound may be None.
+        Uses keyset pagination on key so memory stays bounded for large tables.
+        Errors propagate to the caller; this is meant for batch jobs, not views.
         """
+        rows = self.aio.iter_table_rows(table, columns, page_size, between, key)
+
+        async def next_page() -> List[Dict]:
+            page = []
+            async for row in rows:
+                page.append(row)
+                if len(page) == page_size:
+                    break
+            return page
+
         try:
-            # Add updated_at timestamp
-            updates['updated_at'] = 'now()'
-            response = self.client.table('customers').update(updates).eq('id', customer_id).execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to update customer: {e}")
-            return None
-    
-    def delete_customer(self, customer_id: int) -> bool:
+            while True:
+                page = self.run(next_page())
+                yield from page
+                if len(page) < page_size:
+                    return
+        finally:
+            self.run(rows.aclose())
+
+    # LOCAL MIRROR
+    sync_mirror = _sync_method('sync_mirror')
+
+    def mirror_status(self) -> Dict[str, Any]:
         """
-        Delete a customer and all their interactions.
-        Returns True if successful, False otherwise.
+        Get local mirror state for the staleness indicator.
+        Returns dict like {'enabled': True, 'ready': True, 'age_seconds': 12.5,
+        'sync_interval': 30.0, 'error': None}; age_seconds is None before the first sync.
         """
-        try:
-            # First delete all interactions for this customer
-            self.client.table('interactions').delete().eq('customer_id', customer_id).execute()
-            
-            # Then delete the customer
-            response = self.client.table('customers').delete().eq('id', customer_id).execute()
-            return True
-        except Exception as e:
-            st.error(f"Failed to delete customer: {e}")
-            return False
-    
+        return self.aio.mirror_status()
+
+    # CUSTOMER OPERATIONS
+    get_all_customers = _sync_method('get_all_customers')
+    get_customer_by_id = _sync_method('get_customer_by_id')
+    search_customers = _sync_method('search_customers')
+    filter_customers_by_stage = _sync_method('filter_customers_by_stage')
+    create_customer = _sync_method('create_customer')
+    bulk_create_customers = _sync_method('bulk_create_customers')
+    update_customer = _sync_method('update_customer')
+    delete_customer = _sync_method('delete_customer')
+
     # INTERACTION OPERATIONS
-    def get_customer_interactions(self, customer_id: int) -> List[Dict]:
-        """
-        Get all interactions for a specific customer.
-        Ordered by date (newest first).
-        """
-        try:
-            response = self.client.table('interactions').select("*").eq('customer_id', customer_id).order('date', desc=True).execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Failed to fetch interactions: {e}")
-            return []
-    
-    def get_recent_interactions(self, limit: int = 10) -> List[Dict]:
-        """
-        Get the most recent interactions across all customers.
-        Useful for dashboard activity feed.
-        """
-        try:
-            response = self.client.table('interactions').select(
-                "*, customers(first_name, last_name, company)"
-            ).order('date', desc=True).limit(limit).execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Failed to fetch recent interactions: {e}")
-            return []
-    
-    def create_interaction(self, interaction_data: Dict) -> Optional[Dict]:
-        """
-        Create a new interaction.
-        Also updates the customer's last_contact timestamp.
-        """
-        try:
-            # Create the interaction
-            response = self.client.table('interactions').insert(interaction_data).execute()
-            
-            # Update customer's last_contact
-            if response.data:
-                self.client.table('customers').update({
-                    'last_contact': interaction_data['date']
-                }).eq('id', interaction_data['customer_id']).execute()
-            
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to create interaction: {e}")
-            return None
-    
+    get_customer_interactions = _sync_method('get_customer_interactions')
+    get_recent_interactions = _sync_method('get_recent_interactions')
+    get_activity_feed = _sync_method('get_activity_feed')
+    get_interactions_to_score = _sync_method('get_interactions_to_score')
+    set_interaction_sentiments = _sync_method('set_interaction_sentiments')
+    create_interaction = _sync_method('create_interaction')
+    bulk_create_interactions = _sync_method('bulk_create_interactions')
+    get_overall_sentiment_for_customers = _sync_method('get_overall_sentiment_for_customers')
+    get_customer_sentiment_stats = _sync_method('get_customer_sentiment_stats')
+    rebuild_sentiment_stats = _sync_method('rebuild_sentiment_stats')
+
     # ANALYTICS OPERATIONS
-    def get_customer_counts_by_stage(self) -> Dict[str, int]:
-        """
-        Get count of customers in each pipeline stage.
-        Returns dict like {'lead': 5, 'prospect': 3, 'customer': 12}
-        """
-        try:
-            stages = ['lead', 'prospect', 'customer']
-            counts = {}
-            
-            for stage in stages:
-                response = self.client.table('customers').select("id", count='exact').eq('stage', stage).execute()
-                counts[stage] = response.count or 0
-            
-            return counts
-        except Exception as e:
-            st.error(f"Failed to get stage counts: {e}")
-            return {'lead': 0, 'prospect': 0, 'customer': 0}
-    
+    get_dashboard_rollup = _sync_method('get_dashboard_rollup')
+    get_customer_counts_by_stage = _sync_method('get_customer_counts_by_stage')
+    get_daily_snapshots = _sync_method('get_daily_snapshots')
+    replace_daily_snapshots = _sync_method('replace_daily_snapshots')
+    get_analytics_dirty_days = _sync_method('get_analytics_dirty_days')
+    clear_analytics_dirty_days = _sync_method('clear_analytics_dirty_days')
+
+    # AI SUMMARY OPERATIONS
+    get_summary_queue = _sync_method('get_summary_queue')
+    claim_summary_queue = _sync_method('claim_summary_queue')
+    get_summary_queue_entry = _sync_method('get_summary_queue_entry')
+    enqueue_customer_summaries = _sync_method('enqueue_customer_summaries')
+    save_customer_summary = _sync_method('save_customer_summary')
+    clear_summary_queue = _sync_method('clear_summary_queue')
+
     # PRODUCT OPERATIONS
-    def get_all_products(self) -> List[Dict]:
-        """
-        Get all products from the database.
-        Returns a list of product dictionaries.
-        """
-        try:
-            response = self.client.table('products').select("*").execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Failed to fetch products: {e}")
-            return []
-    
-    def get_products_by_category(self, category: str) -> List[Dict]:
-        """
-        Get products filtered by category.
-        """
-        try:
-            response = self.client.table('products').select("*").eq('category', category).execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Failed to fetch products by category: {e}")
-            return []
-    
-    def get_product_by_id(self, product_id: int) -> Optional[Dict]:
-        """
-        Get a specific product by ID.
-        """
-        try:
-            response = self.client.table('products').select("*").eq('id', product_id).execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to fetch product: {e}")
-            return None
-    
-    def create_product(self, product_data: Dict) -> Optional[Dict]:
-        """
-        Create a new product.
-        """
-        try:
-            response = self.client.table('products').insert(product_data).execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to create product: {e}")
-            return None
-    
-    def update_product(self, product_id: int, product_data: Dict) -> bool:
-        """
-        Update an existing product.
-        """
-        try:
-            response = self.client.table('products').update(product_data).eq('id', product_id).execute()
-            return True
-        except Exception as e:
-            st.error(f"Failed to update product: {e}")
-            return False
-    
-    def delete_product(self, product_id: int) -> bool:
-        """
-        Delete a product.
-        """
-        try:
-            self.client.table('products').delete().eq('id', product_id).execute()
-            return True
-        except Exception as e:
-            st.error(f"Failed to delete product: {e}")
-            return False
-    
-    def get_customer_product_interests(self, customer_id: int) -> List[Dict]:
+    def get_catalog_version(self) -> int:
         """
-        Extract product interests from customer interactions.
-        Returns a list of products mentioned or discussed in interactions.
+        Get the current product catalog version.
+        Bumped by every product write made through this client.
         """
-        try:
-            # Get all interactions for the customer
-            interactions = self.get_customer_interactions(customer_id)
-            
-            # Get all products for reference
-            all_products = self.get_all_products()
-            
-            # Extract product interests from interaction content
-            product_interests = []
-            
-            for interaction in interactions:
-                content = interaction.get('content', '').lower()
-                subject = interaction.get('subject', '').lower()
-                
-                # Check for product mentions in content and subject
-                for product in all_products:
-                    product_name = product.get('name', '').lower()
-                    product_category = product.get('category', '').lower()
-                    
-                    # Check if product name or category is mentioned
-                    if (product_name in content or product_name in subject or 
-                        product_category in content or product_category in subject):
-                        
-                        # Add product interest with interaction context
-                        interest = {
-                            'product': product,
-                            'interaction_id': interaction.get('id'),
-                            'interaction_type': interaction.get('type'),
-                            'interaction_date': interaction.get('date'),
-                            'sentiment': interaction.get('sentiment'),
-                            'context': interaction.get('content', '')[:200] + '...' if len(interaction.get('content', '')) > 200 else interaction.get('content', '')
-                        }
-                        
-                        # Avoid duplicates
-                        if not any(pi['product']['id'] == product['id'] for pi in product_interests):
-                            product_interests.append(interest)
-            
-            return product_interests
-            
-        except Exception as e:
-            st.error(f"Failed to get customer product interests: {e}")
-            return []
-    
-    def get_products_by_interest_keywords(self, keywords: List[str]) -> List[Dict]:
-        """
-        Find products that match interest keywords.
-        """
-        try:
-            all_products = self.get_all_products()
-            matching_products = []
-            
-            for product in all_products:
-                product_text = f"{product.get('name', '')} {product.get('description', '')} {product.get('category', '')}".lower()
-                
-                for keyword in keywords:
-                    if keyword.lower() in product_text:
-                        matching_products.append(product)
-                        break
-            
-            return matching_products
-            
-        except Exception as e:
-            st.error(f"Failed to get products by keywords: {e}")
-            return []
-    
+        return self.aio.get_catalog_version()
+
+    get_all_products = _sync_method('get_all_products')
+    get_products_by_category = _sync_method('get_products_by_category')
+    get_product_by_id = _sync_method('get_product_by_id')
+    create_product = _sync_method('create_product')
+    bulk_create_products = _sync_method('bulk_create_products')
+    update_product = _sync_method('update_product')
+    delete_product = _sync_method('delete_product')
+    get_product_matcher = _sync_method('get_product_matcher')
+    get_customer_product_interests = _sync_method('get_customer_product_interests')
+    get_products_by_interest_keywords = _sync_method('get_products_by_interest_keywords')
+
     # TRANSACTION OPERATIONS
-    def get_customer_transactions(self, customer_id: int) -> List[Dict]:
-        """
-        Get all transactions for a specific customer.
-        """
-        try:
-            response = self.client.table('transactions').select("""
-                *,
-                products:product_id(name, category, price, description),
-                customers:customer_id(first_name, last_name, company)
-            """).eq('customer_id', customer_id).order('transaction_date', desc=True).execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Failed to fetch customer transactions: {e}")
-            return []
-    
-    def get_all_transactions(self) -> List[Dict]:
-        """
-        Get all transactions with product and customer details.
-        """
-        try:
-            response = self.client.table('transactions').select("""
-                *,
-                products:product_id(name, category, price, description),
-                customers:customer_id(first_name, last_name, company)
-            """).order('transaction_date', desc=True).execute()
-            return response.data
-        except Exception as e:
-            st.error(f"Failed to fetch transactions: {e}")
-            return []
-    
-    def create_transaction(self, transaction_data: Dict) -> Optional[Dict]:
-        """
-        Create a new transaction.
-        """
-        try:
-            response = self.client.table('transactions').insert(transaction_data).execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to create transaction: {e}")
-            return None
-    
-    def get_transaction_by_id(self, transaction_id: int) -> Optional[Dict]:
-        """
-        Get a specific transaction by ID.
-        """
-        try:
-            response = self.client.table('transactions').select("""
-                *,
-                products:product_id(name, category, price, description),
-                customers:customer_id(first_name, last_name, company)
-            """).eq('id', transaction_id).execute()
-            return response.data[0] if response.data else None
-        except Exception as e:
-            st.error(f"Failed to fetch transaction: {e}")
-            return None
-    
-    def get_customer_purchase_history(self, customer_id: int) -> Dict:
-        """
-        Get comprehensive purchase history for a customer.
-        """
-        try:
-            transactions = self.get_customer_transactions(customer_id)
-            
-            if not transactions:
-                return {
-                    'total_transactions': 0,
-                    'total_spent': 0,
-                    'average_transaction': 0,
-                    'favorite_categories': [],
-                    'recent_purchases': [],
-                    'purchase_timeline': []
-                }
-            
-            # Calculate metrics
-            total_spent = sum(t.get('total_amount', 0) for t in transactions)
-            total_transactions = len(transactions)
-            average_transaction = total_spent / total_transactions if total_transactions > 0 else 0
-            
-            # Get favorite categories
-            categories = {}
-            for transaction in transactions:
-                product = transaction.get('products', {})
-                category = product.get('category', 'Unknown')
-                categories[category] = categories.get(category, 0) + 1
-            
-            favorite_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)
-            
-            return {
-                'total_transactions': total_transactions,
-                'total_spent': total_spent,
-                'average_transaction': average_transaction,
-                'favorite_categories': favorite_categories,
-                'recent_purchases': transactions[:5],  # Last 5 purchases
-                'purchase_timeline': transactions
-            }
-            
-        except Exception as e:
-            st.error(f"Failed to get purchase history: {e}")
-            return {}
+    get_customer_transactions = _sync_method('get_customer_transactions')
+    get_all_transactions = _sync_method('get_all_transactions')
+    create_transaction = _sync_method('create_transaction')
+    bulk_create_transactions = _sync_method('bulk_create_transactions')
+    get_transaction_by_id = _sync_method('get_transaction_by_id')
+    get_customer_purchase_history = _sync_method('get_customer_purchase_history')
 
 
 # Singleton pattern - create one instance to be used throughout the app
@@ -0,0 +1,247 @@
+# database/synthetic_data.py
+"""
+Deterministic synthetic CRM data for benchmarks, load tests and offline runs.
+
+The same DatasetSpec always produces the same rows. Each table is generated
+lazily with its own seeded random stream, and populate() writes rows to a
+LocalBackend in chunks, so large datasets never sit in memory at once.
+Interaction content mentions catalog products, so the product matcher and
+the AI prompts see realistic input.
+
+Usage (from the AiCRMv1 directory):
+    python -m database.synthetic_data crm.db --customers 10000
+    AICRM_BACKEND=sqlite:crm.db streamlit run app.py
+"""
+
+import argparse
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from .local_backend import LocalBackend
+
+DEFAULT_CHUNK_SIZE = 1000
+
+FIRST_NAMES = (
+    'Ava', 'Liam', 'Olivia', 'Noah', 'Emma', 'Mateo', 'Sophia', 'Lucas', 'Isabella', 'Ethan',
+    'Mia', 'Amir', 'Chloe', 'Kenji', 'Priya', 'Diego', 'Hannah', 'Omar', 'Grace', 'Ivan',
+)
+LAST_NAMES = (
+    'Smith', 'Johnson', 'Garcia', 'Brown', 'Nguyen', 'Patel', 'Kim', 'Martinez', 'Rossi', 'Müller',
+    'Okafor', 'Silva', 'Cohen', 'Tanaka', 'Dubois', 'Anderson', 'Khan', 'Lopez', 'Novak', "O'Brien",
+)
+COMPANIES = (
+    'Acme Corp', 'Globex', 'Initech', 'Umbrella Group', 'Stark Industries', 'Wayne Enterprises',
+    'Hooli', 'Vandelay Imports', 'Soylent', 'Wonka Industries', None,
+)
+STAGES = ('lead', 'prospect', 'customer')
+INTERACTION_TYPES = ('email', 'call', 'meeting', 'note')
+SENTIMENTS = ('positive', 'neutral', 'negative')
+PAYMENT_METHODS = ('credit_card', 'debit_card', 'cash', 'bank_transfer')
+
+# Product categories from PRD.md, with (item names, price range)
+CATALOG = {
+    'suits': (('Wool Suit', 'Linen Suit', 'Tuxedo', 'Three-Piece Suit'), (400, 1800)),
+    'dresses': (('Evening Gown', 'Cocktail Dress', 'Wrap Dress', 'Silk Slip Dress'), (150, 1200)),
+    'accessories': (('Silk Tie', 'Leather Belt', 'Cufflinks', 'Cashmere Scarf'), (40, 400)),
+    'shoes': (('Oxford Shoes', 'Loafers', 'Chelsea Boots', 'Stiletto Heels'), (180, 900)),
+}
+
+FILLER = (
+    "Discussed fit and sizing options in detail.",
+    "Customer asked about delivery times before the event.",
+    "Followed up on the last order and alterations.",
+    "Mentioned a budget review next quarter.",
+    "Interested in the seasonal collection preview.",
+    "Requested fabric swatches and a second fitting.",
+    "Feedback on service was noted for the team.",
+)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """
+    Size and shape of a synthetic dataset. Per-customer counts are averages.
+    end is the latest timestamp generated; set it for byte-identical datasets
+    across days (it defaults to the start of the current UTC day).
+    """
+    customers: int = 1000
+    interactions_per_customer: float = 5.0
+    transactions_per_customer: float = 2.0
+    products: int = 40
+    days: int = 365
+    seed: int = 0
+    end: Optional[datetime] = None
+
+    def end_time(self) -> datetime:
+        return self.end or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def rng(self, table: str) -> random.Random:
+        return random.Random(f"{self.seed}:{table}")
+
+
+def _timestamp(spec: DatasetSpec, rng: random.Random, not_before: Optional[datetime] = None) -> datetime:
+    end = spec.end_time()
+    start = max(end - timedelta(days=spec.days), not_before or datetime.min)
+    return start + timedelta(seconds=rng.randint(0, max(int((end - start).total_seconds()), 0)))
+
+
+def _count(rng: random.Random, average: float) -> int:
+    """Per-customer row count averaging average, with a long-ish tail."""
+    return int(rng.expovariate(1 / average)) if average > 0 else 0
+
+
+def generate_products(spec: DatasetSpec) -> Iterator[Dict]:
+    rng = spec.rng('products')
+    categories = sorted(CATALOG)
+    created_at = (spec.end_time() - timedelta(days=spec.days)).isoformat()
+    for product_id in range(1, spec.products + 1):
+        category = categories[(product_id - 1) % len(categories)]
+        names, (low, high) = CATALOG[category]
+        base = names[((product_id - 1) // len(categories)) % len(names)]
+        edition = (product_id - 1) // (len(categories) * len(names))
+        yield {
+            'id': product_id,
+            'name': f"{base} {edition + 1}" if edition else base,
+            'category': category,
+            'price': round(rng.uniform(low, high), 2),
+            'description': f"{base} from the {category} line.",
+            'brand': 'Luxe Couture',
+            'in_stock': rng.random() > 0.1,
+            'created_at': created_at,
+            'updated_at': created_at,
+        }
+
+
+def generate_customers(spec: DatasetSpec) -> Iterator[Dict]:
+    rng = spec.rng('customers')
+    for customer_id in range(1, spec.customers + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        handle = f"{first}.{last}".lower().replace("'", "")
+        created_at = _timestamp(spec, rng)
+        last_contact = _timestamp(spec, rng, not_before=created_at) if rng.random() < 0.8 else None
+        yield {
+            'id': customer_id,
+            'first_name': first,
+            'last_name': last,
+            'email': f"{handle}{customer_id}@example.com",
+            'phone': f"555-{rng.randint(0, 9999):04d}",
+            'company': rng.choice(COMPANIES),
+            'stage': rng.choices(STAGES, weights=(5, 3, 2))[0],
+            'notes': " ".join(rng.choices(FILLER, k=rng.randint(1, 4))),
+            'ai_summary': " ".join(rng.choices(FILLER, k=6)) if rng.random() < 0.3 else None,
+            'ai_insights': None,
+            'created_at': created_at.isoformat(),
+            'updated_at': (last_contact or created_at).isoformat(),
+            'last_contact': last_contact.isoformat() if last_contact else None,
+        }
+
+
+def generate_interactions(spec: DatasetSpec) -> Iterator[Dict]:
+    rng = spec.rng('interactions')
+    product_names = [product['name'] for product in generate_products(spec)]
+    interaction_id = 0
+    for customer_id in range(1, spec.customers + 1):
+        for _ in range(_count(rng, spec.interactions_per_customer)):
+            interaction_id += 1
+            sentences = rng.choices(FILLER, k=rng.randint(2, 8))
+            if product_names and rng.random() < 0.6:
+                sentences.insert(rng.randrange(len(sentences)), f"Asked about the {rng.choice(product_names)}.")
+            date = _timestamp(spec, rng).isoformat()
+            yield {
+                'id': interaction_id,
+                'customer_id': customer_id,
+                'type': rng.choice(INTERACTION_TYPES),
+                'subject': rng.choice(FILLER)[:60],
+                'content': " ".join(sentences),
+                'date': date,
+                'sentiment': rng.choices(SENTIMENTS, weights=(5, 3, 2))[0],
+                'created_at': date,
+                'updated_at': date,
+            }
+
+
+def generate_transactions(spec: DatasetSpec) -> Iterator[Dict]:
+    rng = spec.rng('transactions')
+    prices = [product['price'] for product in generate_products(spec)]
+    transaction_id = 0
+    for customer_id in range(1, spec.customers + 1):
+        for _ in range(_count(rng, spec.transactions_per_customer) if prices else 0):
+            transaction_id += 1
+            product_id = rng.randint(1, len(prices))
+            quantity = rng.choices((1, 2, 3), weights=(8, 2, 1))[0]
+            transaction_date = _timestamp(spec, rng).isoformat()
+            yield {
+                'id': transaction_id,
+                'customer_id': customer_id,
+                'product_id': product_id,
+                'quantity': quantity,
+                'total_amount': round(prices[product_id - 1] * quantity, 2),
+                'payment_method': rng.choice(PAYMENT_METHODS),
+                'transaction_date': transaction_date,
+                'notes': rng.choice(FILLER) if rng.random() < 0.3 else None,
+                'updated_at': transaction_date,
+            }
+
+
+def _insert_chunks(backend: LocalBackend, table: str, rows: Iterator[Dict], chunk_size: int) -> int:
+    chunk: List[Dict] = []
+    inserted = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            inserted += len(backend.insert_rows(table, chunk))
+            chunk = []
+    if chunk:
+        inserted += len(backend.insert_rows(table, chunk))
+    return inserted
+
+
+def populate(backend: LocalBackend, spec: DatasetSpec = DatasetSpec(),
+             chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    """
+    Write a synthetic dataset into an empty backend. The backend builds the
+    sentiment aggregates as the interactions go in, as the database does.
+    Returns the number of rows written per table.
+    """
+    counts = {
+        'products': _insert_chunks(backend, 'products', generate_products(spec), chunk_size),
+        'customers': _insert_chunks(backend, 'customers', generate_customers(spec), chunk_size),
+        'interactions': _insert_chunks(backend, 'interactions', generate_interactions(spec), chunk_size),
+        'transactions': _insert_chunks(backend, 'transactions', generate_transactions(spec), chunk_size),
+    }
+    counts['customer_sentiment_stats'] = len(
+        backend.table('customer_sentiment_stats').select("customer_id").execute().data
+    )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic AiCRM dataset into a local SQLite backend.")
+    parser.add_argument("path", help="SQLite file to create or extend (use with AICRM_BACKEND=sqlite:<path>)")
+    parser.add_argument("--customers", type=int, default=DatasetSpec.customers)
+    parser.add_argument("--interactions-per-customer", type=float, default=DatasetSpec.interactions_per_customer)
+    parser.add_argument("--transactions-per-customer", type=float, default=DatasetSpec.transactions_per_customer)
+    parser.add_argument("--products", type=int, default=DatasetSpec.products)
+    parser.add_argument("--days", type=int, default=DatasetSpec.days, help="History length in days")
+    parser.add_argument("--seed", type=int, default=DatasetSpec.seed)
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Latest timestamp (default: start of today, UTC)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per insert")
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        customers=args.customers,
+        interactions_per_customer=args.interactions_per_customer,
+        transactions_per_customer=args.transactions_per_customer,
+        products=args.products,
+        days=args.days,
+        seed=args.seed,
+        end=args.end
+    )
+    counts = populate(LocalBackend(args.path), spec, chunk_size=args.chunk_size)
+    print(", ".join(f"{count:,} {table}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# database/transport.py
+"""
+Transport policy for AsyncSupabaseClient: connection pooling, timeouts,
+retries and a circuit breaker.
+
+Every setting comes from TransportConfig, read from AICRM_DB_* environment
+variables by default. Reads (GET requests) that fail with a transient error
+(timeout, connection failure, 5xx/429) are retried with jittered exponential
+backoff; writes are never retried. After enough consecutive transient
+failures the breaker opens and queries fail fast with DatabaseUnavailable
+until a trial query succeeds, while cached reads are served stale
+(see AsyncSupabaseClient._cached_read).
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+class DatabaseUnavailable(Exception):
+    """Raised instead of querying while the circuit breaker is open."""
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """Pool, timeout, retry and breaker settings for one client."""
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    timeout: float = 15.0
+    read_attempts: int = 3
+    backoff_base: float = 0.2
+    backoff_max: float = 3.0
+    breaker_failures: int = 5
+    breaker_reset_seconds: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        """Defaults overridden by AICRM_DB_* environment variables."""
+        return cls(
+            max_connections=int(_env_float("AICRM_DB_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(_env_float("AICRM_DB_KEEPALIVE_CONNECTIONS", cls.max_keepalive_connections)),
+            keepalive_expiry=_env_float("AICRM_DB_KEEPALIVE_EXPIRY", cls.keepalive_expiry),
+            connect_timeout=_env_float("AICRM_DB_CONNECT_TIMEOUT", cls.connect_timeout),
+            timeout=_env_float("AICRM_DB_TIMEOUT", cls.timeout),
+            read_attempts=max(1, int(_env_float("AICRM_DB_READ_ATTEMPTS", cls.read_attempts))),
+            backoff_base=_env_float("AICRM_DB_BACKOFF_BASE", cls.backoff_base),
+            backoff_max=_env_float("AICRM_DB_BACKOFF_MAX", cls.backoff_max),
+            breaker_failures=max(1, int(_env_float("AICRM_DB_BREAKER_FAILURES", cls.breaker_failures))),
+            breaker_reset_seconds=_env_float("AICRM_DB_BREAKER_RESET", cls.breaker_reset_seconds),
+        )
+
+    def http_client(self) -> httpx.AsyncClient:
+        """Pooled keep-alive HTTP client with these limits and timeouts."""
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt (0-based), with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+# HTTP statuses worth retrying: rate limiting and gateway/server trouble
+_TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Postgres errors worth retrying: statement timeout, shutdown, too many connections
+_TRANSIENT_SQLSTATES = {'57014', '57P01', '57P03', '53300'}
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for failures that say nothing about the query itself and may pass on retry."""
+    if isinstance(error, (DatabaseUnavailable, asyncio.TimeoutError, httpx.TransportError, ConnectionError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in _TRANSIENT_STATUSES
+    # postgrest APIError carries a SQLSTATE, or the HTTP status when PostgREST itself didn't answer
+    code = str(getattr(error, 'code', None) or '')
+    return (
+        code in _TRANSIENT_SQLSTATES or code.startswith('08')
+        or (code.isdigit() and int(code) in _TRANSIENT_STATUSES)
+    )
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive transient failures. At failure_threshold the circuit
+    opens and allow() refuses calls for reset_seconds; then one trial call
+    is let through (half open), and its outcome closes or reopens the circuit.
+    Thread-safe.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may go out now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def abandon(self) -> None:
+        """Forget a call that ended without an outcome (cancelled); a trial slot is freed."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed; 0 when closed."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Get breaker state for status displays.
+        Returns dict like {'state': 'open', 'failures': 5, 'retry_in': 12.0}.
+        """
+        retry_in = self.retry_in()
+        with self._lock:
+            if self._opened_at is None:
+                state = 'closed'
+            elif self._trial_in_flight or retry_in == 0:
+                state = 'half_open'
+            else:
+                state = 'open'
+            return {'state': state, 'failures': self._failures, 'retry_in': round(retry_in, 1)}
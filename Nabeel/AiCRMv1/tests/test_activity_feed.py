@@ -0,0 +1,70 @@
+# tests/test_activity_feed.py
+"""ActivityFeed polling merges, including rows that commit out of id order."""
+
+import time
+
+from database.activity_feed import ActivityFeed
+from database.supabase_client import SupabaseClient
+
+
+def interaction(row_id, date):
+    return {'id': row_id, 'date': f"2024-05-{date:02d}T10:00:00"}
+
+
+def ids(feed):
+    return [item['id'] for item in feed.snapshot(10)['items']]
+
+
+def test_poll_asks_again_only_for_skipped_ids():
+    feed = ActivityFeed(capacity=5)
+    feed.load([interaction(1, 1), interaction(2, 2), interaction(3, 3)])
+    assert (feed.cursor, feed.gaps()) == (3, [])
+
+    assert feed.merge([interaction(5, 5)]) == 1
+    assert (feed.cursor, feed.gaps(), feed.poll_limit(1)) == (5, [4], 6)
+
+
+def test_late_commit_below_the_cursor_is_merged_once():
+    feed = ActivityFeed(capacity=5)
+    feed.load([interaction(1, 1), interaction(2, 2)])
+    assert feed.merge([interaction(4, 4)]) == 1
+
+    # id 3 was handed out before 4 but its transaction committed after the last poll
+    assert feed.merge([interaction(3, 3)]) == 1
+    assert (ids(feed), feed.cursor, feed.gaps()) == ([4, 3, 2, 1], 4, [])
+
+    assert feed.merge([]) == 0
+    assert ids(feed) == [4, 3, 2, 1]
+
+
+def test_gaps_expire_after_the_lookback_and_are_bounded(monkeypatch):
+    feed = ActivityFeed(capacity=2, lookback_seconds=60, max_gaps=3)
+    feed.load([interaction(1, 1)])
+    feed.merge([interaction(10, 10)])
+    assert feed.gaps() == [9, 8, 7]
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert feed.gaps() == []
+
+
+def test_idle_poll_reads_no_rows(monkeypatch):
+    db = SupabaseClient(local_search=False, backend="sqlite")
+    db.aio._activity_feed.poll_seconds = 0
+    db.create_customer({'first_name': "Ann", 'last_name': "Lee", 'stage': 'lead'})
+    for day in (1, 2):
+        db.create_interaction({'customer_id': 1, 'type': 'call', 'subject': "Fitting", 'content': "",
+                               'date': f"2024-05-0{day}T10:00:00", 'sentiment': 'neutral'})
+    assert [item['id'] for item in db.get_activity_feed()['items']] == [2, 1]
+
+    fetched = []
+    fetch_models = db.aio._fetch_models
+
+    async def counting_fetch(*args, **kwargs):
+        rows = await fetch_models(*args, **kwargs)
+        fetched.append(len(rows))
+        return rows
+
+    monkeypatch.setattr(db.aio, '_fetch_models', counting_fetch)
+    db.get_activity_feed()
+    assert fetched == [0]
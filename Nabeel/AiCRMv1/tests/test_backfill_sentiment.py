@@ -0,0 +1,27 @@
+# tests/test_backfill_sentiment.py
+"""Sentiment re-scoring runs, on the offline SQLite backend."""
+
+from ai import backfill_sentiment
+from ai.openai_client import SENTIMENT_SOURCE
+from database.supabase_client import SupabaseClient
+
+
+class NoCallsAI:
+    def classify_sentiments(self, texts):
+        raise AssertionError("nothing is left to score")
+
+
+def test_resumed_run_refreshes_what_the_interrupted_one_wrote():
+    db = SupabaseClient(local_search=False, backend="sqlite")
+    db.create_customer({'first_name': "Ann", 'last_name': "Lee", 'stage': 'lead'})
+    created = db.create_interaction({'customer_id': 1, 'type': 'call', 'subject': "Fitting", 'content': "Great",
+                                     'date': "2024-05-01T10:00:00", 'sentiment': 'neutral'})
+
+    # The interrupted run wrote its batch but stopped before the refresh
+    db.set_interaction_sentiments({created['id']: 'positive'}, SENTIMENT_SOURCE)
+    assert db.get_customer_sentiment_stats(1)['neutral_count'] == 1
+
+    totals = backfill_sentiment.backfill(db, NoCallsAI())
+    assert (totals['scored'], totals['changed'], totals['customers']) == (0, 0, 1)
+    stats = db.get_customer_sentiment_stats(1)
+    assert (stats['positive_count'], stats['neutral_count']) == (1, 0)
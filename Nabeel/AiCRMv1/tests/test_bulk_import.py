@@ -0,0 +1,85 @@
+# tests/test_bulk_import.py
+"""Bulk import checkpoints and resume, on the offline SQLite backend."""
+
+import json
+
+import pytest
+
+from database import bulk_import
+from database.supabase_client import SupabaseClient
+
+
+@pytest.fixture
+def db():
+    return SupabaseClient(local_search=False, backend="sqlite")
+
+
+@pytest.fixture
+def customers_file(tmp_path):
+    path = tmp_path / "customers.jsonl"
+    rows = [{'first_name': f"Customer{index}", 'last_name': "Test", 'stage': 'lead'} for index in range(7)]
+    rows[3] = {'first_name': "", 'last_name': "Test"}
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return str(path)
+
+
+def stored_names(db):
+    return sorted(row['first_name'] for row in db.iter_table_rows('customers', "id, first_name"))
+
+
+def test_import_and_rerun(db, customers_file):
+    progress = bulk_import.import_file(db, 'customers', customers_file, chunk_size=3)
+    assert (progress.rows_done, progress.inserted, progress.rejected) == (7, 6, 1)
+    assert len(stored_names(db)) == 6
+
+    # A finished import resumes past the end and writes nothing
+    progress = bulk_import.import_file(db, 'customers', customers_file, chunk_size=3)
+    assert (progress.rows_done, progress.inserted, progress.rejected) == (7, 6, 1)
+    assert len(stored_names(db)) == 6
+
+
+@pytest.mark.parametrize("crash_on", [1, 2])
+def test_crash_before_checkpoint_does_not_duplicate_rows(db, customers_file, monkeypatch, crash_on):
+    save_checkpoint = bulk_import.save_checkpoint
+    saves = []
+
+    def crashing_save(checkpoint_path, progress):
+        # Save 0 is the fresh-start checkpoint; save n follows the insert of chunk n
+        saves.append(progress.rows_done)
+        if len(saves) == crash_on + 1:
+            raise KeyboardInterrupt
+        save_checkpoint(checkpoint_path, progress)
+
+    monkeypatch.setattr(bulk_import, 'save_checkpoint', crashing_save)
+    with pytest.raises(KeyboardInterrupt):
+        bulk_import.import_file(db, 'customers', customers_file, chunk_size=3)
+    monkeypatch.setattr(bulk_import, 'save_checkpoint', save_checkpoint)
+
+    bulk_import.import_file(db, 'customers', customers_file, chunk_size=3)
+    assert stored_names(db) == sorted(f"Customer{index}" for index in range(7) if index != 3)
+
+
+def test_replayed_interactions_keep_their_upkeep(db, tmp_path, monkeypatch):
+    db.create_customer({'first_name': "Ann", 'last_name': "Lee", 'stage': 'lead'})
+    path = tmp_path / "interactions.jsonl"
+    path.write_text("".join(json.dumps({
+        'customer_id': 1, 'type': 'call', 'date': f"2024-05-0{day}T10:00:00", 'sentiment': 'positive'
+    }) + "\n" for day in range(1, 5)))
+
+    save_checkpoint = bulk_import.save_checkpoint
+    saves = []
+
+    def crashing_save(checkpoint_path, progress):
+        saves.append(progress.rows_done)
+        if len(saves) == 2:
+            raise KeyboardInterrupt
+        save_checkpoint(checkpoint_path, progress)
+
+    monkeypatch.setattr(bulk_import, 'save_checkpoint', crashing_save)
+    with pytest.raises(KeyboardInterrupt):
+        bulk_import.import_file(db, 'interactions', str(path), chunk_size=2)
+    monkeypatch.setattr(bulk_import, 'save_checkpoint', save_checkpoint)
+    bulk_import.import_file(db, 'interactions', str(path), chunk_size=2)
+
+    assert db.get_customer_sentiment_stats(1)['positive_count'] == 4
+    assert db.get_customer_by_id(1)['last_contact'].startswith('2024-05-04T10:00:00')
@@ -0,0 +1,87 @@
+# tests/test_cache.py
+"""QueryCache invalidation, including reads that race a write."""
+
+import asyncio
+
+import pytest
+
+from database import async_supabase_client
+from database.activity_feed import ActivityFeed
+from database.cache import QueryCache
+from database.query_log import track_queries
+from database.supabase_client import SupabaseClient
+
+
+def test_set_skips_results_read_before_an_invalidation():
+    cache = QueryCache()
+    generation = cache.generation(('customers', 'interactions'))
+    cache.invalidate_table('interactions')
+    cache.set('page', ['stale'], ('customers', 'interactions'), generation=generation)
+    assert cache.get('page') == (False, None)
+
+    generation = cache.generation(('customers',))
+    cache.invalidate_table('products')
+    cache.set('page', ['fresh'], ('customers',), generation=generation)
+    assert cache.get('page') == (True, ['fresh'])
+
+    generation = cache.generation(('customers',))
+    cache.clear()
+    cache.set('page', ['stale'], ('customers',), generation=generation)
+    assert cache.get('page') == (False, None)
+
+
+def test_rollup_fetched_across_a_write_is_not_cached(monkeypatch):
+    db = SupabaseClient(local_search=False, backend="sqlite")
+    fetches = []
+
+    async def racing_rollup():
+        fetches.append(1)
+        result = {'stages': {}, 'total_customers': len(fetches), 'new_this_week': 0}
+        if len(fetches) == 1:
+            # A customer write lands while the first read is in flight
+            db.aio._invalidate('customers')
+        return result
+
+    monkeypatch.setattr(db.aio, '_query_dashboard_rollup', racing_rollup)
+    assert db.get_dashboard_rollup()['total_customers'] == 1
+    assert db.get_dashboard_rollup()['total_customers'] == 2
+    assert db.get_dashboard_rollup()['total_customers'] == 2
+
+
+def test_catalog_is_loaded_once_shared_read_only_and_expires(monkeypatch):
+    db = SupabaseClient(local_search=False, backend="sqlite")
+    db.create_product({'name': "Silk Scarf", 'category': 'Accessories', 'price': 120.0})
+    loads = []
+    iter_table_rows = db.aio.iter_table_rows
+
+    def counting_iter(table, *args, **kwargs):
+        loads.append(table)
+        return iter_table_rows(table, *args, **kwargs)
+
+    async def two_cold_callers():
+        return await asyncio.gather(db.aio.get_all_products(), db.aio.get_all_products())
+
+    monkeypatch.setattr(db.aio, 'iter_table_rows', counting_iter)
+    first, second = db.run(two_cold_callers())
+    assert loads == ['products'] and first == second
+    with pytest.raises(TypeError):
+        first[0]['price'] = 0
+
+    # Another process renames the product; the catalog notices once its TTL has passed
+    db.run(db.aio._execute(db.client.table('products').update({'name': "Silk Stole"}).eq('id', 1)))
+    version = db.get_catalog_version()
+    assert db.get_product_by_id(1)['name'] == "Silk Scarf"
+    monkeypatch.setattr(async_supabase_client, 'CATALOG_TTL_SECONDS', 0)
+    assert db.get_product_by_id(1)['name'] == "Silk Stole"
+    assert db.get_catalog_version() == version + 1
+
+
+def test_uncached_client_queries_the_home_page_every_call():
+    # The benchmark's default client: nothing cached, the feed polled on every call
+    db = SupabaseClient(local_search=False, cache=QueryCache(max_entries=0), backend="sqlite",
+                        activity_feed=ActivityFeed(poll_seconds=0))
+    for _ in range(2):
+        with track_queries('home_page') as queries:
+            db.get_dashboard_rollup()
+            db.get_activity_feed(limit=5)
+        assert len(queries.records) == 2
@@ -0,0 +1,71 @@
+# tests/test_interactions.py
+"""Interaction writes and the upkeep the database does for them, on the offline SQLite backend."""
+
+import pytest
+
+from database import backfill_sentiment_stats
+from database.local_mirror import LocalMirror
+from database.supabase_client import SupabaseClient
+
+
+@pytest.fixture
+def db():
+    client = SupabaseClient(local_search=False, backend="sqlite")
+    client.create_customer({'first_name': "Ann", 'last_name': "Lee", 'stage': 'lead'})
+    return client
+
+
+def log(db, sentiment, date):
+    return db.create_interaction({'customer_id': 1, 'type': 'call', 'subject': "Fitting", 'content': "",
+                                  'date': date, 'sentiment': sentiment})
+
+
+def test_insert_updates_aggregate_and_last_contact(db):
+    log(db, 'positive', '2024-05-02T10:00:00')
+    log(db, 'positive', '2024-05-03T10:00:00')
+    # Backdated: counted, but last_contact and the last sentiment stay put
+    log(db, 'negative', '2024-04-01T10:00:00')
+
+    stats = db.get_customer_sentiment_stats(1)
+    assert (stats['positive_count'], stats['negative_count']) == (2, 1)
+    assert stats['last_sentiment'] == 'positive'
+    assert stats['overall_sentiment'] == 'positive'
+    assert db.get_customer_by_id(1)['last_contact'].startswith('2024-05-03T10:00:00')
+
+
+def test_created_row_is_returned_when_the_mirror_refresh_fails(db, monkeypatch):
+    reads = []
+
+    async def failing_read(query):
+        reads.append(query)
+        raise RuntimeError("connection reset")
+
+    # The customer re-read only happens with a mirror to write it to
+    monkeypatch.setattr(db.aio, '_mirror', LocalMirror(':memory:'))
+    monkeypatch.setattr(db.aio, '_fetch_data', failing_read)
+    interaction = log(db, 'neutral', '2024-05-02T10:00:00')
+
+    assert reads
+    assert interaction is not None and interaction['customer_id'] == 1
+
+
+def test_rebuild_matches_incremental_and_drops_orphans(db):
+    db.create_customer({'first_name': "Bo", 'last_name': "Kim", 'stage': 'lead'})
+    first = log(db, 'positive', '2024-05-02T10:00:00')
+    log(db, 'negative', '2024-04-01T10:00:00')
+    db.create_interaction({'customer_id': 2, 'type': 'note', 'subject': "", 'content': "",
+                           'date': '2024-05-01T10:00:00', 'sentiment': 'neutral'})
+    incremental = db.get_customer_sentiment_stats(1)
+
+    assert backfill_sentiment_stats.backfill(db) == 2
+    rebuilt = db.get_customer_sentiment_stats(1)
+    for column in ('positive_count', 'negative_count', 'last_sentiment', 'overall_sentiment'):
+        assert rebuilt[column] == incremental[column]
+    assert rebuilt['weighted_score'] == pytest.approx(incremental['weighted_score'])
+
+    # Re-scored and deleted interactions are picked up
+    db.set_interaction_sentiments({first['id']: 'negative'}, 'test')
+    db.client.table('interactions').delete().eq('customer_id', 2).execute()
+    assert backfill_sentiment_stats.backfill(db) == 1
+    assert db.get_customer_sentiment_stats(1)['negative_count'] == 2
+    assert db.get_customer_sentiment_stats(2)['neutral_count'] == 0
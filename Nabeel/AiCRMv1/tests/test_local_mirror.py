@@ -0,0 +1,70 @@
+# tests/test_local_mirror.py
+"""Local mirror filters, compared with what Postgres would return."""
+
+import pytest
+
+from database.local_mirror import DELETIONS_FEED, LocalMirror
+from database.supabase_client import SupabaseClient
+
+
+@pytest.fixture
+def mirror():
+    mirror = LocalMirror(':memory:')
+    mirror.upsert_rows('customers', [
+        {'id': 1, 'last_name': "Smith"},
+        {'id': 2, 'last_name': "smithers"},
+        {'id': 3, 'last_name': "Sm_th"},
+        {'id': 4, 'last_name': "Ann*"},
+        {'id': 5, 'last_name': None},
+    ])
+    return mirror
+
+
+def ids(query):
+    return sorted(row['id'] for row in query.execute().data)
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("Smith%", [1]),
+    ("smith*", [2]),
+    ("Sm_th", [1, 3]),
+    (r"Sm\_th", [3]),
+    (r"Ann\*", [4]),
+    ("%[a]%", []),
+])
+def test_like_is_case_sensitive(mirror, pattern, expected):
+    assert ids(mirror.table('customers').select("id").like('last_name', pattern)) == expected
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("smith%", [1, 2]),
+    ("SM*", [1, 2, 3]),
+    (r"sm\_th", [3]),
+])
+def test_ilike_ignores_case(mirror, pattern, expected):
+    assert ids(mirror.table('customers').select("id").ilike('last_name', pattern)) == expected
+
+
+def test_like_in_logic_tree(mirror):
+    assert ids(mirror.table('customers').select("id").or_("last_name.like.Smi*,id.eq.4")) == [1, 4]
+
+
+def test_customer_walk_stays_on_the_source_of_its_first_page(monkeypatch):
+    db = SupabaseClient(local_search=False, backend="sqlite")
+    for name in ("adams", "Baker", "carter", "Davis"):
+        db.create_customer({'first_name': "Test", 'last_name': name, 'stage': 'lead'})
+
+    # An empty mirror: any page it served would be empty
+    mirror = LocalMirror(':memory:')
+    monkeypatch.setattr(db.aio, '_mirror', mirror)
+    first = db.get_all_customers(page_size=2)
+    assert first['next_cursor'][2] == 'server'
+
+    # The mirror finishes its first sync, still empty
+    for name in (*mirror.tables, DELETIONS_FEED):
+        mirror.set_watermark(name, None)
+    assert mirror.ready
+    second = db.get_all_customers(cursor=first['next_cursor'], page_size=2)
+    assert len(second['customers']) == 2
+    # A new walk starts on the mirror now it is ready
+    assert db.get_all_customers(page_size=3)['customers'] == []
@@ -0,0 +1,46 @@
+# tests/test_openai_client.py
+"""Streaming completions: only complete replies are cached, and failures reach the caller."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from ai.llm_cache import LLMCache
+from ai.openai_client import OpenAIClient
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def fake_completions(stream):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **options: stream())))
+
+
+@pytest.fixture
+def ai(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return OpenAIClient(cache=LLMCache(':memory:'))
+
+
+def test_stream_failing_midway_raises_and_caches_nothing(ai):
+    def broken():
+        yield chunk("Loyal client who ")
+        raise ConnectionError("connection reset")
+
+    ai.client = fake_completions(broken)
+    received = []
+    with pytest.raises(ConnectionError):
+        for part in ai.stream_customer_summary({'first_name': "Ada"}, []):
+            received.append(part)
+
+    assert received == ["Loyal client who "]
+    assert ai.cache.stats()['size'] == 0
+
+
+def test_complete_stream_is_cached(ai):
+    ai.client = fake_completions(lambda: iter([chunk("Loyal "), chunk("client.")]))
+    assert "".join(ai.stream_customer_summary({'first_name': "Ada"}, [])) == "Loyal client."
+
+    ai.client = None
+    assert list(ai.stream_customer_summary({'first_name': "Ada"}, [])) == ["Loyal client."]
@@ -0,0 +1,27 @@
+# tests/test_query_log.py
+"""Query log attribution of queries to client methods, on the offline SQLite backend."""
+
+import asyncio
+
+from database.query_log import track_queries
+from database.supabase_client import SupabaseClient
+
+
+def test_gathered_calls_keep_their_method_names():
+    db = SupabaseClient(local_search=False, backend="sqlite")
+    customer = db.create_customer({'first_name': "Ann", 'last_name': "Lee", 'stage': 'lead'})
+
+    async def load():
+        return await asyncio.gather(
+            db.aio.get_customer_by_id(customer['id']),
+            db.aio.get_customer_interactions(customer['id']),
+            db.aio.get_customer_transactions(customer['id']),
+        )
+
+    with track_queries("test") as queries:
+        db.run(load())
+        assert sum(1 for _ in db.iter_table_rows('customers', "id", page_size=1)) == 1
+
+    methods = {record.method for record in queries.records}
+    assert methods == {'get_customer_by_id', 'get_customer_interactions', 'get_customer_transactions',
+                       'iter_table_rows'}
@@ -0,0 +1,24 @@
+# tests/test_search_index.py
+"""CustomerSearchIndex rebuilds."""
+
+from database.search_index import CustomerSearchIndex
+
+
+def customer(customer_id, first_name):
+    return {'id': customer_id, 'first_name': first_name, 'last_name': "Lee", 'company': "", 'email': ""}
+
+
+def test_build_does_not_block_searches_and_keeps_concurrent_writes():
+    index = CustomerSearchIndex()
+    index.build([customer(1, "Ann")])
+
+    def customers():
+        # Runs mid-build: the old contents still answer, and writes land in both
+        assert index.search("ann") == [1]
+        index.add(customer(3, "Cleo"))
+        index.remove(1)
+        yield customer(1, "Ann")
+        yield customer(2, "Bea")
+
+    index.build(customers())
+    assert (len(index), index.search("ann"), index.search("bea"), index.search("cleo")) == (2, [], [2], [3])
@@ -0,0 +1,70 @@
+# tests/test_sentiment_model.py
+"""Negation handling, and which source the tiered classifier stamps on its answers."""
+
+import pytest
+
+from ai.openai_client import SENTIMENT_SOURCE
+from ai.sentiment_model import (
+    LEXICON_SOURCE, LOCAL_SOURCE, SentimentModel, TieredSentimentClassifier, lexicon_sentiment, tokenize
+)
+
+
+def trained_model():
+    examples = []
+    for index in range(30):
+        examples.append((f"loved the fit, wants to order more {index}", 'positive'))
+        examples.append((f"delivery was late and the fabric damaged {index}", 'negative'))
+        examples.append((f"scheduled a fitting and sent swatches {index}", 'neutral'))
+    model = SentimentModel.train(examples)
+    assert model.trained
+    return model
+
+
+def test_negation_covers_the_next_few_words_only():
+    assert tokenize("Not happy with the delay") == ['not', 'not_happy', 'not_with', 'not_the', 'delay']
+
+
+def test_negation_stops_at_punctuation():
+    assert tokenize("Not sure, but happy") == ['not', 'not_sure', 'but', 'happy']
+
+
+def test_negative_word_after_a_negated_phrase_keeps_its_polarity():
+    label, _ = lexicon_sentiment("not happy with the delay")
+    assert label == 'negative'
+    assert lexicon_sentiment("the delay was not a problem") == ('neutral', 0.4)
+
+
+def test_lexicon_answers_are_stamped_as_lexicon():
+    classifier = TieredSentimentClassifier(SentimentModel(), lambda text: None, threshold=0.5, audit_rate=0)
+    result = classifier.classify("Loved the gown, thrilled and very happy")
+    assert result.label == 'positive'
+    assert result.source == LEXICON_SOURCE
+
+
+def test_lexicon_fallback_after_llm_failure_is_stamped_as_lexicon():
+    def failing(text):
+        raise RuntimeError("LLM unavailable")
+
+    classifier = TieredSentimentClassifier(SentimentModel(), failing, threshold=0.99, audit_rate=0)
+    assert classifier.classify("Discussed sizing").source == LEXICON_SOURCE
+
+
+def test_trained_model_answers_are_stamped_as_model():
+    classifier = TieredSentimentClassifier(trained_model(), lambda text: None, threshold=0.5, audit_rate=0)
+    result = classifier.classify("loved the fit")
+    assert (result.label, result.source) == ('positive', LOCAL_SOURCE)
+
+
+def test_agreement_is_tracked_per_local_source():
+    classifier = TieredSentimentClassifier(SentimentModel(), lambda text: 'neutral', threshold=0.99, audit_rate=0)
+    result = classifier.classify("Discussed sizing")
+
+    assert result.source == SENTIMENT_SOURCE
+    stats = classifier.stats()
+    assert stats['llm'] == 1
+    assert stats['agreement'] == {LEXICON_SOURCE: {'0.0+': {'compared': 1, 'rate': 1.0}}}
+
+
+@pytest.mark.parametrize("text", ["", "   "])
+def test_empty_text_is_neutral(text):
+    assert lexicon_sentiment(text)[0] == 'neutral'
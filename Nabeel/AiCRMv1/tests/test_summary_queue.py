@@ -0,0 +1,201 @@
+# tests/test_summary_queue.py
+"""Summary queue claims, the background worker and its rate limiter, on the offline SQLite backend."""
+
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from ai.summary_queue import RateLimiter, SummaryWorker
+from database.supabase_client import SupabaseClient
+
+
+class FakeAI:
+    """Stands in for OpenAIClient.summarize_customer, counting calls per customer."""
+
+    def __init__(self, fail_for=(), delay=0.0, during=None):
+        self.calls = Counter()
+        self.fail_for = set(fail_for)
+        self.delay = delay
+        self.during = during
+        self._lock = threading.Lock()
+
+    def summarize_customer(self, customer, interactions, product_interests, products, transactions, use_cache=True):
+        with self._lock:
+            self.calls[customer['id']] += 1
+        if self.during is not None:
+            self.during(customer)
+        time.sleep(self.delay)
+        if customer['id'] in self.fail_for:
+            raise RuntimeError("model unavailable")
+        return f"summary of {customer['first_name']}"
+
+
+@pytest.fixture
+def db():
+    client = SupabaseClient(local_search=False, backend="sqlite")
+    for index in range(6):
+        client.create_customer({'first_name': f"Customer{index}", 'last_name': "Test", 'stage': 'lead'})
+    return client
+
+
+def queued_ids(db):
+    return sorted(row['customer_id'] for row in db.get_summary_queue())
+
+
+def test_writes_queue_the_customer(db):
+    assert queued_ids(db) == [1, 2, 3, 4, 5, 6]
+    db.clear_summary_queue(db.get_summary_queue())
+
+    db.create_interaction({'customer_id': 2, 'type': 'call', 'subject': "Fitting", 'content': "Booked a fitting",
+                           'date': '2024-05-01T10:00:00', 'sentiment': 'neutral'})
+    db.update_customer(3, {'notes': "Prefers email"})
+    db.update_customer(4, {'ai_insights': "not read by the summary prompt"})
+    assert queued_ids(db) == [2, 3]
+
+
+def test_sentiment_rescoring_does_not_queue(db):
+    interaction = db.create_interaction({'customer_id': 2, 'type': 'call', 'subject': "Fitting",
+                                         'content': "Loved the fit", 'date': '2024-05-01T10:00:00',
+                                         'sentiment': 'neutral'})
+    db.clear_summary_queue(db.get_summary_queue())
+
+    # The write path of python -m ai.backfill_sentiment
+    db.set_interaction_sentiments({interaction['id']: 'positive'}, "test:batch-v1")
+    assert queued_ids(db) == []
+
+    db.client.table('interactions').update({'content': "Loved it"}).eq('id', interaction['id']).execute()
+    assert queued_ids(db) == [2]
+
+
+def test_claims_do_not_overlap(db):
+    first = db.claim_summary_queue(4)
+    second = db.claim_summary_queue(4)
+    assert [row['customer_id'] for row in first] == [1, 2, 3, 4]
+    assert [row['customer_id'] for row in second] == [5, 6]
+    assert db.claim_summary_queue(4) == []
+    # Claimed rows stay queued until cleared
+    assert queued_ids(db) == [1, 2, 3, 4, 5, 6]
+
+
+def test_concurrent_claims_hand_out_each_row_once(db):
+    claimed = []
+    barrier = threading.Barrier(6)
+
+    def claim():
+        barrier.wait()
+        claimed.extend(row['customer_id'] for row in db.claim_summary_queue(2))
+
+    threads = [threading.Thread(target=claim) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == [1, 2, 3, 4, 5, 6]
+
+
+def test_lapsed_claim_is_claimable_again(db):
+    assert [row['customer_id'] for row in db.claim_summary_queue(1, customer_id=3, lease_seconds=0)] == [3]
+    time.sleep(0.01)
+    assert [row['customer_id'] for row in db.claim_summary_queue(1, customer_id=3)] == [3]
+    assert db.claim_summary_queue(1, customer_id=3) == []
+
+
+def test_worker_regenerates_queued_summaries(db):
+    ai = FakeAI()
+    totals = SummaryWorker(db, ai, workers=3, limiter=RateLimiter(0)).run_once()
+
+    assert totals == {'updated': 6, 'missing': 0, 'manual': 0, 'failed': 0}
+    assert queued_ids(db) == []
+    assert set(ai.calls.values()) == {1}
+    customer = db.get_customer_by_id(2)
+    assert customer['ai_summary'] == "summary of Customer1"
+    assert customer['ai_summary_generated_at']
+
+
+def test_failed_summary_stays_queued_and_is_not_retried_in_the_same_run(db):
+    ai = FakeAI(fail_for={2})
+    totals = SummaryWorker(db, ai, workers=2, limiter=RateLimiter(0)).run_once()
+
+    assert totals['updated'] == 5 and totals['failed'] == 1
+    assert ai.calls[2] == 1
+    assert queued_ids(db) == [2]
+    # Still claimed until its lease lapses
+    assert db.claim_summary_queue(10) == []
+
+
+def test_limit_caps_customers_per_run(db):
+    totals = SummaryWorker(db, FakeAI(), workers=2, limiter=RateLimiter(0)).run_once(limit=4)
+    assert totals['updated'] == 4
+    assert queued_ids(db) == [5, 6]
+
+
+def test_hand_written_summary_is_kept(db):
+    db.update_customer(1, {'ai_summary': "Written by the account manager"})
+    ai = FakeAI()
+    totals = SummaryWorker(db, ai, workers=2, limiter=RateLimiter(0)).run_once()
+
+    assert totals['manual'] == 1 and totals['updated'] == 5
+    assert ai.calls[1] == 0
+    assert db.get_customer_by_id(1)['ai_summary'] == "Written by the account manager"
+    assert queued_ids(db) == []
+
+
+def test_customer_written_while_generating_stays_queued(db):
+    def touch(customer):
+        if customer['id'] == 4:
+            time.sleep(0.01)
+            db.update_customer(4, {'stage': 'prospect'})
+
+    SummaryWorker(db, FakeAI(during=touch), workers=2, limiter=RateLimiter(0)).run_once()
+    assert queued_ids(db) == [4]
+    assert db.get_customer_by_id(4)['ai_summary'] == "summary of Customer3"
+
+
+def test_concurrent_workers_generate_each_summary_once(db):
+    ai = FakeAI(delay=0.02)
+    workers = [SummaryWorker(db, ai, workers=2, limiter=RateLimiter(0)) for _ in range(3)]
+    threads = [threading.Thread(target=worker.run_once) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert ai.calls == Counter({customer_id: 1 for customer_id in range(1, 7)})
+    assert queued_ids(db) == []
+
+
+def test_urgent_submission_claims_before_generating(db):
+    held = db.claim_summary_queue(1, customer_id=5)
+    worker = SummaryWorker(db, FakeAI(), workers=1, limiter=RateLimiter(0))
+
+    # Another worker holds customer 5, so this one leaves it alone
+    assert worker.submit(held[0], urgent=True)
+    worker._queue.join()
+    assert worker.stats()['updated'] == 0
+    assert db.get_customer_by_id(5)['ai_summary'] is None
+
+    worker.submit(db.get_summary_queue_entry(6), urgent=True)
+    worker._queue.join()
+    assert db.get_customer_by_id(6)['ai_summary'] == "summary of Customer5"
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(requests_per_minute=600)
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Five slots 0.1s apart, the first immediate
+    assert 0.38 <= time.monotonic() - started < 1.0
+
+
+def test_rate_limiter_pause_holds_everyone_back():
+    limiter = RateLimiter(requests_per_minute=0)
+    limiter.pause(0.2)
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.19
@@ -0,0 +1,143 @@
+# utils/product_matcher.py
+"""
+Aho-Corasick matcher for product mentions in interaction text.
+
+The automaton is built once from the product catalog (names and categories)
+and then finds every mentioned product in a single pass over the text,
+instead of one substring scan per product.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List
+
+
+class ProductMentionMatcher:
+    """
+    Finds which catalog products are mentioned in a piece of text.
+
+    A product counts as mentioned if its name or its category appears in
+    the text. With word_boundary=True a match must not sit inside a longer
+    word, so the category "bag" matches "a new bag" but not "baggage".
+    """
+
+    def __init__(self, products: Iterable[Dict], word_boundary: bool = True):
+        self.products: List[Dict] = list(products)
+        self.word_boundary = word_boundary
+
+        # Trie transitions, failure links and per-state matches (pattern ids)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._matches: List[List[int]] = [[]]
+
+        # Per-pattern length and the catalog indices it points to
+        self._pattern_lengths: List[int] = []
+        self._pattern_products: List[List[int]] = []
+
+        pattern_ids: Dict[str, int] = {}
+        for index, product in enumerate(self.products):
+            for field in ('name', 'category'):
+                pattern = (product.get(field) or '').strip().lower()
+                if not pattern:
+                    continue
+                if pattern not in pattern_ids:
+                    pattern_ids[pattern] = self._add_pattern(pattern)
+                products_for_pattern = self._pattern_products[pattern_ids[pattern]]
+                if not products_for_pattern or products_for_pattern[-1] != index:
+                    products_for_pattern.append(index)
+
+        self._build_failure_links()
+
+    def find_products(self, text: str) -> List[Dict]:
+        """
+        Return the products mentioned in text, in catalog order, without duplicates.
+        Expects lowercase text.
+        """
+        found = set()
+        state = 0
+        goto, fail, matches = self._goto, self._fail, self._matches
+
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for pattern_id in matches[state]:
+                if self.word_boundary and not self._on_word_boundary(text, position, pattern_id):
+                    continue
+                found.update(self._pattern_products[pattern_id])
+
+        return [self.products[index] for index in sorted(found)]
+
+    def find_product_interests(self, interactions: Iterable[Dict]) -> List[Dict]:
+        """
+        Extract product interests from interactions (newest first).
+        Each product appears once, with the context of the first interaction
+        that mentions it.
+        """
+        product_interests = []
+        seen_product_ids = set()
+
+        for interaction in interactions:
+            content = interaction.get('content') or ''
+            subject = interaction.get('subject') or ''
+
+            # Scan subject and content for product names and categories in one pass
+            for product in self.find_products(f"{subject}\n{content}".lower()):
+                if product['id'] in seen_product_ids:
+                    continue
+                seen_product_ids.add(product['id'])
+
+                product_interests.append({
+                    'product': product,
+                    'interaction_id': interaction.get('id'),
+                    'interaction_type': interaction.get('type'),
+                    'interaction_date': interaction.get('date'),
+                    'sentiment': interaction.get('sentiment'),
+                    'context': content[:200] + '...' if len(content) > 200 else content
+                })
+
+        return product_interests
+
+    def _add_pattern(self, pattern: str) -> int:
+        """Insert a pattern into the trie and return its id."""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._matches.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+
+        pattern_id = len(self._pattern_lengths)
+        self._pattern_lengths.append(len(pattern))
+        self._pattern_products.append([])
+        self._matches[state].append(pattern_id)
+        return pattern_id
+
+    def _build_failure_links(self) -> None:
+        """Breadth-first pass that links each state to its longest proper suffix state."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+
+                # Patterns ending at the suffix state also end here
+                self._matches[next_state] = self._matches[next_state] + self._matches[self._fail[next_state]]
+
+    def _on_word_boundary(self, text: str, end: int, pattern_id: int) -> bool:
+        """Check that the match ending at end is not part of a longer word."""
+        start = end - self._pattern_lengths[pattern_id] + 1
+        if start > 0 and text[start - 1].isalnum():
+            return False
+        if end + 1 < len(text) and text[end + 1].isalnum():
+            return False
+        return True